@@ -1,9 +1,35 @@
-from fastapi import APIRouter, HTTPException
-from app.db.session import get_databases, get_tables
-from app.utils.query_processing import process_natural_language_query, ingest_schema
+from contextlib import aclosing
+import asyncio
+import json
+import time
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from app.utils.query_processing import (
+    process_natural_language_query_async,
+    prepare_sql_query_async,
+    stream_sql_query_async,
+    stream_natural_language_query_async,
+    sse_message
+)
+from app.utils.schema_ingestion import ingest_schema, schema_collection_name
 from app.models.context import DatabaseContext, TableContext, ColumnContext, ContextResponse
 from app.db.context_store import context_store
-from typing import List, Dict, Any
+from app.utils.context_processing import context_processor
+from app.core.warmup import warmup
+from app.db.pool import pool_manager
+from app.db.milvus_client import milvus_manager
+from app.db.vector_backends import vector_backend_stats
+from app.db.catalog_cache import catalog_cache
+from app.utils.embeddings import embedding_cache
+from app.utils.sql_cache import sql_cache
+from app.db.result_cache import result_cache
+from app.db.query_guard import QueryRejected
+from app.core.singleflight import singleflight, singleflight_stats
+from app.core.metrics import metrics, stage
+from app.core.jobs import job_queue, JOIN, REPLACE
+from app.core.llm_scheduler import BACKGROUND, LLMOverloaded, llm_priority, llm_scheduler_stats
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 
 # Define a Pydantic model for the query request
@@ -14,25 +40,48 @@ class QueryRequest(BaseModel):
 # Create an API router instance
 router = APIRouter()
 
+def _overloaded(e: LLMOverloaded) -> HTTPException:
+    # Ollama is saturated; tell the client when a retry is likely to be admitted
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def _cache_headers(etag: str) -> Dict[str, str]:
+    # Always revalidate, but let the client reuse its copy on 304
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def _not_modified(request: Request, response: Response, etag: str) -> bool:
+    """Set caching headers and report whether the client's If-None-Match matches the ETag."""
+    response.headers.update(_cache_headers(etag))
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
 # Endpoint to list all available databases
 @router.get("/databases", response_model=List[str])
-async def list_databases():
+async def list_databases(request: Request, response: Response):
     """
     List all available databases.
     
     Returns:
-        List[str]: A list of database names.
+        List[str]: A list of database names, or 304 if the client's ETag is current.
     Raises:
         HTTPException: If an error occurs while retrieving the databases.
     """
     try:
-        return get_databases()  # Retrieve and return the list of databases
+        # Cached list of databases; concurrent requests share one catalog read
+        databases, etag = await singleflight("databases").do(
+            None, lambda: asyncio.to_thread(catalog_cache.get_databases)
+        )
+        if _not_modified(request, response, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        return databases
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))  # Raise an exception if an error occurs
 
 # Endpoint to list all tables in a specific database with their structure
 @router.get("/databases/{database}/tables", response_model=List[Dict[str, Any]])
-async def list_tables(database: str):
+async def list_tables(database: str, request: Request, response: Response):
     """
     List all tables in a specific database with their structure.
     
@@ -40,12 +89,19 @@ async def list_tables(database: str):
         database (str): The name of the database.
         
     Returns:
-        List[Dict[str, Any]]: A list of dictionaries representing table structures.
+        List[Dict[str, Any]]: A list of dictionaries representing table structures,
+        or 304 if the client's ETag is current.
     Raises:
         HTTPException: If an error occurs while retrieving the tables.
     """
     try:
-        return get_tables(database)  # Retrieve and return the list of tables
+        # Cached, revalidated by fingerprint; concurrent requests share one catalog read
+        tables, etag = await singleflight("tables").do(
+            database, lambda: asyncio.to_thread(catalog_cache.get_tables, database)
+        )
+        if _not_modified(request, response, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        return tables
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))  # Raise an exception if an error occurs
 
@@ -58,50 +114,386 @@ async def execute_query(request: QueryRequest):
     Args:
         request (QueryRequest): The query request containing the query and database name.
         
+    The generated SQL is planned first: SELECTs without a LIMIT are limited,
+    and queries whose estimated cost or row count is too high are rejected.
+    The response includes ``executed_sql`` and the ``query_plan`` summary.
+    
     Returns:
         Any: The result of the executed query.
     Raises:
-        HTTPException: If an error occurs while executing the query.
+        HTTPException: 422 if the query plan exceeds the cost guard, 429 with
+        ``Retry-After`` if Ollama is saturated, 500 if another error occurs
+        while executing the query.
     """
     try:
-        result = process_natural_language_query(request.query, request.database)  # Process and execute the query
-        return result  # Return the query result
+        result = await process_natural_language_query_async(request.query, request.database)  # Process and execute the query
+        # Encode here rather than in FastAPI so serialization shows up as its own stage
+        with stage("serialize"):
+            return JSONResponse(jsonable_encoder(result))  # Return the query result
+    except QueryRejected as e:
+        raise HTTPException(status_code=422, detail=str(e))  # Too expensive to run
+    except LLMOverloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))  # Raise an exception if an error occurs
 
-# Endpoint to ingest database schema into Milvus
-@router.post("/ingest-schema")
-async def ingest_database_schema(database: str):
+# Endpoint to execute a natural language query and stream the rows as NDJSON
+@router.post("/query/stream")
+async def execute_query_stream(request: QueryRequest, http_request: Request):
     """
-    Ingest database schema into Milvus.
+    Execute a natural language query and stream the results as NDJSON.
+    
+    The first line describes the generated SQL, followed by a ``plan`` line
+    (the executed SQL and its plan summary), a ``columns`` line,
+    one ``row`` line per result row and a final ``end`` (or ``error``) line.
+    Rows are read through a server-side cursor, so memory stays bounded
+    regardless of the result size; the stream stops if the client disconnects.
     
     Args:
-        database (str): The name of the database whose schema needs to be ingested.
+        request (QueryRequest): The query request containing the query and database name.
         
     Returns:
-        Dict[str, Any]: A dictionary containing a success message and the count of tables ingested.
+        StreamingResponse: The NDJSON result stream.
     Raises:
-        HTTPException: If an error occurs while ingesting the schema.
+        HTTPException: 429 with ``Retry-After`` if Ollama is saturated, 500 if
+        the SQL query cannot be generated.
     """
     try:
-        # Retrieve all tables from the specified database
-        tables = get_tables(database)
+        prepared = await prepare_sql_query_async(request.query, request.database)
+    except LLMOverloaded as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def stream():
+        yield json.dumps({"type": "query", **prepared}) + "\n"
+        # aclosing() closes the cursor promptly when we stop early
+        async with aclosing(stream_sql_query_async(prepared["sql_query"], request.database)) as chunks:
+            async for chunk in chunks:
+                if await http_request.is_disconnected():
+                    break
+                yield chunk
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Readiness endpoint for load balancers and orchestrators
+@router.get("/ready")
+async def get_readiness(response: Response):
+    """
+    Report which subsystems have warmed up.
+    
+    Responds 503 until every required subsystem is ready. Subsystems whose
+    warm-up failed are retried in the background (rate limited).
+    
+    Returns:
+        Dict[str, Any]: Overall readiness and per-subsystem status, timing and errors.
+    """
+    warmup.start()
+    status = warmup.status()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+# Endpoint to execute a natural language query with Server-Sent Events progress
+@router.post("/query/sse")
+async def execute_query_sse(request: QueryRequest, http_request: Request):
+    """
+    Execute a natural language query, streaming each stage as Server-Sent Events.
+    
+    An ``accepted`` event is sent immediately, then ``schema``, ``token``
+    (model output while the SQL is generated), ``sql`` (as soon as the query
+    field of the model's answer is complete), ``execution``, ``plan``, ``columns``,
+    ``rows`` and ``end`` events; failures arrive as an ``error`` event. Every
+    event carries ``elapsed_ms`` since the request was received. The stream
+    stops if the client disconnects.
+    
+    Args:
+        request (QueryRequest): The query request containing the query and database name.
         
-        # Format the schema for ingestion
-        schema_dict = {
-            table["name"]: {
-                "columns": table["columns"]
-            } for table in tables
+    Returns:
+        StreamingResponse: The ``text/event-stream`` response.
+    """
+    started = time.perf_counter()
+
+    def stamp(event: Dict[str, Any]) -> str:
+        return sse_message({**event, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    async def stream():
+        yield stamp({"type": "accepted", "query": request.query, "database": request.database})
+        async with aclosing(stream_natural_language_query_async(request.query, request.database)) as events:
+            async for event in events:
+                if await http_request.is_disconnected():
+                    break
+                yield stamp(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Endpoint to report connection pool sizes and wait times
+@router.get("/pools")
+async def get_pool_stats():
+    """
+    Report connection pool statistics for every target database.
+    
+    Returns:
+        Dict[str, Any]: Pool sizes, available connections and wait times per database.
+    """
+    return pool_manager.stats()
+
+# Endpoint to report the shared Milvus connection and loaded collections
+@router.get("/milvus")
+async def get_milvus_stats():
+    """
+    Report the state of the shared Milvus connection.
+    
+    Returns:
+        Dict[str, Any]: Connection state, loaded collections and reconnect count.
+    """
+    return milvus_manager.stats()
+
+# Endpoint to report the vector backend and the collections in use
+@router.get("/vector-store")
+async def get_vector_store_stats():
+    """
+    Report the configured vector backend and per-collection statistics.
+    
+    Returns:
+        Dict[str, Any]: Backend name and, per collection, rows/load state.
+    """
+    return vector_backend_stats()
+
+# Endpoint to report embedding cache effectiveness
+@router.get("/embedding-cache")
+async def get_embedding_cache_stats():
+    """
+    Report embedding cache statistics.
+    
+    Returns:
+        Dict[str, Any]: Hit/miss/eviction counters and memory/disk tier sizes.
+    """
+    return embedding_cache.stats()
+
+# Endpoint to report semantic SQL cache effectiveness
+@router.get("/sql-cache")
+async def get_sql_cache_stats():
+    """
+    Report semantic SQL cache statistics.
+    
+    Returns:
+        Dict[str, Any]: Entry count and hit/miss/eviction/invalidation counters.
+    """
+    return sql_cache.stats()
+
+# Endpoint to report query result cache effectiveness
+@router.get("/result-cache")
+async def get_result_cache_stats():
+    """
+    Report query result cache statistics.
+    
+    Returns:
+        Dict[str, Any]: Entry/row counts and hit/miss/eviction/invalidation counters.
+    """
+    return result_cache.stats()
+
+def _counter_samples():
+    """Hit/miss counters the caches already keep, exported at scrape time."""
+    embedding = embedding_cache.stats()
+    caches = {
+        "embedding": (embedding["memory_hits"] + embedding["disk_hits"], embedding["misses"]),
+        **{
+            name: (stats["hits"], stats["misses"])
+            for name, stats in (("sql", sql_cache.stats()), ("result", result_cache.stats()), ("catalog", catalog_cache.stats()))
         }
+    }
+    yield "talkdb_cache_requests_total", "counter", "Cache lookups by cache and result.", [
+        ("talkdb_cache_requests_total", {"cache": name, "result": result}, count)
+        for name, counts in caches.items() for result, count in zip(("hit", "miss"), counts)
+    ]
+    groups = singleflight_stats()
+    yield "talkdb_singleflight_calls_total", "counter", "Single-flight calls by group and outcome.", [
+        ("talkdb_singleflight_calls_total", {"group": name, "outcome": outcome}, stats[key])
+        for name, stats in groups.items() for outcome, key in (("executed", "executions"), ("collapsed", "collapsed"))
+    ]
+    pools = llm_scheduler_stats()
+    yield "talkdb_llm_queue_depth", "gauge", "LLM calls waiting for a slot by pool and priority.", [
+        ("talkdb_llm_queue_depth", {"pool": name, "priority": priority}, count)
+        for name, stats in pools.items() for priority, count in stats["waiting"].items()
+    ]
+    yield "talkdb_llm_in_flight", "gauge", "LLM calls holding a slot by pool.", [
+        ("talkdb_llm_in_flight", {"pool": name}, stats["in_flight"]) for name, stats in pools.items()
+    ]
+    yield "talkdb_llm_rejected_total", "counter", "LLM calls refused by admission control by pool and reason.", [
+        ("talkdb_llm_rejected_total", {"pool": name, "reason": reason}, stats[key])
+        for name, stats in pools.items() for reason, key in (("queue_full", "rejected"), ("timeout", "timeouts"))
+    ]
+
+metrics.register_collector(_counter_samples)
+
+# Endpoint to expose metrics for Prometheus
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Expose stage latency, token, row and cache metrics in the Prometheus text format.
+    
+    Returns:
+        PlainTextResponse: ``talkdb_stage_seconds``, ``talkdb_request_seconds``,
+        ``talkdb_llm_tokens`` and ``talkdb_query_rows`` histograms plus cache
+        and single-flight counters, and LLM queue wait, depth and rejections.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Endpoint to report request coalescing effectiveness
+@router.get("/singleflight")
+async def get_singleflight_stats():
+    """
+    Report single-flight statistics per coalescing group.
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: Calls, executions, collapsed callers and calls in flight.
+    """
+    return singleflight_stats()
+
+def _ingest_schema_job(params: Dict[str, Any], progress) -> Dict[str, Any]:
+    """Background job: ingest the current schema of ``params["database"]``."""
+    database = params["database"]
+    # Retrieve all tables from the specified database
+    tables, _ = catalog_cache.get_tables(database)
+
+    # Format the schema for ingestion; everything but the name feeds the table fingerprint
+    schema_dict = {
+        table["name"]: {key: value for key, value in table.items() if key != "name"}
+        for table in tables
+    }
+
+    # Ingest the schema into Milvus; its embeddings yield to interactive requests
+    with llm_priority(BACKGROUND):
+        stats = ingest_schema(
+            schema_dict, schema_collection_name(database), full=params.get("full", False), progress=progress
+        )
+    if stats["added"] or stats["updated"] or stats["removed"]:
+        sql_cache.invalidate(database)  # Cached SQL was generated against the old schema embeddings
+    return stats
+
+def _bulk_context_job(params: Dict[str, Any], progress) -> Dict[str, Any]:
+    """Background job: store a database context hierarchy through the batched write path."""
+    with llm_priority(BACKGROUND):
+        summary = context_processor.process_database_context_bulk(
+            db_name=params["db_name"],
+            context=DatabaseContext.model_validate(params["context"]),
+            include_tables=params["include_tables"],
+            include_columns=params["include_columns"],
+            progress=progress
+        )
+    sql_cache.invalidate(params["db_name"])
+    return summary
+
+# A retried ingestion joins the one already queued or running; a newer bulk
+# context upload replaces a queued one, since only the latest would survive
+job_queue.register("ingest_schema", _ingest_schema_job, dedupe=JOIN)
+job_queue.register("bulk_context", _bulk_context_job, dedupe=REPLACE)
+
+# Endpoint to report Ollama admission control
+@router.get("/llm-scheduler")
+async def get_llm_scheduler_stats():
+    """
+    Report the Ollama call scheduler per pool (embed, generate).
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: Slots in use, waiting callers per priority,
+        and admitted/queued/rejected/timed-out counters.
+    """
+    return llm_scheduler_stats()
+
+# Endpoint to ingest database schema into Milvus
+@router.post("/ingest-schema", status_code=202)
+async def ingest_database_schema(database: str, full: bool = False):
+    """
+    Queue ingestion of a database schema into Milvus.
+
+    Ingestion runs as a background job; only tables whose definition changed
+    since the last ingestion are re-embedded and vectors of dropped tables are
+    deleted. A request while an ingestion of the same database is queued or
+    running returns that job.
+    
+    Args:
+        database (str): The name of the database whose schema needs to be ingested.
+        full (bool): Re-embed every table, even unchanged ones.
         
-        # Ingest the schema into Milvus
-        count = ingest_schema(schema_dict, f"{database}_schema")
-        
-        # Return a success message with the count of ingested tables
-        return {"message": f"Successfully ingested schema for {count} tables"}
+    Returns:
+        Dict[str, Any]: A message and the job; poll ``/api/jobs/{id}`` for progress
+        and the ingestion statistics (added, updated, removed and skipped tables).
+    Raises:
+        HTTPException: If the job cannot be queued.
+    """
+    try:
+        job, created = await asyncio.to_thread(
+            job_queue.enqueue, "ingest_schema", database, {"database": database, "full": full}
+        )
+        state = "queued" if created else f"already {job['status']}"
+        return {"message": f"Schema ingestion for {database} {state}", "job": job}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))  # Raise an exception if an error occurs
 
+# Endpoint to list background jobs
+@router.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """
+    List the most recent background jobs.
+    
+    Args:
+        status (str): Only jobs with this status (queued, running, succeeded, failed, cancelled).
+        limit (int): Maximum number of jobs returned.
+        
+    Returns:
+        List[Dict[str, Any]]: Jobs with their status and progress, newest first.
+    """
+    return await asyncio.to_thread(job_queue.list, status, limit)
+
+# Endpoint to report the progress of a background job
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report a background job's status and progress.
+    
+    Args:
+        job_id (str): The job id returned when the job was queued.
+        
+    Returns:
+        Dict[str, Any]: Status, progress (items done/total, items per second,
+        ETA), and the result or error once finished.
+    Raises:
+        HTTPException: If there is no such job.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+# Endpoint to cancel a background job
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancel a background job.
+
+    Queued jobs are cancelled immediately; running jobs stop at their next
+    progress report.
+    
+    Args:
+        job_id (str): The job id returned when the job was queued.
+        
+    Returns:
+        Dict[str, Any]: The job.
+    Raises:
+        HTTPException: If there is no such job.
+    """
+    job = await asyncio.to_thread(job_queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
 
 @router.get("/database/{db_name}/context")
 async def get_database_context(
@@ -115,18 +507,53 @@ async def get_database_context(
     Args:
         db_name: Database name
         include_tables: If True, includes context for all tables
-        include_columns: If True, includes context for all columns
+        include_columns: If True, includes context for all columns (under their tables)
     """
     try:
-        context = await context_store.retrieve_context(
+        # The whole subtree comes back in one query per level
+        context = await context_store.retrieve_subtree(
             entity_type="database",
             entity_name=db_name,
-            include_children=include_tables or include_columns
+            depth=2 if include_columns else 1 if include_tables else 0
         )
         return context
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Endpoint to load a database's contexts into memory
+@router.post("/database/{db_name}/context/load")
+async def load_database_context(db_name: str):
+    """
+    Load the partition holding a database's contexts ahead of its first lookup.
+    
+    Args:
+        db_name: Database name
+
+    Returns:
+        Dict[str, Any]: The database, its partition and status.
+    """
+    try:
+        return await asyncio.to_thread(context_store.load_database, db_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint to release a database's contexts from memory
+@router.post("/database/{db_name}/context/release")
+async def release_database_context(db_name: str):
+    """
+    Release the partition holding a database's contexts; it is loaded again on next use.
+    
+    Args:
+        db_name: Database name
+
+    Returns:
+        Dict[str, Any]: The database, its partition and status.
+    """
+    try:
+        return await asyncio.to_thread(context_store.release_database, db_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.put("/database/{db_name}/context")
 async def update_database_context(
     db_name: str,
@@ -148,7 +575,10 @@ async def update_database_context(
             entity_name=db_name,
             context_data=context_dict
         )
+        sql_cache.invalidate(db_name)
         return updated_context
+    except LLMOverloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -196,7 +626,10 @@ async def update_table_context(
             entity_name=f"{db_name}.{table_name}",
             context_data=context.dict()
         )
+        sql_cache.invalidate(db_name)
         return updated_context
+    except LLMOverloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -245,13 +678,16 @@ async def update_column_context(
             entity_name=f"{db_name}.{table_name}.{column_name}",
             context_data=context.dict()
         )
+        sql_cache.invalidate(db_name)
         return updated_context
+    except LLMOverloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Optional: Bulk operations for efficiency
+# Bulk operations for efficiency
 
-@router.put("/database/{db_name}/bulk-context")
+@router.put("/database/{db_name}/bulk-context", status_code=202)
 async def update_bulk_context(
     db_name: str,
     context: DatabaseContext,
@@ -259,7 +695,10 @@ async def update_bulk_context(
     include_columns: bool = True
 ) -> ContextResponse:
     """
-    Bulk update context for database, its tables, and columns.
+    Queue a bulk update of context for database, its tables, and columns.
+
+    The update runs as a background job; a newer upload for the same database
+    replaces one that has not started yet.
     
     Args:
         db_name: Database name
@@ -268,7 +707,16 @@ async def update_bulk_context(
         include_columns: If True, updates column contexts
     """
     try:
-        # Implement bulk update logic
-        pass
+        job, created = await asyncio.to_thread(job_queue.enqueue, "bulk_context", db_name, {
+            "db_name": db_name,
+            "context": context.model_dump(mode="json"),
+            "include_tables": include_tables,
+            "include_columns": include_columns
+        })
+        return ContextResponse(
+            status="queued",
+            message=f"Context update for database {db_name} {'queued' if created else 'merged into queued job'}",
+            data={"job": job}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -9,4 +9,102 @@ class Settings(BaseSettings):
     MILVUS_PORT: str = "19530"
     OLLAMA_API_URL: str = "http://localhost:11434"
 
-settings = Settings()
\ No newline at end of file
+    # Connection pooling (one pool per target database)
+    POOL_MIN_SIZE: int = 1
+    POOL_MAX_SIZE: int = 10
+    POOL_MAX_TOTAL: int = 50  # Upper bound on connections across all pools
+    POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    POOL_MAX_IDLE: float = 300.0  # Seconds before an idle connection is closed
+    POOL_IDLE_EVICT: float = 900.0  # Seconds before an unused pool is closed
+
+    # Catalog cache: seconds between fingerprint checks of a cached catalog
+    CATALOG_CHECK_INTERVAL: float = 2.0
+
+    # Embedding cache: in-memory LRU entries, and an on-disk tier shared by
+    # workers on the host (set EMBEDDING_CACHE_DIR to "" to disable it)
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_DIR: str = ".cache/embeddings"
+    EMBEDDING_CACHE_DISK_MAX_ROWS: int = 200000
+
+    # Schema ingestion: descriptions embedded per batch, and the size (bytes)
+    # above which a table description is split into parts
+    INGEST_BATCH_SIZE: int = 32
+    INGEST_DESCRIPTION_CHUNK_SIZE: int = 1024
+
+    # Bulk context writes: entities embedded and inserted per batch
+    CONTEXT_BATCH_SIZE: int = 64
+
+    # Background jobs (schema ingestion, bulk context): persisted in a local
+    # SQLite file and run by JOB_WORKERS threads, so at most that many compete
+    # with interactive requests; finished jobs are kept JOB_RETENTION seconds.
+    # Running jobs are heartbeated every JOB_HEARTBEAT_INTERVAL seconds and
+    # queued again once their heartbeat is JOB_STALE_AFTER seconds old
+    JOBS_DB_PATH: str = ".cache/jobs.sqlite3"
+    JOB_WORKERS: int = 1
+    JOB_RETENTION: float = 604800.0
+    JOB_HEARTBEAT_INTERVAL: float = 10.0
+    JOB_STALE_AFTER: float = 60.0
+
+    # Semantic SQL cache: reuse generated SQL for questions at least this similar
+    SQL_CACHE_ENABLED: bool = True
+    SQL_CACHE_SIMILARITY: float = 0.95
+    SQL_CACHE_TTL: float = 3600.0
+    SQL_CACHE_SIZE: int = 1000
+
+    # Guard for generated SQL: plans above these EXPLAIN estimates are rejected,
+    # SELECTs without a LIMIT get one, reads run in read-only transactions and
+    # every statement is cancelled after QUERY_STATEMENT_TIMEOUT seconds
+    QUERY_GUARD_ENABLED: bool = True
+    QUERY_MAX_COST: float = 1000000.0
+    QUERY_MAX_ESTIMATED_ROWS: int = 1000000
+    QUERY_ROW_LIMIT: int = 1000
+    QUERY_STATEMENT_TIMEOUT: float = 30.0
+
+    # Query result cache: results of read-only SQL keyed by (database, SQL), kept
+    # while pg_stat_user_tables shows no writes to the tables they read and for
+    # at most RESULT_CACHE_TTL seconds (the only check when the tables can't be
+    # determined); statements that write through the app drop the database's results
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_SIZE: int = 500
+    RESULT_CACHE_MAX_ROWS: int = 10000  # Larger results are not cached
+    RESULT_CACHE_TTL: float = 60.0
+    RESULT_CACHE_STATS_LAG: float = 1.0  # Seconds table statistics may trail committed writes
+
+    # Streaming /query: rows per server-side cursor fetch and hard row cap
+    QUERY_STREAM_FETCH_SIZE: int = 500
+    QUERY_STREAM_MAX_ROWS: int = 100000
+
+    # Schema section of the SQL prompt: vector hits used as seeds, longest
+    # foreign-key path used to join them, and the token budget it must fit
+    SCHEMA_SEARCH_LIMIT: int = 3
+    SCHEMA_CONTEXT_MAX_HOPS: int = 2
+    SCHEMA_CONTEXT_TOKEN_BUDGET: int = 1500
+
+    # Admission control for Ollama: concurrent embedding and generation calls;
+    # interactive callers beyond LLM_MAX_QUEUE waiting (or waiting longer than
+    # LLM_QUEUE_TIMEOUT seconds) get 429 with Retry-After, while background
+    # jobs always wait and only get slots no interactive caller is waiting for
+    LLM_SCHEDULER_ENABLED: bool = True
+    LLM_EMBED_CONCURRENCY: int = 4
+    LLM_GENERATE_CONCURRENCY: int = 2
+    LLM_MAX_QUEUE: int = 32
+    LLM_QUEUE_TIMEOUT: float = 30.0
+
+    # Share one execution between concurrent identical requests (embeddings,
+    # schema retrieval, SQL generation, read-only queries, catalog loads)
+    SINGLEFLIGHT_ENABLED: bool = True
+
+    # Instrumentation: per-stage histograms on /api/metrics and a Server-Timing
+    # header on every response; requests slower than the threshold (seconds)
+    # are logged with their stage breakdown
+    METRICS_ENABLED: bool = True
+    SLOW_REQUEST_THRESHOLD: float = 5.0
+    LOG_LEVEL: str = "INFO"
+
+    # Vector storage for schema/context collections: "milvus", or "embedded" for
+    # an in-process memory-mapped index (suits a few thousand entities, no server)
+    VECTOR_BACKEND: str = "milvus"
+    VECTOR_STORE_DIR: str = ".cache/vectors"
+    VECTOR_STORE_DTYPE: str = "float32"  # "float16" halves memory and disk but searches slower
+
+settings = Settings()
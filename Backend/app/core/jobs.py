@@ -0,0 +1,431 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.core.logging import get_logger
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# A request for a key that already has a job joins it, or (for queued jobs
+# only) replaces its parameters so the latest request wins
+JOIN = "join"
+REPLACE = "replace"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        params TEXT NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        total INTEGER,
+        result TEXT,
+        error TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        owner TEXT,
+        heartbeat_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+    CREATE INDEX IF NOT EXISTS jobs_key ON jobs (kind, key, status)
+"""
+
+# Columns added after the first release of the jobs table
+MIGRATIONS = {"owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+              "heartbeat_at": "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL"}
+
+COLUMNS = "id, kind, key, status, done, total, result, error, cancel_requested, created_at, started_at, finished_at"
+
+Progress = Callable[[int, int], None]
+Handler = Callable[[Dict[str, Any], Progress], Dict[str, Any]]
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once its cancellation was requested."""
+
+
+def _owner_gone(owner: str) -> bool:
+    """Whether a job owner (``host:pid:instance``) is a process of this host that has exited."""
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, ValueError):
+        pass
+    return False
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value, timezone.utc).isoformat() if value is not None else None
+
+
+class JobQueue:
+    """
+    Persistent queue of background jobs run by a bounded pool of worker threads.
+
+    Jobs are rows in a local SQLite file, so their status and progress survive
+    restarts, and several processes can share one file. A running job records
+    its owner (host, pid and queue instance), which heartbeats it every
+    ``heartbeat_interval`` seconds; a running job whose heartbeat is older than
+    ``stale_after`` seconds belongs to a stopped process and is queued again
+    (handlers must be idempotent). Claims and enqueues run in ``BEGIN
+    IMMEDIATE`` transactions, so each job is claimed by exactly one worker.
+
+    Each job has a ``key`` (e.g. the database): jobs with the same kind and
+    key never run concurrently, and a new request for a key that already has
+    a job is merged into it (see ``register``).
+
+    Handlers run on the queue's own ``workers`` threads, not the event loop's
+    executor, so at most that many jobs compete with interactive requests.
+    They report progress through a callback, which raises ``JobCancelled``
+    once the job has been cancelled.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = 1,
+        retention: float = 7 * 24 * 3600.0,
+        heartbeat_interval: float = 10.0,
+        stale_after: float = 60.0
+    ):
+        self.path = path
+        self.workers = workers
+        self.retention = retention
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Tuple[Handler, str]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._logger = get_logger("jobs")
+
+    def register(self, kind: str, handler: Handler, dedupe: str = JOIN):
+        """
+        Register the handler for a kind of job.
+
+        Args:
+            kind: Job kind.
+            handler: ``handler(params, progress)`` returning the job result; it
+                calls ``progress(done, total)`` as it goes.
+            dedupe: ``JOIN`` returns the queued or running job for the same key
+                instead of adding one; ``REPLACE`` updates a queued job's
+                parameters, and queues a new job behind a running one.
+        """
+        self._handlers[kind] = (handler, dedupe)
+
+    # Storage
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements under SQLite's write lock, so other processes see all of them or none."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _row(self, row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        (job_id, kind, key, status, done, total, result, error,
+         cancel_requested, created_at, started_at, finished_at) = row
+        end = finished_at if finished_at is not None else time.time()
+        elapsed = end - started_at if started_at is not None else None
+        rate = done / elapsed if elapsed and done else None
+        eta = None
+        if status == RUNNING and rate and total is not None:
+            eta = round(max(total - done, 0) / rate, 1)
+        return {
+            "id": job_id,
+            "kind": kind,
+            "key": key,
+            "status": status,
+            "cancel_requested": bool(cancel_requested),
+            "progress": {
+                "done": done,
+                "total": total,
+                "percent": round(100.0 * done / total, 1) if total else None,
+                "items_per_sec": round(rate, 2) if rate else None,
+                "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+                "eta_seconds": eta
+            },
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": _timestamp(created_at),
+            "started_at": _timestamp(started_at),
+            "finished_at": _timestamp(finished_at)
+        }
+
+    def _fetch(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._row(self._db().execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    # Lifecycle
+
+    def start(self):
+        """Recover interrupted jobs, prune old ones and start the workers (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            self._recover()
+            with self._transaction() as db:
+                db.execute(
+                    "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                    (SUCCEEDED, FAILED, CANCELLED, time.time() - self.retention)
+                )
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+
+    def _recover(self):
+        """
+        Queue again (or finish cancelling) the running jobs whose owner stopped heartbeating.
+
+        Jobs of live owners, including other processes sharing the file, are
+        left alone. Called with ``self._lock`` held.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            owners = db.execute("SELECT DISTINCT owner FROM jobs WHERE status = ? AND owner IS NOT NULL", (RUNNING,))
+            gone = [owner for (owner,) in owners.fetchall() if _owner_gone(owner)]
+            stale = "status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ? OR owner IN (%s))" % ", ".join("?" * len(gone))
+            args = (RUNNING, now - self.stale_after, *gone)
+            db.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, owner = NULL WHERE {stale} AND cancel_requested = 1",
+                (CANCELLED, now) + args
+            )
+            requeued = db.execute(
+                f"UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, heartbeat_at = NULL WHERE {stale}",
+                (QUEUED,) + args
+            ).rowcount
+        if requeued:
+            self._logger.warning("queued %d interrupted job(s) again", requeued)
+            self._wakeup.notify_all()
+
+    def _heartbeat(self):
+        """Keep this queue's running jobs alive and recover those of stopped processes."""
+        with self._lock:
+            while not self._stopping:
+                self._wakeup.wait(self.heartbeat_interval)
+                if self._stopping:
+                    return
+                try:
+                    self._db().execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ?",
+                        (time.time(), self.owner, RUNNING)
+                    )
+                    self._recover()
+                except sqlite3.Error as e:
+                    self._logger.warning("job heartbeat failed: %s", e)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop taking new jobs and wait up to ``timeout`` seconds for the workers to finish."""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+            threads, self._threads = self._threads, []
+            if self._heartbeat_thread is not None:
+                threads.append(self._heartbeat_thread)
+                self._heartbeat_thread = None
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        with self._lock:
+            if self._conn is not None and not any(thread.is_alive() for thread in threads):
+                self._conn.close()
+                self._conn = None
+
+    # Queue operations
+
+    def enqueue(self, kind: str, key: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a job, or merge it into the existing job for the same kind and key.
+
+        Returns:
+            Tuple[Dict[str, Any], bool]: The job, and whether a new one was created.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        dedupe = self._handlers[kind][1]
+        encoded = json.dumps(params)
+        with self._lock, self._transaction() as db:
+            existing = db.execute(
+                "SELECT id, status FROM jobs WHERE kind = ? AND key = ? AND status IN (?, ?) "
+                "AND cancel_requested = 0 ORDER BY created_at DESC LIMIT 1",
+                (kind, key, QUEUED, RUNNING)
+            ).fetchone()
+            if existing is not None:
+                job_id, status = existing
+                if dedupe == JOIN:
+                    return self._fetch(job_id), False
+                if status == QUEUED:
+                    db.execute("UPDATE jobs SET params = ? WHERE id = ?", (encoded, job_id))
+                    return self._fetch(job_id), False
+
+            job_id = uuid.uuid4().hex
+            db.execute(
+                "INSERT INTO jobs (id, kind, key, status, params, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, key, QUEUED, encoded, time.time())
+            )
+            self._wakeup.notify_all()
+            return self._fetch(job_id), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job with its progress, or None."""
+        with self._lock:
+            return self._fetch(job_id)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the most recent jobs, optionally only those with ``status``."""
+        query = f"SELECT {COLUMNS} FROM jobs"
+        args: tuple = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            args = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            return [self._row(row) for row in self._db().execute(query, args + (limit,)).fetchall()]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a job: queued jobs are cancelled at once, running ones at their next progress report.
+
+        Returns:
+            Optional[Dict[str, Any]]: The job, or None if it does not exist.
+        """
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            )
+            db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+            return self._fetch(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of jobs per status and the worker count."""
+        with self._lock:
+            counts = dict(self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": self.workers, "running_workers": len(self._threads), "jobs": counts}
+
+    # Workers
+
+    def _claim(self) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Mark the oldest queued job whose key has no running job as running, owned by this queue.
+
+        The lookup and the update share one write transaction, so two workers
+        (in this or another process) never claim the same job or run two jobs
+        of one key.
+        """
+        if not self._handlers:
+            return None
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT id, kind, params FROM jobs AS j WHERE status = ? AND kind IN (%s) AND NOT EXISTS ("
+                "SELECT 1 FROM jobs AS r WHERE r.status = ? AND r.kind = j.kind AND r.key = j.key"
+                ") ORDER BY created_at LIMIT 1" % ", ".join("?" * len(self._handlers)),
+                (QUEUED, *self._handlers, RUNNING)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, kind, params = row
+            now = time.time()
+            claimed = db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, now, self.owner, now, job_id, QUEUED)
+            ).rowcount
+        return (job_id, kind, json.loads(params)) if claimed == 1 else None
+
+    def _work(self):
+        while True:
+            with self._lock:
+                job = None
+                while not self._stopping:
+                    job = self._claim()
+                    if job is not None:
+                        break
+                    # Also wakes when a running job of a blocked key finishes
+                    self._wakeup.wait(1.0)
+                if job is None:
+                    return
+            self._run(*job)
+
+    def _progress(self, job_id: str) -> Progress:
+        def progress(done: int, total: int):
+            with self._lock:
+                db = self._db()
+                db.execute("UPDATE jobs SET done = ?, total = ? WHERE id = ?", (done, total, job_id))
+                cancelled = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            if cancelled:
+                raise JobCancelled(f"Job {job_id} was cancelled")
+        return progress
+
+    def _run(self, job_id: str, kind: str, params: Dict[str, Any]):
+        handler = self._handlers[kind][0]
+        status, result, error = SUCCEEDED, None, None
+        try:
+            result = json.dumps(handler(params, self._progress(job_id)), default=str)
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            status, error = FAILED, str(e)
+            self._logger.warning("job %s (%s) failed: %s", job_id, kind, e)
+        with self._lock:
+            # A job queued again while this process looked dead now belongs to its new owner
+            self._db().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND owner = ?",
+                (status, result, error, time.time(), job_id, self.owner)
+            )
+            self._wakeup.notify_all()
+
+
+job_queue = JobQueue(
+    settings.JOBS_DB_PATH,
+    workers=settings.JOB_WORKERS,
+    retention=settings.JOB_RETENTION,
+    heartbeat_interval=settings.JOB_HEARTBEAT_INTERVAL,
+    stale_after=settings.JOB_STALE_AFTER
+)
@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics, record_stage
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+LLM_QUEUE_WAIT = metrics.histogram("talkdb_llm_queue_wait_seconds", "Time LLM calls waited for a slot.")
+
+# Priority of the LLM calls made in the current context; background jobs lower it
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Run a block (and the tasks and threads it starts) with the given LLM call priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class LLMOverloaded(Exception):
+    """Raised when an interactive LLM call cannot be admitted; retry after ``retry_after`` seconds."""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"Too many pending {pool} requests, retry in {retry_after} s")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "wake", "granted", "abandoned")
+
+    def __init__(self, priority: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.wake = wake
+        self.granted = False
+        self.abandoned = False
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Admission control for one class of Ollama calls (embedding or generation).
+
+    At most ``concurrency`` calls run at once; the rest wait in a priority
+    queue, interactive before background and first come, first served within
+    a priority, and a finishing call hands its slot straight to the next
+    waiter. Interactive callers are rejected with ``LLMOverloaded`` when
+    ``max_queue`` of them are already waiting, or after waiting ``timeout``
+    seconds; background callers always wait. ``slot`` is for coroutines,
+    ``slot_sync`` for blocking callers in worker threads.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, timeout: Optional[float]):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._service_seconds: Optional[float] = None  # Moving average of a call's duration
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _retry_after(self) -> int:
+        """Seconds until the queue ahead of a new caller has likely drained."""
+        waiting = self._waiting[INTERACTIVE] + 1
+        service = self._service_seconds or 1.0
+        return max(1, math.ceil(waiting * service / self.concurrency))
+
+    def _enter(self, priority: int, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """Take a free slot (None) or join the queue (the waiter to wait on)."""
+        with self._lock:
+            if self._active < self.concurrency:
+                self._active += 1
+                self.admitted += 1
+                return None
+            if priority == INTERACTIVE and self._waiting[INTERACTIVE] >= self.max_queue:
+                self.rejected += 1
+                raise LLMOverloaded(self.name, self._retry_after())
+            waiter = _Waiter(priority, wake)
+            heapq.heappush(self._heap, (priority, next(self._sequence), waiter))
+            self._waiting[priority] += 1
+            self.queued += 1
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Leave the queue; True if the slot was granted meanwhile (the caller then owns it)."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.abandoned = True
+            self._waiting[waiter.priority] -= 1
+            return False
+
+    def _release(self, seconds: Optional[float]):
+        with self._lock:
+            if seconds is not None:
+                previous = self._service_seconds
+                self._service_seconds = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+            while self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if waiter.abandoned:
+                    continue
+                self._waiting[waiter.priority] -= 1
+                self.admitted += 1
+                waiter.granted = True
+                waiter.wake()
+                return
+            self._active -= 1
+
+    def _timed_out(self) -> LLMOverloaded:
+        with self._lock:
+            self.timeouts += 1
+            return LLMOverloaded(self.name, self._retry_after())
+
+    def _waited(self, priority: int, seconds: float, queued: bool):
+        if settings.METRICS_ENABLED:
+            LLM_QUEUE_WAIT.observe(seconds, pool=self.name, priority=PRIORITY_NAMES[priority])
+            if queued:
+                record_stage(f"llm_queue_{self.name}", seconds)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one call slot for the duration of the block."""
+        if not settings.LLM_SCHEDULER_ENABLED:
+            yield
+            return
+        priority = _priority.get()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enter(priority, lambda: loop.call_soon_threadsafe(_resolve, future))
+        if waiter is not None:
+            timeout = self.timeout if priority == INTERACTIVE else None
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    raise self._timed_out()
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    self._release(None)
+                raise
+        self._waited(priority, time.perf_counter() - started, waiter is not None)
+        held = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - held)
+
+    @contextmanager
+    def slot_sync(self):
+        """Blocking counterpart of ``slot``."""
+        if not settings.LLM_SCHEDULER_ENABLED:
+            yield
+            return
+        priority = _priority.get()
+        started = time.perf_counter()
+        event = threading.Event()
+        waiter = self._enter(priority, event.set)
+        if waiter is not None:
+            timeout = self.timeout if priority == INTERACTIVE else None
+            if not event.wait(timeout) and not self._abandon(waiter):
+                raise self._timed_out()
+        self._waited(priority, time.perf_counter() - started, waiter is not None)
+        held = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - held)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "in_flight": self._active,
+                "waiting": {PRIORITY_NAMES[priority]: count for priority, count in self._waiting.items()},
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_call_seconds": round(self._service_seconds, 3) if self._service_seconds is not None else None
+            }
+
+
+_schedulers = {
+    "embed": LLMScheduler(
+        "embed", settings.LLM_EMBED_CONCURRENCY, settings.LLM_MAX_QUEUE, settings.LLM_QUEUE_TIMEOUT
+    ),
+    "generate": LLMScheduler(
+        "generate", settings.LLM_GENERATE_CONCURRENCY, settings.LLM_MAX_QUEUE, settings.LLM_QUEUE_TIMEOUT
+    )
+}
+
+
+def llm_scheduler(pool: str) -> LLMScheduler:
+    """Return the scheduler of a pool: ``embed`` or ``generate``."""
+    return _schedulers[pool]
+
+
+def llm_scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Return slots, queue depths and admission counters per pool."""
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
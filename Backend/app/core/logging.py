@@ -0,0 +1,23 @@
+import logging
+from app.core.config import settings
+
+_configured = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Return a logger under the ``talkdb`` namespace.
+
+    The namespace gets one stream handler at LOG_LEVEL the first time a logger
+    is requested, so messages show up under uvicorn without extra setup.
+    """
+    global _configured
+    root = logging.getLogger("talkdb")
+    if not _configured:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(settings.LOG_LEVEL)
+        root.propagate = False
+        _configured = True
+    return root.getChild(name)
@@ -0,0 +1,255 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.core.logging import get_logger
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, Any], float]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[Tuple[str, Any]]) -> str:
+    text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + text + "}" if text else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """Prometheus-style histogram with a fixed set of labels per series."""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: Dict[Labels, List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(sorted((name, str(label)) for name, label in labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(values[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Histograms recorded on the hot path plus collectors read at scrape time.
+
+    Collectors return ``(name, type, help, samples)`` for values that are
+    already counted elsewhere (cache hit counters, pool sizes), so they cost
+    nothing until ``/metrics`` is scraped.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(name, help, buckets)
+            return histogram
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            histograms = list(self._histograms.values())
+        for histogram in histograms:
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception:
+                get_logger("metrics").exception("Error collecting metrics")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for sample_name, labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("talkdb_stage_seconds", "Time spent per pipeline stage.")
+REQUEST_SECONDS = metrics.histogram("talkdb_request_seconds", "HTTP request latency until the response headers.")
+LLM_TOKENS = metrics.histogram("talkdb_llm_tokens", "Prompt and completion tokens per LLM call.", TOKEN_BUCKETS)
+QUERY_ROWS = metrics.histogram("talkdb_query_rows", "Rows returned per executed query.", ROW_BUCKETS)
+
+# Stages recorded while handling the current request, for the Server-Timing header
+_request_stages: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_stages", default=None
+)
+
+
+def record_stage(name: str, seconds: float):
+    """Record a stage duration in the histogram and the current request's timings."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.name, time.perf_counter() - self.start)
+
+
+_DISABLED = nullcontext()
+
+
+def stage(name: str):
+    """Context manager timing a block as ``name`` (a no-op when METRICS_ENABLED is off)."""
+    return _Stage(name) if settings.METRICS_ENABLED else _DISABLED
+
+
+def timed(name: str):
+    """
+    Decorator timing every call of a function or coroutine function as ``name``.
+
+    With METRICS_ENABLED off the function is returned unwrapped, so disabled
+    instrumentation costs nothing per call.
+    """
+    def decorate(fn):
+        if not settings.METRICS_ENABLED:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe_tokens(prompt: Optional[int], completion: Optional[int]):
+    """Record the token counts of one LLM call (None counts are skipped)."""
+    if not settings.METRICS_ENABLED:
+        return
+    if prompt is not None:
+        LLM_TOKENS.observe(prompt, kind="prompt")
+    if completion is not None:
+        LLM_TOKENS.observe(completion, kind="completion")
+
+
+def observe_rows(count: int):
+    """Record the number of rows a query returned."""
+    if settings.METRICS_ENABLED:
+        QUERY_ROWS.observe(count)
+
+
+def server_timing(stages: List[Tuple[str, float]], total: float) -> str:
+    """Format stage timings (summed per name, in first-seen order) as a Server-Timing header."""
+    durations: Dict[str, float] = {}
+    for name, seconds in stages:
+        durations[name] = durations.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware adding a ``Server-Timing`` header and request latency metrics.
+
+    Stages recorded while the request is handled (see ``stage``/``timed``)
+    are summed per name into the header; for streaming responses the header
+    covers the stages completed before the first byte. Requests slower than
+    SLOW_REQUEST_THRESHOLD are logged with their stage breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stages: List[Tuple[str, float]] = []
+        token = _request_stages.set(stages)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - start
+                # Stages may still be appended by worker threads; copy before reading
+                snapshot = list(stages)
+                header = server_timing(snapshot, total).encode("latin-1")
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header)]}
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                REQUEST_SECONDS.observe(total, route=path, method=scope["method"], status=message["status"])
+                log_slow_request(scope["method"], path, message["status"], total, snapshot)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
+
+
+def log_slow_request(method: str, path: str, status: int, total: float, stages: List[Tuple[str, float]]):
+    """Log a request that took longer than SLOW_REQUEST_THRESHOLD seconds, with its stages."""
+    if total < settings.SLOW_REQUEST_THRESHOLD:
+        return
+    get_logger("metrics").warning(
+        "slow request %s %s -> %s in %.1f ms: %s", method, path, status, total * 1000, server_timing(stages, total)
+    )
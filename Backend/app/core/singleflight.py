@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one execution.
+
+    Callers that ask for a key while a call for the same key is in flight wait
+    for that call and all receive its result (or its exception). Nothing is
+    cached: once the call finishes the next caller starts a new one. ``do`` is
+    for coroutines on the event loop, ``do_sync`` for blocking functions
+    called from worker threads.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    def _count(self, leader: bool):
+        self.calls += 1
+        if leader:
+            self.executions += 1
+        else:
+            self.collapsed += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()``, sharing the call with concurrent callers using the same key."""
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return await fn()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None or task.get_loop() is not loop
+            if leader:
+                task = self._tasks[key] = loop.create_task(fn())
+                task.add_done_callback(lambda done: self._finish(key, done))
+            self._count(leader)
+        # shield(): a caller that is cancelled must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every caller went away
+
+    def do_sync(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Call ``fn()``, sharing the call with concurrent callers (threads) using the same key."""
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._tasks) + len(self._calls)
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def singleflight(name: str) -> SingleFlight:
+    """Return the shared single-flight group for ``name`` (e.g. a pipeline stage)."""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+        return group
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """Return call/execution/collapsed counters for every group."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
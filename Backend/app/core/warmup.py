@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from app.core.logging import get_logger
+
+logger = get_logger("warmup")
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class _Subsystem:
+    def __init__(self, name: str, warm: Callable[[], Any], required: bool):
+        self.name = name
+        self.warm = warm
+        self.required = required
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self.attempts = 0
+        self.finished_at = 0.0
+
+
+class WarmupRegistry:
+    """
+    Background warm-up of the app's heavy subsystems.
+
+    Each registered subsystem is initialized in its own daemon thread so the
+    server accepts requests immediately; a subsystem that is not warm yet is
+    still initialized on first use. ``status()`` backs the readiness endpoint:
+    the process is ready once every required subsystem has warmed up. Failed
+    warm-ups are retried by ``start()`` at most every ``retry_interval`` seconds.
+    """
+
+    def __init__(self, retry_interval: float = 10.0):
+        self.retry_interval = retry_interval
+        self._subsystems: Dict[str, _Subsystem] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, warm: Callable[[], Any], required: bool = True):
+        """Register a warm-up callable under ``name``."""
+        with self._lock:
+            self._subsystems[name] = _Subsystem(name, warm, required)
+
+    def _run(self, subsystem: _Subsystem):
+        started = time.perf_counter()
+        try:
+            subsystem.warm()
+            subsystem.status, subsystem.error = READY, None
+        except Exception as e:
+            subsystem.status, subsystem.error = FAILED, str(e)
+            logger.exception("Warm-up of %s failed", subsystem.name)
+        finally:
+            subsystem.seconds = round(time.perf_counter() - started, 3)
+            subsystem.finished_at = time.monotonic()
+
+    def start(self) -> List[str]:
+        """
+        Start warming every pending subsystem, and failed ones due for a retry, in the background.
+
+        Returns:
+            List[str]: The subsystems that were started.
+        """
+        started = []
+        retry_before = time.monotonic() - self.retry_interval
+        with self._lock:
+            for subsystem in self._subsystems.values():
+                if subsystem.status == PENDING or (
+                    subsystem.status == FAILED and subsystem.finished_at <= retry_before
+                ):
+                    subsystem.status = WARMING
+                    subsystem.attempts += 1
+                    threading.Thread(
+                        target=self._run, args=(subsystem,), name=f"warmup-{subsystem.name}", daemon=True
+                    ).start()
+                    started.append(subsystem.name)
+        return started
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until no subsystem is warming; returns whether the app is ready."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(s.status == WARMING for s in list(self._subsystems.values())):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        return self.ready()
+
+    def ready(self) -> bool:
+        return all(s.status == READY for s in self._subsystems.values() if s.required)
+
+    def status(self) -> Dict[str, Any]:
+        """Return overall readiness and the state of each subsystem."""
+        with self._lock:
+            subsystems = {
+                s.name: {
+                    "status": s.status,
+                    "required": s.required,
+                    "seconds": s.seconds,
+                    "attempts": s.attempts,
+                    "error": s.error
+                }
+                for s in self._subsystems.values()
+            }
+        return {"ready": self.ready(), "subsystems": subsystems}
+
+
+warmup = WarmupRegistry()
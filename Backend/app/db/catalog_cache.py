@@ -0,0 +1,156 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.db.pool import pool_manager
+from app.db.session import get_databases, get_tables
+
+# Cheap change detector for the public schema: hashes the row versions (xmin)
+# of the catalog rows get_tables reads, plus relfilenode to catch rewrites.
+TABLES_FINGERPRINT_QUERY = """
+    WITH rels AS (
+        SELECT c.oid, c.relfilenode, c.xmin
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+        AND c.relkind IN ('r', 'p')
+        AND NOT c.relispartition
+    )
+    SELECT md5(concat_ws('|',
+        (SELECT string_agg(oid::text || ':' || relfilenode::text || ':' || xmin::text, ',' ORDER BY oid)
+         FROM rels),
+        (SELECT string_agg(a.attrelid::text || ':' || a.attnum::text || ':' || a.xmin::text, ','
+                           ORDER BY a.attrelid, a.attnum)
+         FROM pg_attribute a JOIN rels r ON r.oid = a.attrelid
+         WHERE a.attnum > 0),
+        (SELECT string_agg(d.objoid::text || ':' || d.objsubid::text || ':' || d.xmin::text, ','
+                           ORDER BY d.objoid, d.objsubid)
+         FROM pg_description d JOIN rels r ON r.oid = d.objoid
+         WHERE d.classoid = 'pg_class'::regclass),
+        (SELECT string_agg(con.oid::text || ':' || con.xmin::text, ',' ORDER BY con.oid)
+         FROM pg_constraint con JOIN rels r ON r.oid = con.conrelid)
+    ))
+"""
+
+
+class _Entry:
+    def __init__(self, value: Any, fingerprint: str):
+        self.value = value
+        self.fingerprint = fingerprint
+        self.etag = f'"{fingerprint}"'
+        self.checked_at = time.monotonic()
+
+
+class CatalogCache:
+    """
+    Process-wide cache over ``get_databases`` and ``get_tables``.
+
+    Cached entries are revalidated at most every ``check_interval`` seconds
+    with a cheap fingerprint query; the full catalog is only re-read when the
+    fingerprint changed. Every entry carries an ETag derived from its
+    fingerprint so the list endpoints can answer ``If-None-Match`` with 304.
+    """
+
+    def __init__(self, check_interval: float = 2.0):
+        self.check_interval = check_interval
+        self._databases: Optional[_Entry] = None
+        self._tables: Dict[str, _Entry] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, entry: Optional[_Entry]) -> bool:
+        return entry is not None and time.monotonic() - entry.checked_at < self.check_interval
+
+    def tables_fingerprint(self, database: str) -> str:
+        """Return the current catalog fingerprint of a database's public schema."""
+        with pool_manager.connection(database) as conn:
+            with conn.cursor() as cur:
+                cur.execute(TABLES_FINGERPRINT_QUERY)
+                return cur.fetchone()[0] or hashlib.md5(b"").hexdigest()
+
+    def get_databases(self) -> Tuple[List[str], str]:
+        """
+        Return the database list and its ETag.
+
+        The list itself is a single small query, so it doubles as its own
+        fingerprint and is simply re-read once the check interval has passed.
+        """
+        with self._lock("__databases__"):
+            if self._fresh(self._databases):
+                self.hits += 1
+                return self._databases.value, self._databases.etag
+
+            databases = get_databases()
+            fingerprint = hashlib.md5(json.dumps(sorted(databases)).encode()).hexdigest()
+            if self._databases is not None and self._databases.fingerprint == fingerprint:
+                self.hits += 1
+                self._databases.checked_at = time.monotonic()
+            else:
+                self.misses += 1
+                self._databases = _Entry(databases, fingerprint)
+            return self._databases.value, self._databases.etag
+
+    def get_tables(self, database: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Return the tables of a database and their ETag, refetching only on catalog change."""
+        with self._lock(database):
+            entry = self._tables.get(database)
+            if self._fresh(entry):
+                self.hits += 1
+                return entry.value, entry.etag
+
+            fingerprint = self.tables_fingerprint(database)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self.hits += 1
+                entry.checked_at = time.monotonic()
+                return entry.value, entry.etag
+
+            self.misses += 1
+            entry = _Entry(get_tables(database), fingerprint)
+            self._tables[database] = entry
+            return entry.value, entry.etag
+
+    def get_fingerprint(self, database: str) -> str:
+        """
+        Return the catalog fingerprint of a database without loading its tables.
+
+        A cached table list whose fingerprint no longer matches is dropped.
+        """
+        with self._lock(database):
+            entry = self._tables.get(database)
+            if self._fresh(entry):
+                return entry.fingerprint
+            fingerprint = self.tables_fingerprint(database)
+            if entry is not None:
+                if entry.fingerprint == fingerprint:
+                    entry.checked_at = time.monotonic()
+                else:
+                    self._tables.pop(database, None)
+            return fingerprint
+
+    def invalidate(self, database: Optional[str] = None):
+        """Drop cached entries for one database, or everything if None."""
+        if database is None:
+            self._databases = None
+            self._tables.clear()
+        else:
+            self._tables.pop(database, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the cached databases."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "databases_cached": self._databases is not None,
+            "tables_cached": sorted(self._tables)
+        }
+
+
+catalog_cache = CatalogCache(check_interval=settings.CATALOG_CHECK_INTERVAL)
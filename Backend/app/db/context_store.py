@@ -1,55 +1,246 @@
-from pymilvus import connections, Collection, utility
-import ollama
+import asyncio
+import hashlib
 import json
-from typing import Dict, Any, List, Optional
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
 from app.models.context import DatabaseContext, TableContext, ColumnContext
-import numpy as np
+from app.core.jobs import JobCancelled
+from app.core.llm_scheduler import LLMOverloaded
+from app.core.logging import get_logger
+from app.core.metrics import timed
+from app.core.singleflight import singleflight
+from app.utils.embedding_cache import normalize_text
+from app.utils.embeddings import EMBEDDING_MODEL, embed_text, embed_texts
+from app.db.milvus_client import milvus_manager, pymilvus
+from app.db.vector_backends import DEFAULT_PARTITION, VectorBackend, MILVUS_INDEX_PARAMS, get_vector_backend
+
+# Primary key of a context row, derived from (entity_type, entity_name); see entity_key
+KEY_FIELD = "entity_key"
+ENTITY_KEY_MAX_LENGTH = 64
+
+# Scalar fields that lookups filter on; each gets a scalar index
+LOOKUP_FIELDS = ["entity_type", "entity_name", "parent_entity"]
+MILVUS_SCALAR_INDEX_PARAMS = {"index_type": "INVERTED"}
+
+# Rows per page when migrating a collection to the current schema
+MIGRATION_PAGE_SIZE = 1000
+
+# Not of the form "<database>_schema", so no database's schema collection can take it
+CONTEXT_COLLECTION = "talkdb_context"
+# Where contexts were stored before; also the schema collection of a database named "structure"
+LEGACY_CONTEXT_COLLECTION = "structure_schema"
+
+# Parents per `parent_entity in [...]` query, and rows per page, when fetching a subtree
+SUBTREE_CHUNK_SIZE = 1000
+SUBTREE_PAGE_SIZE = 1000
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def serialize_context(context_data: Dict[str, Any]) -> str:
+    """Serialize context data for the context_data field (datetimes as ISO strings)."""
+    return json.dumps(context_data, default=_json_default)
+
+def entity_key(entity_type: str, entity_name: str) -> str:
+    """
+    Primary key of an entity's context row.
+
+    A hash of (entity_type, entity_name), so every writer derives the same key
+    and a store is an upsert on it, and exact lookups are primary key lookups.
+    """
+    return hashlib.sha256(json.dumps([entity_type, entity_name]).encode("utf-8")).hexdigest()
+
+def entity_database(entity_name: str) -> str:
+    """Database an entity belongs to: the first part of its dotted name (db, db.table, db.table.column)."""
+    return entity_name.split(".", 1)[0]
+
+def database_partition(database: str) -> str:
+    """
+    Partition holding a database's contexts.
+
+    Milvus partition names allow only letters, digits and underscores, so the
+    name is sanitized and suffixed with a hash of the database name to stay unique.
+    """
+    readable = re.sub(r"[^0-9A-Za-z_]", "_", database)[:64]
+    return f"db_{readable}_{hashlib.sha256(database.encode('utf-8')).hexdigest()[:8]}"
+
+def entity_partition(entity_name: str) -> str:
+    return database_partition(entity_database(entity_name))
 
 class ContextStore:
-    def __init__(self, collection_name: str = "enhanced_schema"):
+    """
+    Context of databases, tables and columns, stored with an embedding per entity.
+
+    Each database's entities live in their own partition of the collection, so
+    lookups and searches scoped to a database touch only its vectors, and a
+    database can be loaded and released on its own.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = CONTEXT_COLLECTION,
+        backend: Optional[VectorBackend] = None,
+        legacy_collection_name: Optional[str] = None
+    ):
         self.collection_name = collection_name
-        self.embedding_model = "mxbai-embed-large:335m-v1-fp16"
-        self._ensure_connection()
-        self._ensure_collection()
+        self.legacy_collection_name = legacy_collection_name
+        self.embedding_model = EMBEDDING_MODEL
+        self.backend = backend or get_vector_backend(collection_name, create=self._create_collection)
+        # Every read names a database partition, so serving one database never loads the others
+        self.backend.require_partition = True
+        # The backend is opened on first use (or by the startup warm-up), not at import
+        self._ready = False
+        self._ready_lock = threading.Lock()
 
-    def _ensure_connection(self):
-        """Ensure connection to Milvus is established."""
-        try:
-            connections.connect("default", host="localhost", port="19530")
-        except Exception as e:
-            raise ConnectionError(f"Failed to connect to Milvus: {str(e)}")
+    def ensure_ready(self):
+        """Open the vector backend, create or migrate the collection if needed; runs once."""
+        if self._ready:
+            return
+        with self._ready_lock:
+            if not self._ready:
+                try:
+                    if self.legacy_collection_name and not self.backend.exists():
+                        self._adopt_legacy_collection()
+                    staging = self._staging_backend()
+                    if staging.exists() and not self.backend.exists():
+                        # A migration stopped between dropping the old collection and renaming the new one
+                        self.backend.replace(staging)
+                    self.backend.ensure_ready()
+                    if not self.backend.has_field(KEY_FIELD):
+                        self._migrate(staging)
+                    elif self.backend.query({}, [KEY_FIELD], limit=1, partition=DEFAULT_PARTITION):
+                        self._partition_rows()
+                except Exception as e:
+                    raise Exception(f"Failed to ensure collection exists: {str(e)}")
+                self._ready = True
 
-    def _ensure_collection(self):
-        """Ensure the collection exists, create if it doesn't."""
-        try:
-            if not utility.has_collection(self.collection_name):
-                from pymilvus import FieldSchema, CollectionSchema, DataType
-                fields = [
-                    FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                    FieldSchema(name="entity_type", dtype=DataType.VARCHAR, max_length=50),
-                    FieldSchema(name="entity_name", dtype=DataType.VARCHAR, max_length=100),
-                    FieldSchema(name="parent_entity", dtype=DataType.VARCHAR, max_length=100),
-                    FieldSchema(name="context_data", dtype=DataType.VARCHAR, max_length=65535),
-                    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=1024)
-                ]
-                schema = CollectionSchema(fields)
-                collection = Collection(self.collection_name, schema)
-                index_params = {
-                    "metric_type": "IP",
-                    "index_type": "IVF_FLAT",
-                    "params": {"nlist": 128}
-                }
-                collection.create_index(field_name="embedding", index_params=index_params)
-                return collection
-            return Collection(self.collection_name)
-        except Exception as e:
-            raise Exception(f"Failed to ensure collection exists: {str(e)}")
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def _create_collection(self, collection_name: Optional[str] = None):
+        """Create the Milvus collection, its vector index and the scalar indexes of the lookup fields."""
+        FieldSchema, DataType = pymilvus.FieldSchema, pymilvus.DataType
+        fields = [
+            FieldSchema(name=KEY_FIELD, dtype=DataType.VARCHAR, max_length=ENTITY_KEY_MAX_LENGTH, is_primary=True),
+            FieldSchema(name="entity_type", dtype=DataType.VARCHAR, max_length=50),
+            FieldSchema(name="entity_name", dtype=DataType.VARCHAR, max_length=100),
+            FieldSchema(name="parent_entity", dtype=DataType.VARCHAR, max_length=100),
+            FieldSchema(name="context_data", dtype=DataType.VARCHAR, max_length=65535),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=1024)
+        ]
+        schema = pymilvus.CollectionSchema(fields)
+        collection = pymilvus.Collection(collection_name or self.collection_name, schema, using=milvus_manager.alias)
+        collection.create_index(field_name="embedding", index_params=MILVUS_INDEX_PARAMS)
+        for field in LOOKUP_FIELDS:
+            try:
+                collection.create_index(
+                    field_name=field, index_params=MILVUS_SCALAR_INDEX_PARAMS, index_name=f"{field}_index"
+                )
+            except pymilvus.MilvusException as e:
+                # INVERTED indexes need Milvus 2.4+; without them lookups still work, by scanning
+                get_logger("context_store").warning("no scalar index on %s.%s: %s", collection.name, field, e)
+
+    def _adopt_legacy_collection(self):
+        """Take over the collection contexts were stored in under their old name, by renaming it."""
+        legacy = get_vector_backend(self.legacy_collection_name)
+        if not legacy.exists():
+            return
+        # A schema collection of the same name has no partitions, and table_name rows instead of entities
+        if legacy.partitions() or (legacy.has_field("entity_type") and not legacy.has_field("table_name")):
+            self.backend.replace(legacy)
+            get_logger("context_store").info(
+                "renamed context collection %s to %s", self.legacy_collection_name, self.collection_name
+            )
+
+    def _staging_backend(self) -> VectorBackend:
+        name = f"{self.collection_name}_migration"
+        return get_vector_backend(name, create=lambda: self._create_collection(name))
+
+    def _migrate(self, staging: VectorBackend):
+        """
+        Copy a collection written before entity keys into the current schema.
+
+        Rows are copied page by page into a staging collection created with the
+        current schema (keyed by ``entity_key``, with scalar indexes, and
+        partitioned by database), which then replaces the old collection.
+        Duplicate rows of an entity, left by racing delete-then-insert writers,
+        collapse into one.
+        """
+        logger = get_logger("context_store")
+        started = time.perf_counter()
+        staging.drop()
+        staging.ensure_ready()
+        copied = 0
+        output_fields = LOOKUP_FIELDS + ["context_data", "embedding"]
+        # Collections from before entity keys predate partitions too: every row is in the default one
+        for page in self.backend.query_pages({}, output_fields, MIGRATION_PAGE_SIZE, partition=DEFAULT_PARTITION):
+            rows = [
+                {KEY_FIELD: entity_key(row["entity_type"], row["entity_name"]), **{field: row[field] for field in output_fields}}
+                for row in page
+            ]
+            self._upsert_rows(rows, staging)
+            copied += len(page)
+        self.backend.replace(staging)
+        self.backend.ensure_ready()
+        logger.info(
+            "migrated %s to entity keys: %d rows copied in %.1f s",
+            self.collection_name, copied, time.perf_counter() - started
+        )
+
+    def _partition_rows(self):
+        """Move rows written before per-database partitions from the default partition to their database's."""
+        logger = get_logger("context_store")
+        started = time.perf_counter()
+        moved = 0
+        output_fields = [KEY_FIELD] + LOOKUP_FIELDS + ["context_data", "embedding"]
+        for page in self.backend.query_pages({}, output_fields, MIGRATION_PAGE_SIZE, partition=DEFAULT_PARTITION):
+            # Written to the new partition before being deleted from the old one, so nothing is lost midway
+            self._upsert_rows(page)
+            self.backend.delete({KEY_FIELD: [row[KEY_FIELD] for row in page]}, DEFAULT_PARTITION)
+            moved += len(page)
+        logger.info(
+            "partitioned %s by database: %d rows moved in %.1f s",
+            self.collection_name, moved, time.perf_counter() - started
+        )
+
+    def _upsert_rows(self, rows: List[Dict[str, Any]], backend: Optional[VectorBackend] = None):
+        """Upsert rows into their databases' partitions; a key appearing twice keeps its last row."""
+        partitions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for row in rows:
+            partitions.setdefault(entity_partition(row["entity_name"]), {})[row[KEY_FIELD]] = row
+        for partition, keyed in partitions.items():
+            (backend or self.backend).upsert(list(keyed.values()), KEY_FIELD, partition)
+
+    def load_database(self, database: str) -> Dict[str, Any]:
+        """Load a database's contexts into memory ahead of its first lookup (blocking)."""
+        self.ensure_ready()
+        partition = database_partition(database)
+        self.backend.load_partition(partition)
+        return {"database": database, "partition": partition, "status": "loaded"}
+
+    def release_database(self, database: str) -> Dict[str, Any]:
+        """Free the memory held by a database's contexts; they are loaded again on next use (blocking)."""
+        self.ensure_ready()
+        partition = database_partition(database)
+        self.backend.release_partition(partition)
+        return {"database": database, "partition": partition, "status": "released"}
 
     def _generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for given text using Ollama."""
+        """Generate embedding for given text using Ollama (cached)."""
         try:
-            response = ollama.embed(model=self.embedding_model, input=text)
-            return response["embeddings"][0]
+            # Threads embedding the same text concurrently share one call
+            return singleflight("embedding").do_sync(
+                (self.embedding_model, normalize_text(text)),
+                lambda: embed_text(text, self.embedding_model)
+            )
+        except LLMOverloaded:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to generate embedding: {str(e)}")
 
@@ -70,12 +261,12 @@ class ContextStore:
         if entity_type == "column":
             text_parts.extend([
                 f"Data Type: {context_data.get('data_type', '')}",
-                f"Constraints: {', '.join(context_data.get('constraints', []))}"
+                f"Constraints: {', '.join(context_data.get('constraints') or [])}"
             ])
         elif entity_type == "table":
             text_parts.extend([
-                f"Primary Key: {', '.join(context_data.get('primary_key', []))}",
-                f"Foreign Keys: {json.dumps(context_data.get('foreign_keys', {}))}"
+                f"Primary Key: {', '.join(context_data.get('primary_key') or [])}",
+                f"Foreign Keys: {json.dumps(context_data.get('foreign_keys') or {})}"
             ])
         elif entity_type == "database":
             text_parts.extend([
@@ -84,6 +275,7 @@ class ContextStore:
         
         return "\n".join(filter(None, text_parts))
 
+    @timed("context_store.store_context")
     async def store_context(
         self,
         entity_type: str,
@@ -91,29 +283,39 @@ class ContextStore:
         context_data: Dict[str, Any],
         parent_entity: str = ""
     ) -> Dict[str, Any]:
-        """Store context information in Milvus."""
+        """Store context information in the vector store."""
+        # Embedding and vector store calls block, so keep them off the event loop
+        return await asyncio.to_thread(
+            self._store_context, entity_type, entity_name, context_data, parent_entity
+        )
+
+    def _store_context(
+        self,
+        entity_type: str,
+        entity_name: str,
+        context_data: Dict[str, Any],
+        parent_entity: str
+    ) -> Dict[str, Any]:
         try:
-            collection = Collection(self.collection_name)
+            self.ensure_ready()
             
             # Prepare context text and generate embedding
             context_text = self._prepare_context_text(context_data, entity_type)
             embedding = self._generate_embedding(context_text)
             
-            # Store in Milvus
-            data = [
-                [entity_type],
-                [entity_name],
-                [parent_entity],
-                [json.dumps(context_data)],
-                [embedding]
-            ]
-            
-            # Delete existing context if it exists
-            expr = f'entity_type == "{entity_type}" && entity_name == "{entity_name}"'
-            collection.delete(expr)
-            
-            # Insert new context
-            collection.insert(data)
+            # Replace any existing context for the entity
+            self.backend.upsert(
+                [{
+                    KEY_FIELD: entity_key(entity_type, entity_name),
+                    "entity_type": entity_type,
+                    "entity_name": entity_name,
+                    "parent_entity": parent_entity,
+                    "context_data": serialize_context(context_data),
+                    "embedding": embedding
+                }],
+                KEY_FIELD,
+                entity_partition(entity_name)
+            )
             
             return {
                 "status": "success",
@@ -121,25 +323,128 @@ class ContextStore:
                 "data": context_data
             }
             
+        except LLMOverloaded:
+            raise
         except Exception as e:
             raise Exception(f"Failed to store context: {str(e)}")
 
+    @timed("context_store.store_contexts_bulk")
+    async def store_contexts_bulk(
+        self,
+        entities: List[Dict[str, Any]],
+        batch_size: int = 64,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Store many contexts at once.
+
+        Args:
+            entities: Dicts with ``entity_type``, ``entity_name``, ``context_data``
+                and optionally ``parent_entity``.
+            batch_size: Number of entities embedded and upserted per batch.
+            progress: Called as ``progress(done, total)`` with the entities embedded
+                so far; if it raises, nothing has been written yet.
+        """
+        return await asyncio.to_thread(self.store_contexts_bulk_sync, entities, batch_size, progress)
+
+    def store_contexts_bulk_sync(
+        self,
+        entities: List[Dict[str, Any]],
+        batch_size: int = 64,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """Blocking counterpart of ``store_contexts_bulk``, for worker threads."""
+        try:
+            timings = {"embed": 0.0, "upsert": 0.0}
+            started = time.perf_counter()
+            self.ensure_ready()
+
+            # Embed in batches: one Ollama call per batch
+            texts = [
+                self._prepare_context_text(entity["context_data"], entity["entity_type"])
+                for entity in entities
+            ]
+            embeddings: List[List[float]] = []
+            for offset in range(0, len(texts), batch_size):
+                start = time.perf_counter()
+                embeddings.extend(embed_texts(texts[offset:offset + batch_size], self.embedding_model))
+                timings["embed"] += time.perf_counter() - start
+                if progress is not None:
+                    progress(len(embeddings), len(texts))
+
+            # One upsert per batch (and database) replaces existing contexts by entity key
+            batches = 0
+            for offset in range(0, len(entities), batch_size):
+                batch = entities[offset:offset + batch_size]
+                rows = [
+                    {
+                        KEY_FIELD: entity_key(entity["entity_type"], entity["entity_name"]),
+                        "entity_type": entity["entity_type"],
+                        "entity_name": entity["entity_name"],
+                        "parent_entity": entity.get("parent_entity", ""),
+                        "context_data": serialize_context(entity["context_data"]),
+                        "embedding": embedding
+                    }
+                    for entity, embedding in zip(batch, embeddings[offset:offset + batch_size])
+                ]
+                start = time.perf_counter()
+                self._upsert_rows(rows)
+                timings["upsert"] += time.perf_counter() - start
+                batches += 1
+
+            counts: Dict[str, int] = {}
+            for entity in entities:
+                counts[entity["entity_type"]] = counts.get(entity["entity_type"], 0) + 1
+
+            return {
+                "entities": len(entities),
+                "by_type": counts,
+                "batches": batches,
+                "timings": {
+                    **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in timings.items()},
+                    "total_seconds": round(time.perf_counter() - started, 3)
+                }
+            }
+
+        except JobCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to store contexts in bulk: {str(e)}")
+
+    @timed("context_store.retrieve_context")
     async def retrieve_context(
         self,
         entity_type: str,
         entity_name: str,
         include_children: bool = False
     ) -> Dict[str, Any]:
-        """Retrieve context information from Milvus."""
-        try:
-            collection = Collection(self.collection_name)
+        """Retrieve context information from the vector store (with its direct children if requested)."""
+        return await asyncio.to_thread(
+            self._retrieve_subtree, entity_type, entity_name, 1 if include_children else 0
+        )
 
-            collection.load()
-            
-            # Search for exact match
-            expr = f'entity_type == "{entity_type}" && entity_name == "{entity_name}"'
-            output_fields = ["context_data", "parent_entity"]
-            results = collection.query(expr, output_fields=output_fields)
+    @timed("context_store.retrieve_subtree")
+    async def retrieve_subtree(self, entity_type: str, entity_name: str, depth: int = 1) -> Dict[str, Any]:
+        """
+        Retrieve an entity and its descendants down to ``depth`` levels.
+
+        Each level is fetched with ``parent_entity in [...]`` queries covering
+        all of the previous level's entities at once (chunked, and paged for
+        large results), so a database with its tables and columns takes three
+        queries rather than one per entity. Children are grouped by entity type
+        under ``children`` and sorted by name.
+        """
+        return await asyncio.to_thread(self._retrieve_subtree, entity_type, entity_name, depth)
+
+    def _retrieve_subtree(self, entity_type: str, entity_name: str, depth: int) -> Dict[str, Any]:
+        try:
+            self.ensure_ready()
+            # The whole subtree lives in the database's partition
+            partition = entity_partition(entity_name)
+            # Exact match on the primary key
+            results = self.backend.query(
+                {KEY_FIELD: entity_key(entity_type, entity_name)}, ["context_data"], limit=1, partition=partition
+            )
             
             if not results:
                 return {
@@ -148,21 +453,32 @@ class ContextStore:
                 }
             
             context_data = json.loads(results[0]["context_data"])
-            
-            if include_children:
-                # Retrieve child contexts
-                child_expr = f'parent_entity == "{entity_name}"'
-                child_results = collection.query(child_expr, output_fields=output_fields)
-                
-                if child_results:
-                    children = {}
-                    for child in child_results:
-                        child_data = json.loads(child["context_data"])
-                        child_type = child_data.get("type", "unknown")
-                        if child_type not in children:
-                            children[child_type] = []
-                        children[child_type].append(child_data)
-                    context_data["children"] = children
+
+            # Retrieve child contexts level by level
+            output_fields = ["entity_type", "entity_name", "parent_entity", "context_data"]
+            level = {entity_name: context_data}
+            for _ in range(depth):
+                names = list(level)
+                children_level: Dict[str, Dict[str, Any]] = {}
+                for offset in range(0, len(names), SUBTREE_CHUNK_SIZE):
+                    pages = self.backend.query_pages(
+                        {"parent_entity": names[offset:offset + SUBTREE_CHUNK_SIZE]},
+                        output_fields,
+                        SUBTREE_PAGE_SIZE,
+                        partition=partition
+                    )
+                    for page in pages:
+                        for child in page:
+                            child_data = json.loads(child["context_data"])
+                            children = level[child["parent_entity"]].setdefault("children", {})
+                            children.setdefault(child["entity_type"], []).append(child_data)
+                            children_level[child["entity_name"]] = child_data
+                for parent in level.values():
+                    for children in parent.get("children", {}).values():
+                        children.sort(key=lambda child: child.get("name") or "")
+                if not children_level:
+                    break
+                level = children_level
             
             return {
                 "status": "success",
@@ -170,60 +486,74 @@ class ContextStore:
             }
             
         except Exception as e:
-
-            try:
-                collection.release()
-            except:
-                pass
             raise Exception(f"Failed to retrieve context: {str(e)}")
 
+    @timed("context_store.list_contexts")
+    def list_contexts(self, parent_entity: str, entity_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the decoded contexts stored under a parent entity (blocking)."""
+        try:
+            self.ensure_ready()
+            filters = {"parent_entity": parent_entity}
+            if entity_type:
+                filters["entity_type"] = entity_type
+            rows = self.backend.query(filters, ["context_data"], partition=entity_partition(parent_entity))
+            return [json.loads(row["context_data"]) for row in rows]
+        except Exception as e:
+            raise Exception(f"Failed to list contexts: {str(e)}")
+
+    @timed("context_store.search_similar_contexts")
     async def search_similar_contexts(
         self,
         query_text: str,
+        database: str,
         entity_type: Optional[str] = None,
         limit: int = 5
     ) -> List[Dict[str, Any]]:
-        """Search for similar contexts using vector similarity."""
+        """Search for similar contexts of one database using vector similarity (in its partition only)."""
+        return await asyncio.to_thread(
+            self._search_similar_contexts, query_text, database, entity_type, limit
+        )
+
+    def _search_similar_contexts(
+        self,
+        query_text: str,
+        database: str,
+        entity_type: Optional[str],
+        limit: int
+    ) -> List[Dict[str, Any]]:
         try:
-            collection = Collection(self.collection_name)
-            
+            self.ensure_ready()
             # Generate embedding for query
             query_embedding = self._generate_embedding(query_text)
             
-            # Prepare search parameters
-            search_params = {
-                "metric_type": "IP",
-                "params": {"nprobe": 10}
-            }
-            
-            expr = f'entity_type == "{entity_type}"' if entity_type else None
+            filters = {"entity_type": entity_type} if entity_type else None
             
             # Perform search
-            results = collection.search(
-                data=[query_embedding],
-                anns_field="embedding",
-                param=search_params,
-                limit=limit,
-                expr=expr,
-                output_fields=["entity_type", "entity_name", "context_data"]
+            hits = self.backend.search(
+                query_embedding,
+                limit,
+                ["entity_type", "entity_name", "context_data"],
+                filters,
+                partition=database_partition(database)
             )
             
             # Process results
-            similar_contexts = []
-            for hits in results:
-                for hit in hits:
-                    context_data = json.loads(hit.entity.get("context_data"))
-                    similar_contexts.append({
-                        "entity_type": hit.entity.get("entity_type"),
-                        "entity_name": hit.entity.get("entity_name"),
-                        "context": context_data,
-                        "similarity": hit.score
-                    })
+            similar_contexts = [
+                {
+                    "entity_type": hit["entity_type"],
+                    "entity_name": hit["entity_name"],
+                    "context": json.loads(hit["context_data"]),
+                    "similarity": hit["score"]
+                }
+                for hit in hits
+            ]
             
             return similar_contexts
             
+        except LLMOverloaded:
+            raise
         except Exception as e:
             raise Exception(f"Failed to search similar contexts: {str(e)}")
 
 # Create a singleton instance
-context_store = ContextStore("structure_schema")
\ No newline at end of file
+context_store = ContextStore(CONTEXT_COLLECTION, legacy_collection_name=LEGACY_CONTEXT_COLLECTION)
\ No newline at end of file
@@ -0,0 +1,471 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.lazy import lazy_import
+from app.db.vector_backends import DEFAULT_PARTITION, Filters, VectorBackend
+from app.utils.embedding_cache import _file_lock
+
+np = lazy_import("numpy")
+
+# Rewrite the files once dead rows outnumber live ones (and exceed this many)
+COMPACT_MIN_DEAD_ROWS = 1000
+
+
+class EmbeddedBackend(VectorBackend):
+    """
+    In-process vector index for small collections (a few thousand rows).
+
+    Embeddings live in one contiguous float32/float16 matrix (``vectors.bin``)
+    read through a memory map; search is a single matrix-vector product and an
+    ``argpartition`` for the top k. Scalar fields are kept in memory and
+    persisted in an append-only log (``entries.jsonl``) of put/delete records,
+    so upserts only append. Filtered fields get an in-memory posting list per
+    value, so exact lookups touch only the matching rows instead of scanning
+    the collection. Writers hold an exclusive file lock, and readers in
+    other processes pick up appended records on their next call. Compaction
+    rewrites both files and readers notice the new files and reload; readers
+    take the lock shared whenever the files changed, so they never pair the
+    rows of one generation with the vectors of the other.
+
+    Each partition is a shard with its own files under ``partitions/``, loaded
+    on first use and dropped from memory by ``release_partition``; reads of
+    the whole collection merge the results of every shard.
+    """
+
+    kind = "embedded"
+
+    def __init__(self, collection_name: str, directory: str, dtype: str = "float32"):
+        super().__init__(collection_name)
+        self.directory = os.path.join(directory, collection_name)
+        self.vectors_path = os.path.join(self.directory, "vectors.bin")
+        self.entries_path = os.path.join(self.directory, "entries.jsonl")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, "lock")
+        self.partitions_directory = os.path.join(self.directory, "partitions")
+        self._dtype_name = dtype
+        self._dim: Optional[int] = None
+        self._lock = threading.RLock()
+        # Partitions are collections of their own under partitions/, opened on first use
+        self._shards: Dict[str, EmbeddedBackend] = {}
+        self._shards_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._rows: List[Optional[Dict[str, Any]]] = []
+        self._alive = None
+        self._live = 0
+        self._entries_offset = 0
+        self._entries_inode: Optional[int] = None
+        self._matrix = None
+        self._codes: Dict[str, Tuple[Any, Dict[Any, int]]] = {}
+        self._postings: Dict[str, Tuple[Any, Any]] = {}
+
+    # Files
+
+    def ensure_ready(self):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            self._sync()
+
+    def _load_meta(self):
+        if self._dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as handle:
+                meta = json.load(handle)
+            self._dim, self._dtype_name = meta["dim"], meta["dtype"]
+
+    @property
+    def _dtype(self):
+        return np.dtype(self._dtype_name)
+
+    def _row_bytes(self) -> int:
+        return self._dim * self._dtype.itemsize
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry["op"] == "put":
+            row = entry["row"]
+            if row >= len(self._rows):
+                self._rows.extend([None] * (row + 1 - len(self._rows)))
+            self._rows[row] = entry["fields"]
+            self._live += 1
+        else:
+            for row in entry["rows"]:
+                if row < len(self._rows) and self._rows[row] is not None:
+                    self._rows[row] = None
+                    self._live -= 1
+
+    def _sync(self):
+        """Refresh for a read: lock-free while nothing changed, else under the shared file lock."""
+        try:
+            stat = os.stat(self.entries_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == self._entries_inode and stat.st_size <= self._entries_offset:
+            return
+        # A compaction replaces vectors.bin and then entries.jsonl; between the
+        # two, a reader would map the new vectors under the old rows
+        with _file_lock(self.lock_path, shared=True):
+            self._refresh()
+
+    def _refresh(self):
+        """Apply log records appended since the last refresh (by this or another process); callers hold the file lock."""
+        try:
+            stat = os.stat(self.entries_path)
+        except FileNotFoundError:
+            return
+        if self._entries_inode not in (None, stat.st_ino):
+            # Compacted by another process: reload from scratch
+            self._reset()
+        self._entries_inode = stat.st_ino
+        if stat.st_size <= self._entries_offset:
+            return
+        self._load_meta()
+        with open(self.entries_path, "rb") as handle:
+            handle.seek(self._entries_offset)
+            data = handle.read(stat.st_size - self._entries_offset)
+        # Only apply complete lines; a writer may be mid-append
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            self._apply(json.loads(line))
+        self._entries_offset += len(complete)
+        if complete:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Refresh the alive mask and matrix view after the log changed."""
+        self._codes.clear()
+        self._postings.clear()
+        self._alive = np.fromiter((fields is not None for fields in self._rows), dtype=bool, count=len(self._rows))
+        if self._rows and (self._matrix is None or self._matrix.shape[0] < len(self._rows)):
+            rows = os.path.getsize(self.vectors_path) // self._row_bytes()
+            self._matrix = np.memmap(self.vectors_path, dtype=self._dtype, mode="r", shape=(rows, self._dim))
+
+    def _append(self, entries: List[Dict[str, Any]]):
+        with open(self.entries_path, "ab") as handle:
+            handle.write(b"".join(json.dumps(entry).encode("utf-8") + b"\n" for entry in entries))
+
+    # Filtering
+
+    def _column_codes(self, field: str):
+        """Integer codes for a scalar field, so filters are vectorized comparisons."""
+        cached = self._codes.get(field)
+        if cached is None:
+            lookup: Dict[Any, int] = {}
+            codes = np.fromiter(
+                (-1 if fields is None else lookup.setdefault(fields.get(field), len(lookup)) for fields in self._rows),
+                dtype=np.int32, count=len(self._rows)
+            )
+            cached = self._codes[field] = (codes, lookup)
+        return cached
+
+    def _posting_lists(self, field: str):
+        """Rows grouped by their code in ``field``: code c's rows are ``order[starts[c]:starts[c + 1]]``."""
+        cached = self._postings.get(field)
+        if cached is None:
+            column, lookup = self._column_codes(field)
+            order = np.argsort(column, kind="stable")
+            starts = np.searchsorted(column[order], np.arange(len(lookup) + 1))
+            cached = self._postings[field] = (order, starts)
+        return cached
+
+    def _matching_rows(self, filters: Optional[Filters]):
+        """Sorted live rows matching ``filters``: the most selective filter's postings, narrowed by the others."""
+        if not filters:
+            return np.flatnonzero(self._alive)
+        wanted: Dict[str, List[int]] = {}
+        for field, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            lookup = self._column_codes(field)[1]
+            wanted[field] = [lookup[v] for v in values if v in lookup]
+
+        def matches(field: str) -> int:
+            starts = self._posting_lists(field)[1]
+            return sum(int(starts[code + 1] - starts[code]) for code in wanted[field])
+
+        first = min(wanted, key=matches)
+        order, starts = self._posting_lists(first)
+        postings = [order[starts[code]:starts[code + 1]] for code in wanted[first]]
+        rows = np.sort(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int64)
+        for field, codes in wanted.items():
+            if field != first and len(rows):
+                rows = rows[np.isin(self._column_codes(field)[0][rows], codes)]
+        return rows
+
+    def _output(self, row: int, output_fields: List[str]) -> Dict[str, Any]:
+        fields = self._rows[row]
+        return {
+            field: self._matrix[row].astype(np.float32).tolist() if field == "embedding" else fields.get(field)
+            for field in output_fields
+        }
+
+    # Writes
+
+    def _put_entries(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Append the rows' vectors and return their put records (caller holds the locks)."""
+        embeddings = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+        self._load_meta()
+        if self._dim is None:
+            self._dim = int(embeddings.shape[1])
+            with open(self.meta_path, "w") as handle:
+                json.dump({"dim": self._dim, "dtype": self._dtype_name}, handle)
+        if embeddings.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self._dim}")
+
+        # Rows are derived from the vectors file size, so vectors of a writer
+        # that crashed before logging them are skipped, never reused
+        with open(self.vectors_path, "ab") as handle:
+            size = handle.seek(0, os.SEEK_END)
+            if size % self._row_bytes():
+                handle.truncate(size - size % self._row_bytes())
+            first = size // self._row_bytes()
+            handle.write(embeddings.astype(self._dtype).tobytes())
+
+        return [
+            {"op": "put", "row": first + i, "fields": {k: v for k, v in row.items() if k != "embedding"}}
+            for i, row in enumerate(rows)
+        ]
+
+    # Partitions
+
+    def _shard(self, partition: str, create: bool = False) -> Optional[EmbeddedBackend]:
+        """The backend holding a partition's rows; None if it has none and ``create`` is False."""
+        if partition == DEFAULT_PARTITION:
+            return self
+        if not partition or partition in (".", "..") or os.sep in partition:
+            raise ValueError(f"Invalid partition name: {partition!r}")
+        with self._shards_lock:
+            shard = self._shards.get(partition)
+            if shard is None:
+                shard = EmbeddedBackend(partition, self.partitions_directory, self._dtype_name)
+                if not create and not shard.exists():
+                    return None
+                self._shards[partition] = shard
+            return shard
+
+    def _readers(self, partition: Optional[str]) -> List[EmbeddedBackend]:
+        """Backends a read of ``partition`` (every partition if None) covers."""
+        if partition is None:
+            return [self] + [self._shard(name) for name in self.partitions()]
+        shard = self._shard(partition)
+        return [shard] if shard is not None else []
+
+    # VectorBackend
+
+    def insert(self, rows: List[Dict[str, Any]], partition: Optional[str] = None):
+        if not rows:
+            return
+        if partition not in (None, DEFAULT_PARTITION):
+            return self._shard(partition, create=True).insert(rows)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            self._append(self._put_entries(rows))
+            self._refresh()
+            self._maybe_compact()
+
+    def upsert(self, rows: List[Dict[str, Any]], key: str, partition: Optional[str] = None):
+        if not rows:
+            return
+        if partition not in (None, DEFAULT_PARTITION):
+            return self._shard(partition, create=True).upsert(rows, key)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            entries = []
+            if self._rows:
+                replaced = self._matching_rows({key: [row[key] for row in rows]}).tolist()
+                if replaced:
+                    entries.append({"op": "delete", "rows": replaced})
+            # Delete and puts go out in one append, so readers never see the entity missing
+            self._append(entries + self._put_entries(rows))
+            self._refresh()
+            self._maybe_compact()
+
+    def delete(self, filters: Filters, partition: Optional[str] = None):
+        if not filters:
+            raise ValueError("At least one filter is required")
+        for backend in self._readers(partition):
+            backend._delete(filters)
+
+    def _delete(self, filters: Filters):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            if not self._rows:
+                return
+            rows = self._matching_rows(filters).tolist()
+            if rows:
+                self._append([{"op": "delete", "rows": rows}])
+                self._refresh()
+
+    def query(
+        self,
+        filters: Filters,
+        output_fields: List[str],
+        limit: Optional[int] = None,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        self._check_partition(partition)
+        results: List[Dict[str, Any]] = []
+        for backend in self._readers(partition):
+            results.extend(backend._query(filters, output_fields, None if limit is None else limit - len(results)))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def _query(self, filters: Filters, output_fields: List[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            if not self._rows:
+                return []
+            rows = self._matching_rows(filters)[:limit]
+            return [self._output(row, output_fields) for row in rows.tolist()]
+
+    def search(
+        self,
+        embedding: List[float],
+        limit: int,
+        output_fields: List[str],
+        filters: Optional[Filters] = None,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        self._check_partition(partition)
+        query = np.asarray(embedding, dtype=np.float32)
+        readers = self._readers(partition)
+        if len(readers) == 1:
+            return readers[0]._search(query, limit, output_fields, filters)
+        # Each partition's top k, merged
+        hits = [hit for backend in readers for hit in backend._search(query, limit, output_fields, filters)]
+        return sorted(hits, key=lambda hit: -hit["score"])[:limit]
+
+    def _search(
+        self,
+        query,
+        limit: int,
+        output_fields: List[str],
+        filters: Optional[Filters]
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            if not self._rows or limit <= 0:
+                return []
+            rows = self._matching_rows(filters)
+            if not len(rows):
+                return []
+            matrix = self._matrix[:len(self._rows)]
+            if len(rows) * 2 < len(matrix):
+                # Selective filter: score only the candidate rows
+                scores = matrix[rows] @ query
+            else:
+                scores = (matrix @ query)[rows]
+            k = min(limit, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                {**self._output(row, output_fields), "score": float(score)}
+                for row, score in zip(rows[top].tolist(), scores[top].tolist())
+            ]
+
+    def partitions(self) -> List[str]:
+        if not os.path.isdir(self.partitions_directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.partitions_directory)
+            if os.path.isdir(os.path.join(self.partitions_directory, name))
+        )
+
+    def load_partition(self, partition: str):
+        shard = self._shard(partition)
+        if shard is not None:
+            shard.ensure_ready()
+
+    def release_partition(self, partition: str):
+        # Readers still holding the shard finish with it; the next read maps the files again
+        with self._shards_lock:
+            self._shards.pop(partition, None)
+
+    def drop(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, _file_lock(self.lock_path):
+            for path in (self.entries_path, self.vectors_path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            shutil.rmtree(self.partitions_directory, ignore_errors=True)
+            with self._shards_lock:
+                self._shards.clear()
+            self._dim = None
+            self._reset()
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.directory)
+
+    def replace(self, source: VectorBackend):
+        with self._lock, source._lock:
+            if os.path.exists(self.directory):
+                shutil.rmtree(self.directory)
+            os.replace(source.directory, self.directory)
+            for backend in (self, source):
+                with backend._shards_lock:
+                    backend._shards.clear()
+                backend._dim = None
+                backend._reset()
+
+    def has_field(self, field: str) -> bool:
+        with self._lock:
+            self._sync()
+            if not self._live:
+                return True
+            # Rows without the field are coded as holding None
+            codes, lookup = self._column_codes(field)
+            return None not in lookup
+
+    def _maybe_compact(self):
+        """Compact if enough rows are dead; called by writers holding the locks."""
+        dead = len(self._rows) - self._live
+        if dead >= COMPACT_MIN_DEAD_ROWS and dead > self._live:
+            self._compact()
+
+    def compact(self):
+        """Rewrite the files without deleted rows."""
+        with self._lock, _file_lock(self.lock_path):
+            self._compact()
+
+    def _compact(self):
+        # The file lock is a flock taken per open file, so it must not be taken again here
+        self._refresh()
+        if not self._rows:
+            return
+        keep = np.flatnonzero(self._alive)
+        vectors = np.asarray(self._matrix[keep])
+        entries = [
+            {"op": "put", "row": new, "fields": self._rows[old]}
+            for new, old in enumerate(keep.tolist())
+        ]
+        tmp_vectors, tmp_entries = self.vectors_path + ".tmp", self.entries_path + ".tmp"
+        with open(tmp_vectors, "wb") as handle:
+            handle.write(vectors.tobytes())
+        with open(tmp_entries, "wb") as handle:
+            handle.write(b"".join(json.dumps(entry).encode("utf-8") + b"\n" for entry in entries))
+        # Vectors first: readers key off the entries file being replaced, and
+        # hold the shared lock while reloading, so they see both files or neither
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_entries, self.entries_path)
+        self._reset()
+        self._refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sync()
+            return {
+                **super().stats(),
+                "rows": self._live,
+                "dead_rows": len(self._rows) - self._live,
+                "dim": self._dim,
+                "dtype": self._dtype_name,
+                "directory": self.directory,
+                "partitions": len(self.partitions()),
+                "loaded_partitions": {name: shard._live for name, shard in sorted(self._shards.items())}
+            }
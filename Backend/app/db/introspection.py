@@ -0,0 +1,214 @@
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Iterable
+from app.db.pool import pool_manager
+
+# Schemas that never contain user tables
+SYSTEM_SCHEMA_FILTER = """
+    n.nspname NOT IN ('pg_catalog', 'information_schema')
+    AND n.nspname NOT LIKE 'pg_toast%%'
+    AND n.nspname NOT LIKE 'pg_temp_%%'
+"""
+
+SCHEMAS_QUERY = f"""
+    SELECT n.nspname
+    FROM pg_namespace n
+    WHERE {SYSTEM_SCHEMA_FILTER}
+    ORDER BY n.nspname
+"""
+
+# Column types as information_schema.columns.data_type spells them (no type
+# modifiers; "ARRAY" and "USER-DEFINED" for arrays and non-builtin types), so
+# descriptions, fingerprints and TYPE_ALIASES keep matching
+DATA_TYPE_EXPRESSION = """
+        CASE WHEN t.typtype = 'd' THEN
+            CASE WHEN bt.typelem <> 0 AND bt.typlen = -1 THEN 'ARRAY'
+                 WHEN nbt.nspname = 'pg_catalog' THEN format_type(t.typbasetype, NULL)
+                 ELSE 'USER-DEFINED' END
+        ELSE
+            CASE WHEN t.typelem <> 0 AND t.typlen = -1 THEN 'ARRAY'
+                 WHEN nt.nspname = 'pg_catalog' THEN format_type(a.atttypid, NULL)
+                 ELSE 'USER-DEFINED' END
+        END
+"""
+
+# Tables, columns and comments for the selected schemas in one pass
+COLUMNS_QUERY = """
+    SELECT
+        n.nspname,
+        c.relname,
+        td.description,
+        a.attname,
+        """ + DATA_TYPE_EXPRESSION.strip() + """,
+        NOT a.attnotnull,
+        cd.description
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_attribute a
+        ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_type t ON t.oid = a.atttypid
+    LEFT JOIN pg_namespace nt ON nt.oid = t.typnamespace
+    LEFT JOIN pg_type bt ON t.typtype = 'd' AND bt.oid = t.typbasetype
+    LEFT JOIN pg_namespace nbt ON nbt.oid = bt.typnamespace
+    LEFT JOIN pg_description td
+        ON td.objoid = c.oid AND td.classoid = 'pg_class'::regclass AND td.objsubid = 0
+    LEFT JOIN pg_description cd
+        ON cd.objoid = c.oid AND cd.classoid = 'pg_class'::regclass AND cd.objsubid = a.attnum
+    WHERE c.relkind IN ('r', 'p')
+    AND NOT c.relispartition
+    AND {schema_filter}
+    ORDER BY n.nspname, c.relname, a.attnum
+"""
+
+# Primary and foreign keys with their column lists in constraint order
+CONSTRAINTS_QUERY = """
+    SELECT
+        n.nspname,
+        c.relname,
+        con.contype,
+        ARRAY(
+            SELECT a.attname
+            FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+            ORDER BY k.ord
+        ),
+        fn.nspname,
+        fc.relname,
+        ARRAY(
+            SELECT a.attname
+            FROM unnest(con.confkey) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+            ORDER BY k.ord
+        )
+    FROM pg_constraint con
+    JOIN pg_class c ON c.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_class fc ON fc.oid = con.confrelid
+    LEFT JOIN pg_namespace fn ON fn.oid = fc.relnamespace
+    WHERE con.contype IN ('p', 'f')
+    AND {schema_filter}
+"""
+
+
+def _schema_filter(schemas: Optional[List[str]]) -> Tuple[str, tuple]:
+    if schemas is None:
+        return SYSTEM_SCHEMA_FILTER, ()
+    return "n.nspname = ANY(%s)", (list(schemas),)
+
+
+def assemble_catalog(
+    column_rows: Iterable[tuple],
+    constraint_rows: Iterable[tuple]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Build the per-schema table structures from the raw catalog rows.
+
+    Args:
+        column_rows: Rows of COLUMNS_QUERY, ordered by schema, table and attnum.
+        constraint_rows: Rows of CONSTRAINTS_QUERY.
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: Tables per schema, in the same shape as
+        ``get_tables`` plus ``schema``, ``primary_key`` and ``foreign_keys``.
+    """
+    catalog: Dict[str, List[Dict[str, Any]]] = {}
+    tables: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    for schema, table_name, description, column, data_type, nullable, column_description in column_rows:
+        table = tables.get((schema, table_name))
+        if table is None:
+            table = {
+                "name": table_name,
+                "schema": schema,
+                "description": description or f"Table containing {table_name} data",
+                "columns": [],
+                "primary_key": [],
+                "foreign_keys": {}
+            }
+            tables[(schema, table_name)] = table
+            catalog.setdefault(schema, []).append(table)
+        if column is not None:
+            table["columns"].append({
+                "name": column,
+                "type": data_type,
+                "nullable": nullable,
+                "description": column_description
+            })
+
+    for schema, table_name, contype, columns, ref_schema, ref_table, ref_columns in constraint_rows:
+        table = tables.get((schema, table_name))
+        if table is None:
+            continue
+        if contype == "p":
+            table["primary_key"] = list(columns)
+        elif contype == "f":
+            # Same-schema references keep the TableContext "table.column" format
+            prefix = ref_table if ref_schema == schema else f"{ref_schema}.{ref_table}"
+            for column, ref_column in zip(columns, ref_columns):
+                table["foreign_keys"][column] = f"{prefix}.{ref_column}"
+
+    return catalog
+
+
+class SchemaIntrospector:
+    """
+    Set-based catalog introspection for one database.
+
+    A whole catalog (or a selection of schemas) is fetched with one columns
+    query and one constraints query against ``pg_catalog`` and assembled in
+    memory. Schemas are loaded lazily and memoized per instance, so callers
+    that only need part of a huge catalog never fetch the rest.
+    """
+
+    def __init__(self, database_name: Optional[str] = None):
+        self.database_name = database_name
+        self._loaded: Dict[str, List[Dict[str, Any]]] = {}
+        self._all_loaded = False
+
+    def schemas(self) -> List[str]:
+        """List the user schemas in the database."""
+        with pool_manager.connection(self.database_name) as conn:
+            with conn.cursor() as cur:
+                cur.execute(SCHEMAS_QUERY, ())
+                return [row[0] for row in cur.fetchall()]
+
+    def _fetch(self, schemas: Optional[List[str]]) -> Dict[str, List[Dict[str, Any]]]:
+        schema_filter, params = _schema_filter(schemas)
+        with pool_manager.connection(self.database_name) as conn:
+            with conn.cursor() as cur:
+                cur.execute(COLUMNS_QUERY.format(schema_filter=schema_filter), params)
+                column_rows = cur.fetchall()
+                cur.execute(CONSTRAINTS_QUERY.format(schema_filter=schema_filter), params)
+                constraint_rows = cur.fetchall()
+        return assemble_catalog(column_rows, constraint_rows)
+
+    def load(self, schemas: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Load the given schemas (all user schemas if None), fetching only those
+        not loaded yet.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Tables per requested schema.
+        """
+        if schemas is None:
+            if not self._all_loaded:
+                self._loaded.update(self._fetch(None))
+                self._all_loaded = True
+            return dict(self._loaded)
+
+        missing = [name for name in schemas if name not in self._loaded]
+        if missing:
+            fetched = self._fetch(missing)
+            for name in missing:
+                self._loaded[name] = fetched.get(name, [])
+        return {name: self._loaded[name] for name in schemas}
+
+    def tables(self, schemas: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Return the tables of the given schemas as a flat list."""
+        return [table for tables in self.load(schemas).values() for table in tables]
+
+    def iter_schemas(self, schemas: Optional[List[str]] = None) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Yield ``(schema, tables)`` one schema at a time without memoizing, so
+        very large catalogs can be processed with bounded memory.
+        """
+        for name in schemas if schemas is not None else self.schemas():
+            yield name, self._fetch([name]).get(name, [])
@@ -1,10 +1,22 @@
-from pymilvus import connections, utility
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, TypeVar, TYPE_CHECKING
 from app.core.config import settings
+from app.core.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from pymilvus import Collection
+
+# pymilvus (and grpc under it) is the slowest import in the app; defer it to first use
+pymilvus = lazy_import("pymilvus")
+
+T = TypeVar("T")
 
 def connect_to_milvus():
     """Establish connection to Milvus."""
     try:
-        connections.connect(
+        pymilvus.connections.connect(
             "default",
             host=settings.MILVUS_HOST,
             port=settings.MILVUS_PORT
@@ -15,10 +27,208 @@ def connect_to_milvus():
 def disconnect_from_milvus():
     """Disconnect from Milvus."""
     try:
-        connections.disconnect("default")
+        pymilvus.connections.disconnect("default")
     except Exception as e:
         raise Exception(f"Failed to disconnect from Milvus: {e}")
 
 def check_collection_exists(collection_name: str) -> bool:
     """Check if a collection exists in Milvus."""
-    return utility.has_collection(collection_name)
\ No newline at end of file
+    return pymilvus.utility.has_collection(collection_name)
+
+def _is_connection_error(error: Exception) -> bool:
+    import grpc
+    from pymilvus.exceptions import ConnectionNotExistException, MilvusUnavailableException
+    return isinstance(error, (
+        ConnectionError,
+        ConnectionNotExistException,
+        MilvusUnavailableException,
+        grpc.RpcError
+    ))
+
+
+class MilvusManager:
+    """
+    Owns the shared Milvus connection and the collections loaded through it.
+
+    The connection is opened once (normally by the app lifespan) and never
+    torn down mid-flight. Collection handles are cached and each collection is
+    loaded at most once, either whole or one partition at a time (so memory
+    holds only the partitions in use); operations that fail are retried once
+    after reconnecting.
+    """
+
+    def __init__(self, alias: str = "default", host: str = "localhost", port: str = "19530"):
+        self.alias = alias
+        self.host = host
+        self.port = port
+        self._collections: Dict[str, Collection] = {}
+        self._loaded: Set[str] = set()
+        self._loaded_partitions: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self.reconnects = 0
+
+    def connect(self):
+        """Open the shared connection if it is not open yet."""
+        with self._lock:
+            if pymilvus.connections.has_connection(self.alias):
+                return
+            try:
+                pymilvus.connections.connect(self.alias, host=self.host, port=self.port)
+            except Exception as e:
+                raise ConnectionError(f"Failed to connect to Milvus: {e}")
+
+    def reconnect(self):
+        """Drop and re-open the connection, forgetting cached collection state."""
+        with self._lock:
+            try:
+                pymilvus.connections.disconnect(self.alias)
+            except Exception:
+                pass
+            self._collections.clear()
+            self._loaded.clear()
+            self._loaded_partitions.clear()
+            self.reconnects += 1
+            self.connect()
+
+    def has_collection(self, name: str) -> bool:
+        self.connect()
+        return pymilvus.utility.has_collection(name, using=self.alias)
+
+    def get_collection(self, name: str, load: bool = True) -> Collection:
+        """Return a cached handle for a collection, loading it into memory once if requested."""
+        self.connect()
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = pymilvus.Collection(name, using=self.alias)
+            if load and name not in self._loaded:
+                collection.load()
+                self._loaded.add(name)
+            return collection
+
+    def load_partition(self, name: str, partition: str) -> Collection:
+        """Return a cached handle for a collection, loading one of its partitions once (unless all are loaded)."""
+        collection = self.get_collection(name, load=False)
+        with self._lock:
+            loaded = self._loaded_partitions.setdefault(name, set())
+            if name not in self._loaded and partition not in loaded:
+                collection.load(partition_names=[partition])
+                loaded.add(partition)
+            return collection
+
+    def release_partition(self, name: str, partition: str):
+        """Release one partition of a collection from memory; the others stay loaded."""
+        with self._lock:
+            collection = self._collections.get(name)
+            loaded = self._loaded_partitions.setdefault(name, set())
+            if collection is None or (name not in self._loaded and partition not in loaded):
+                return
+            if name in self._loaded:
+                # Loaded whole: from now on track the remaining partitions one by one
+                self._loaded.discard(name)
+                loaded.update(existing.name for existing in collection.partitions)
+            handle = collection.partition(partition)
+            if handle is not None:
+                handle.release()
+            loaded.discard(partition)
+
+    def loaded_partitions(self, name: str) -> List[str]:
+        """Return the partitions of a collection loaded one by one."""
+        with self._lock:
+            return sorted(self._loaded_partitions.get(name, set()))
+
+    def mark_loaded(self, name: str):
+        """Record that a collection was loaded outside of ``get_collection``."""
+        with self._lock:
+            self._loaded.add(name)
+
+    def release(self, name: str):
+        """Release a collection from memory."""
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None and (name in self._loaded or self._loaded_partitions.get(name)):
+                collection.release()
+            self._loaded.discard(name)
+            self._loaded_partitions.pop(name, None)
+
+    def forget(self, name: str):
+        """Drop cached state for a collection (e.g. after it was dropped or recreated)."""
+        with self._lock:
+            self._collections.pop(name, None)
+            self._loaded.discard(name)
+            self._loaded_partitions.pop(name, None)
+
+    def _prepare(self, name: str, load: bool, partition: Optional[str]) -> Collection:
+        if partition is not None and load:
+            return self.load_partition(name, partition)
+        return self.get_collection(name, load=load)
+
+    def run(
+        self,
+        name: str,
+        operation: Callable[[Collection], T],
+        load: bool = True,
+        partition: Optional[str] = None
+    ) -> T:
+        """
+        Run ``operation`` on a collection, reconnecting and retrying once on connection failures.
+
+        With ``partition`` only that partition is loaded (if ``load``), not the whole collection.
+        """
+        try:
+            return operation(self._prepare(name, load, partition))
+        except Exception as e:
+            if not _is_connection_error(e):
+                raise
+            self.reconnect()
+            return operation(self._prepare(name, load, partition))
+
+    def preload(self, names: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> List[str]:
+        """
+        Load collections ahead of the first request.
+
+        Args:
+            names: Collections to load; defaults to every ``*_schema`` collection.
+            exclude: Collections to leave unloaded, e.g. those loaded per partition.
+
+        Returns:
+            List[str]: The collections that were loaded.
+        """
+        self.connect()
+        if names is None:
+            names = [name for name in pymilvus.utility.list_collections(using=self.alias) if name.endswith("_schema")]
+        names = [name for name in names if name not in (exclude or [])]
+        loaded = []
+        for name in names:
+            if pymilvus.utility.has_collection(name, using=self.alias):
+                self.get_collection(name, load=True)
+                loaded.append(name)
+        return loaded
+
+    def close(self):
+        """Close the shared connection; used on application shutdown."""
+        with self._lock:
+            self._collections.clear()
+            self._loaded.clear()
+            self._loaded_partitions.clear()
+            if not pymilvus.loaded:
+                return
+            try:
+                pymilvus.connections.disconnect(self.alias)
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return connection state and the collections loaded through the manager."""
+        with self._lock:
+            return {
+                "connected": pymilvus.loaded and pymilvus.connections.has_connection(self.alias),
+                "loaded_collections": sorted(self._loaded),
+                "loaded_partitions": {
+                    name: sorted(partitions) for name, partitions in self._loaded_partitions.items() if partitions
+                },
+                "reconnects": self.reconnects
+            }
+
+
+milvus_manager = MilvusManager(host=settings.MILVUS_HOST, port=settings.MILVUS_PORT)
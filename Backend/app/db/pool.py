@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional, Tuple, Union
+from urllib.parse import urlparse
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
+from app.core.config import settings
+from app.utils.db_url_util import get_db_connection_params
+
+
+class PoolLimitError(Exception):
+    """Raised when a new pool cannot be created without exceeding POOL_MAX_TOTAL."""
+
+
+class _PoolEntry:
+    def __init__(self, pool: Union[ConnectionPool, AsyncConnectionPool]):
+        self.pool = pool
+        # Loop an async pool was opened on; its workers and connections live there
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.last_used = time.monotonic()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def is_async(self) -> bool:
+        return isinstance(self.pool, AsyncConnectionPool)
+
+    def record_wait(self, seconds: float):
+        self.last_used = time.monotonic()
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+
+class PoolManager:
+    """
+    Keeps one psycopg connection pool per target database.
+
+    Pools are created on first use from ``get_db_connection_params``, as a
+    sync pool for ``connection()`` and an async pool for ``async_connection()``,
+    and all of them share a global connection budget (``max_total``). When the
+    budget is exhausted, the least recently used pool with no checked-out
+    connections is closed to make room. Pools unused for ``idle_evict`` seconds
+    are closed as well.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_total: int = 50,
+        timeout: float = 30.0,
+        max_idle: float = 300.0,
+        idle_evict: float = 900.0
+    ):
+        self.base_url = base_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_total = max_total
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle_evict = idle_evict
+        self.default_database = urlparse(base_url).path.lstrip("/") or "postgres"
+        self._pools: Dict[Tuple[str, bool], _PoolEntry] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _budget_left(self) -> int:
+        return self.max_total - sum(entry.pool.max_size for entry in self._pools.values())
+
+    def _is_idle(self, entry: _PoolEntry) -> bool:
+        stats = entry.pool.get_stats()
+        return stats.get("pool_available", 0) >= stats.get("pool_size", 0)
+
+    def _evict(self, key: Tuple[str, bool]):
+        entry = self._pools.pop(key)
+        if not entry.is_async:
+            entry.pool.close(timeout=0)
+            return
+        if entry.loop is None or entry.loop.is_closed():
+            return  # Never opened, or its workers and connections died with their loop
+        # Evictions also run on worker threads; the close must run on the pool's own loop
+        asyncio.run_coroutine_threadsafe(entry.pool.close(timeout=0), entry.loop)
+
+    def _evict_idle_pools(self):
+        now = time.monotonic()
+        for key, entry in list(self._pools.items()):
+            if now - entry.last_used > self.idle_evict and self._is_idle(entry):
+                self._evict(key)
+
+    def _create_pool(self, database: str, is_async: bool) -> _PoolEntry:
+        self._evict_idle_pools()
+
+        # Free up budget by closing least recently used pools that are not in use
+        needed = max(self.min_size, 1)
+        candidates = sorted(self._pools.items(), key=lambda item: item[1].last_used)
+        for key, entry in candidates:
+            if self._budget_left() >= needed:
+                break
+            if self._is_idle(entry):
+                self._evict(key)
+
+        max_size = min(self.max_size, self._budget_left())
+        if max_size < needed:
+            raise PoolLimitError(
+                f"Cannot open a pool for '{database}': connection budget of {self.max_total} is in use"
+            )
+
+        pool_class = AsyncConnectionPool if is_async else ConnectionPool
+        pool = pool_class(
+            get_db_connection_params(self.base_url, database),
+            min_size=min(self.min_size, max_size),
+            max_size=max_size,
+            timeout=self.timeout,
+            max_idle=self.max_idle,
+            check=pool_class.check_connection,
+            name=f"{database}-async" if is_async else database,
+            open=not is_async  # Async pools are opened by the caller inside the event loop
+        )
+        entry = _PoolEntry(pool)
+        self._pools[(database, is_async)] = entry
+        return entry
+
+    def _get_entry(self, database: str, is_async: bool = False) -> _PoolEntry:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pools have been shut down")
+            entry = self._pools.get((database, is_async))
+            if entry is None:
+                entry = self._create_pool(database, is_async)
+            return entry
+
+    @contextmanager
+    def connection(self, database: Optional[str] = None):
+        """
+        Borrow a connection to ``database`` (the DATABASE_URL database if None).
+
+        The transaction is committed on normal exit and rolled back on error,
+        as with ``psycopg.connect`` used as a context manager.
+        """
+        entry = self._get_entry(database or self.default_database)
+        start = time.perf_counter()
+        with entry.pool.connection() as conn:
+            entry.record_wait(time.perf_counter() - start)
+            yield conn
+
+    @asynccontextmanager
+    async def async_connection(self, database: Optional[str] = None):
+        """Async counterpart of ``connection()`` yielding a ``psycopg.AsyncConnection``."""
+        entry = self._get_entry(database or self.default_database, is_async=True)
+        start = time.perf_counter()
+        if entry.loop is None:
+            entry.loop = asyncio.get_running_loop()
+        await entry.pool.open(wait=False)  # No-op once the pool is open
+        async with entry.pool.connection() as conn:
+            entry.record_wait(time.perf_counter() - start)
+            yield conn
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-pool sizes and connection wait times."""
+        with self._lock:
+            pools = {}
+            for (database, is_async), entry in self._pools.items():
+                pool_stats = entry.pool.get_stats()
+                pools[f"{database} (async)" if is_async else database] = {
+                    "size": pool_stats.get("pool_size", 0),
+                    "available": pool_stats.get("pool_available", 0),
+                    "max_size": entry.pool.max_size,
+                    "requests_waiting": pool_stats.get("requests_waiting", 0),
+                    "wait_count": entry.wait_count,
+                    "wait_avg_ms": round(1000 * entry.wait_total / entry.wait_count, 3) if entry.wait_count else 0.0,
+                    "wait_max_ms": round(1000 * entry.wait_max, 3),
+                    "connections_lost": pool_stats.get("connections_lost", 0),
+                }
+            return {
+                "max_total": self.max_total,
+                "budget_left": self._budget_left(),
+                "pools": pools
+            }
+
+    def close(self):
+        """Close every sync pool and stop accepting new connections."""
+        with self._lock:
+            self._closed = True
+            for key in [key for key, entry in self._pools.items() if not entry.is_async]:
+                self._evict(key)
+
+    async def aclose(self):
+        """Close every pool, sync and async; used on application shutdown."""
+        self.close()
+        with self._lock:
+            async_pools = [self._pools.pop(key).pool for key in list(self._pools)]
+        for pool in async_pools:
+            await pool.close()
+
+
+pool_manager = PoolManager(
+    settings.DATABASE_URL,
+    min_size=settings.POOL_MIN_SIZE,
+    max_size=settings.POOL_MAX_SIZE,
+    max_total=settings.POOL_MAX_TOTAL,
+    timeout=settings.POOL_TIMEOUT,
+    max_idle=settings.POOL_MAX_IDLE,
+    idle_evict=settings.POOL_IDLE_EVICT
+)
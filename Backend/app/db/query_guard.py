@@ -0,0 +1,222 @@
+import json
+import re
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import timed
+from app.db.pool import pool_manager
+
+logger = get_logger("query_guard")
+
+_WRITE_KEYWORDS = re.compile(
+    r"\b(insert|update|delete|merge|create|drop|alter|truncate|grant|revoke|call|copy|lock|into)\b", re.IGNORECASE
+)
+_TOP_LEVEL_LIMIT = re.compile(r"\blimit\s+(\d+|all)\b|\bfetch\s+(?:first|next)\s+(\d*)", re.IGNORECASE)
+_LOCKING = re.compile(r"\bfor\s+(?:update|share|no\s+key\s+update|key\s+share)\b", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    """Raised when a generated query's plan exceeds the configured cost or row ceilings."""
+
+
+def is_read_only(sql_query: str) -> bool:
+    """Whether a statement only reads (plain SELECT, or WITH without data-modifying parts)."""
+    code = _code(sql_query)
+    return code.lstrip().lower().startswith(("select", "with")) and not _WRITE_KEYWORDS.search(code)
+
+
+def _code(sql_query: str) -> str:
+    """The statement with literals, quoted identifiers and comments blanked out."""
+    out = []
+    i, n = 0, len(sql_query)
+    while i < n:
+        char = sql_query[i]
+        if char in "'\"":
+            end = i + 1
+            while end < n:
+                if sql_query[end] == char:
+                    if end + 1 < n and sql_query[end + 1] == char:  # Doubled quote
+                        end += 2
+                        continue
+                    break
+                end += 1
+            i = end + 1
+            out.append(" ")
+            continue
+        if sql_query.startswith("--", i):
+            end = sql_query.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        if sql_query.startswith("/*", i):
+            end = sql_query.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            out.append(" ")
+            continue
+        if char == "$":
+            tag = re.match(r"\$(?:[A-Za-z_]\w*)?\$", sql_query[i:])
+            if tag:
+                end = sql_query.find(tag.group(), i + len(tag.group()))
+                i = n if end < 0 else end + len(tag.group())
+                out.append(" ")
+                continue
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def _top_level(sql_query: str) -> str:
+    """The statement with literals, quoted identifiers, comments and parenthesized parts blanked out."""
+    out = []
+    depth = 0
+    for char in _code(sql_query):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0:
+            out.append(char)
+    return "".join(out)
+
+
+def add_limit(sql_query: str, row_limit: int) -> Tuple[str, bool]:
+    """
+    Bound a read-only query to ``row_limit`` rows.
+
+    Queries without a top-level LIMIT/FETCH get ``LIMIT row_limit`` appended;
+    queries whose own limit is larger (or ``LIMIT ALL``) are wrapped in an
+    outer limited SELECT. Returns (sql, whether it was rewritten).
+    """
+    if not is_read_only(sql_query):
+        return sql_query, False
+    top = _top_level(sql_query)
+    if _LOCKING.search(top):
+        return sql_query, False
+    body = sql_query.strip().rstrip(";").rstrip()
+    limits = _TOP_LEVEL_LIMIT.findall(top)
+    if not limits:
+        # Newline first, in case the query ends with a -- comment
+        return f"{body}\nLIMIT {row_limit}", True
+    value = limits[-1][0] or limits[-1][1] or "1"  # FETCH FIRST ROW ONLY means one row
+    if value.isdigit() and int(value) <= row_limit:
+        return sql_query, False
+    return f"SELECT * FROM (\n{body}\n) AS limited LIMIT {row_limit}", True
+
+
+def summarize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an ``EXPLAIN (FORMAT JSON)`` plan to its estimates and the tables it scans."""
+    root = plan["Plan"]
+    scans: List[Dict[str, Any]] = []
+
+    def walk(node: Dict[str, Any]):
+        if "Relation Name" in node:
+            scans.append({"table": node["Relation Name"], "scan": node["Node Type"], "rows": node.get("Plan Rows")})
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(root)
+    return {
+        "node": root["Node Type"],
+        "startup_cost": root.get("Startup Cost"),
+        "total_cost": root.get("Total Cost"),
+        "estimated_rows": root.get("Plan Rows"),
+        "scans": scans
+    }
+
+
+def check_plan(summary: Dict[str, Any]):
+    """Raise ``QueryRejected`` if the plan estimates exceed QUERY_MAX_COST or QUERY_MAX_ESTIMATED_ROWS."""
+    if (summary["total_cost"] or 0) > settings.QUERY_MAX_COST:
+        raise QueryRejected(
+            f"Query rejected: estimated cost {summary['total_cost']:.0f} exceeds {settings.QUERY_MAX_COST:.0f}"
+        )
+    if (summary["estimated_rows"] or 0) > settings.QUERY_MAX_ESTIMATED_ROWS:
+        raise QueryRejected(
+            f"Query rejected: estimated {summary['estimated_rows']} rows exceeds {settings.QUERY_MAX_ESTIMATED_ROWS}"
+        )
+
+
+def _limits_sql(read_only: bool) -> str:
+    timeout_ms = int(settings.QUERY_STATEMENT_TIMEOUT * 1000)
+    statements = ["SET TRANSACTION READ ONLY"] if read_only else []
+    statements.append(f"SET LOCAL statement_timeout = {timeout_ms}")
+    return "; ".join(statements)
+
+
+async def apply_limits(conn, read_only: bool):
+    """Make the connection's current transaction read-only (for reads) and time-limited; call first."""
+    if settings.QUERY_GUARD_ENABLED:
+        await conn.execute(_limits_sql(read_only))
+
+
+def apply_limits_sync(conn, read_only: bool):
+    """Blocking counterpart of ``apply_limits``."""
+    if settings.QUERY_GUARD_ENABLED:
+        conn.execute(_limits_sql(read_only))
+
+
+def _decode_plan(value: Any) -> Dict[str, Any]:
+    return (json.loads(value) if isinstance(value, str) else value)[0]
+
+
+@timed("guard_sql")
+async def guard_sql(database: str, sql_query: str, row_limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Plan a generated query without running it, and bound or reject it.
+
+    Unbounded SELECTs get a row limit (``QUERY_ROW_LIMIT`` by default), then
+    the query is planned with ``EXPLAIN`` (no ANALYZE) and rejected with
+    ``QueryRejected`` if its estimated cost or rows exceed the ceilings.
+    Statements that cannot be explained (e.g. DDL) pass unplanned.
+
+    Returns:
+        Dict[str, Any]: ``sql_query`` (possibly rewritten), ``row_limit`` (the
+        injected limit, or None), ``query_plan`` (summary, or None) and
+        ``plan`` (the raw ``EXPLAIN (VERBOSE, FORMAT JSON)`` plan, or None).
+    """
+    if not settings.QUERY_GUARD_ENABLED:
+        return {"sql_query": sql_query, "row_limit": None, "query_plan": None, "plan": None}
+    row_limit = row_limit or settings.QUERY_ROW_LIMIT
+    sql_query, limited = add_limit(sql_query, row_limit)
+    read_only = is_read_only(sql_query)
+    try:
+        async with pool_manager.async_connection(database) as conn:
+            await apply_limits(conn, read_only)
+            async with conn.cursor() as cur:
+                await cur.execute("EXPLAIN (VERBOSE, FORMAT JSON) " + sql_query)
+                plan = _decode_plan((await cur.fetchone())[0])
+    except Exception:
+        if read_only:
+            raise  # The query itself is broken; running it would fail the same way
+        logger.exception("Error planning SQL")
+        plan = None
+
+    summary = summarize_plan(plan) if plan is not None else None
+    if summary is not None:
+        check_plan(summary)
+    return {
+        "sql_query": sql_query,
+        "row_limit": row_limit if limited else None,
+        "query_plan": summary,
+        "plan": plan
+    }
+
+
+def guard_sql_sync(conn, sql_query: str, row_limit: Optional[int] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Blocking counterpart of ``guard_sql`` on a borrowed connection.
+
+    Applies the transaction limits, so call it before executing anything else
+    on ``conn``; returns (sql, plan summary).
+    """
+    if not settings.QUERY_GUARD_ENABLED:
+        return sql_query, None
+    sql_query, _ = add_limit(sql_query, row_limit or settings.QUERY_ROW_LIMIT)
+    read_only = is_read_only(sql_query)
+    apply_limits_sync(conn, read_only)
+    if not read_only:
+        return sql_query, None
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql_query)
+        summary = summarize_plan(_decode_plan(cur.fetchone()[0]))
+    check_plan(summary)
+    return sql_query, summary
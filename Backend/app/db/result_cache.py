@@ -0,0 +1,236 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import timed
+from app.db.pool import pool_manager
+
+logger = get_logger("result_cache")
+
+# Write activity per table: tuple counters, plus the file node so TRUNCATE and
+# table rewrites (which the counters miss) also count as a change
+TABLE_VERSIONS_QUERY = """
+    SELECT s.schemaname, s.relname,
+           s.n_tup_ins + s.n_tup_upd + s.n_tup_del,
+           pg_relation_filenode(s.relid)
+    FROM pg_stat_user_tables s
+    JOIN unnest(%s::text[], %s::text[]) AS t(schemaname, relname) USING (schemaname, relname)
+"""
+
+# Plan nodes that read data the table counters cannot see
+_OPAQUE_SCANS = {"Function Scan", "Table Function Scan", "Foreign Scan", "Custom Scan"}
+
+# Functions whose value changes without any table write
+_VOLATILE = re.compile(
+    r"\b(now|current_date|current_time|current_timestamp|localtime|localtimestamp|clock_timestamp|"
+    r"statement_timestamp|transaction_timestamp|timeofday|random|gen_random_uuid|nextval)\b",
+    re.IGNORECASE
+)
+
+Table = Tuple[str, str]
+
+
+def normalize_sql(sql_query: str) -> str:
+    """Collapse whitespace and drop a trailing semicolon (literals are left alone)."""
+    return " ".join(sql_query.split()).rstrip(";").rstrip()
+
+
+def _plan_tables(plan: Dict[str, Any], tables: set) -> bool:
+    """Collect (schema, table) of every scanned relation; False if some input is opaque."""
+    determinable = plan.get("Node Type") not in _OPAQUE_SCANS
+    if "Relation Name" in plan:
+        tables.add((plan.get("Schema", "public"), plan["Relation Name"]))
+    for child in plan.get("Plans", []):
+        determinable = _plan_tables(child, tables) and determinable
+    return determinable
+
+
+class Snapshot:
+    """Referenced tables of a query and their write counters before it ran (tables None: TTL only)."""
+
+    def __init__(self, tables: Optional[List[Table]] = None, versions: Optional[Tuple] = None):
+        self.tables = tables
+        self.versions = versions
+
+    @property
+    def validation(self) -> str:
+        return "tables" if self.tables is not None else "ttl"
+
+
+class _CachedResult:
+    def __init__(self, rows: List[Dict[str, Any]], snapshot: Snapshot):
+        self.rows = rows
+        self.snapshot = snapshot
+        self.created_at = time.monotonic()
+
+
+class ResultCache:
+    """
+    Cache of query results keyed by (database, normalized SQL).
+
+    When a result is stored, the tables its plan reads are taken from
+    ``EXPLAIN`` and their write counters from ``pg_stat_user_tables``; a cached
+    result is served only while those counters are unchanged, and for at most
+    ``ttl`` seconds. Queries whose tables cannot be determined (no tables,
+    function or foreign scans, catalog tables, volatile functions such as
+    ``now()``) are validated by the ``ttl`` alone. Results over ``max_rows``
+    rows are not cached and at most ``max_entries`` results are kept,
+    evicting the least recently used.
+
+    Table statistics are reported with a short delay (and not at all with
+    ``track_counts`` off), so a counter-validated result can miss writes
+    committed in the last ``stats_lag`` seconds; statements run through the
+    app call ``invalidate`` instead of waiting for the counters.
+    """
+
+    def __init__(self, max_entries: int = 500, max_rows: int = 10000, ttl: float = 60.0, stats_lag: float = 1.0):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.stats_lag = stats_lag
+        self._entries: "OrderedDict[Tuple[str, str], _CachedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def _versions(self, conn, tables: List[Table]) -> Dict[Table, Tuple[int, int]]:
+        async with conn.cursor() as cur:
+            await cur.execute(TABLE_VERSIONS_QUERY, ([s for s, _ in tables], [t for _, t in tables]))
+            return {(schema, table): (writes, filenode) for schema, table, writes, filenode in await cur.fetchall()}
+
+    async def snapshot(self, database: str, sql_query: str, plan: Optional[Dict[str, Any]] = None) -> Snapshot:
+        """
+        Find the tables a query reads and record their write counters; call before executing it.
+
+        ``plan`` is the query's ``EXPLAIN (VERBOSE, FORMAT JSON)`` plan when the
+        caller already has it (e.g. from the query guard); otherwise it is fetched.
+        """
+        if _VOLATILE.search(sql_query):
+            return Snapshot()
+        try:
+            async with pool_manager.async_connection(database) as conn:
+                if plan is None:
+                    async with conn.cursor() as cur:
+                        await cur.execute("EXPLAIN (VERBOSE, FORMAT JSON) " + sql_query)
+                        plan = (await cur.fetchone())[0]
+                    plan = json.loads(plan) if isinstance(plan, str) else plan
+                    plan = plan[0]
+                tables: set = set()
+                if not _plan_tables(plan["Plan"], tables) or not tables:
+                    return Snapshot()
+                tables = sorted(tables)
+                versions = await self._versions(conn, tables)
+        except Exception:
+            logger.exception("Error resolving query tables")
+            return Snapshot()
+        if len(versions) != len(tables):
+            return Snapshot()  # Catalog or other non-user tables
+        return Snapshot(tables, tuple(versions[table] for table in tables))
+
+    def _info(self, entry: Optional[_CachedResult], validation: str) -> Dict[str, Any]:
+        if entry is None:
+            return {
+                "results_cached": False,
+                "results_cache_age": None,
+                "results_cache_validation": validation,
+                "results_max_staleness": 0.0
+            }
+        age = time.monotonic() - entry.created_at
+        return {
+            "results_cached": True,
+            "results_cache_age": round(age, 3),
+            "results_cache_validation": validation,
+            # Upper bound on how long a change may have gone unnoticed
+            "results_max_staleness": round(age if validation == "ttl" else min(age, self.stats_lag), 3)
+        }
+
+    def _drop(self, key: Tuple[str, str], entry: _CachedResult):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+
+    @timed("result_cache_lookup")
+    async def lookup(self, database: str, sql_query: str) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Return a still valid cached result.
+
+        Returns:
+            Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]: (rows, cache info)
+            with ``results_cached``, ``results_cache_age``, ``results_cache_validation``
+            and ``results_max_staleness``, or None.
+        """
+        key = (database, normalize_sql(sql_query))
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        snapshot = entry.snapshot
+        if time.monotonic() - entry.created_at >= self.ttl:
+            valid = False  # Also bounds results whose counters missed a write
+        elif snapshot.tables is None:
+            valid = True
+        else:
+            try:
+                async with pool_manager.async_connection(database) as conn:
+                    versions = await self._versions(conn, snapshot.tables)
+                valid = tuple(versions.get(table) for table in snapshot.tables) == snapshot.versions
+            except Exception:
+                logger.exception("Error checking table versions")
+                valid = False
+
+        with self._lock:
+            if valid:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self._drop(key, entry)
+                self.misses += 1
+                self.invalidations += 1
+        return (entry.rows, self._info(entry, snapshot.validation)) if valid else None
+
+    def store(self, database: str, sql_query: str, rows: List[Dict[str, Any]], snapshot: Snapshot) -> Dict[str, Any]:
+        """Remember a result and return the cache info of a freshly executed query."""
+        if len(rows) <= self.max_rows:
+            with self._lock:
+                self._entries[(database, normalize_sql(sql_query))] = _CachedResult(rows, snapshot)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return self._info(None, snapshot.validation)
+
+    def invalidate(self, database: Optional[str] = None):
+        """Drop cached results for one database, or all."""
+        with self._lock:
+            for key in [key for key in self._entries if database is None or key[0] == database]:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and the number of cached results."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "rows": sum(len(entry.rows) for entry in self._entries.values()),
+                "table_validated": sum(1 for entry in self._entries.values() if entry.snapshot.tables is not None),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_SIZE,
+    max_rows=settings.RESULT_CACHE_MAX_ROWS,
+    ttl=settings.RESULT_CACHE_TTL,
+    stats_lag=settings.RESULT_CACHE_STATS_LAG
+)
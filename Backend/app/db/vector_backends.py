@@ -0,0 +1,401 @@
+import json
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, TypeVar
+from app.core.config import settings
+from app.db.milvus_client import milvus_manager, pymilvus
+
+# Same search parameters the Milvus call sites used before the backend split
+MILVUS_SEARCH_PARAMS = {"metric_type": "IP", "params": {"nprobe": 10}}
+MILVUS_INDEX_PARAMS = {"index_type": "IVF_FLAT", "metric_type": "IP", "params": {"nlist": 128}}
+# Largest result window of an unfiltered Milvus query
+MILVUS_QUERY_WINDOW = 16384
+
+# Partition that rows written without a partition go to
+DEFAULT_PARTITION = "_default"
+
+Filters = Dict[str, Any]
+T = TypeVar("T")
+
+
+class VectorBackend:
+    """
+    Storage for one vector collection: scalar fields plus an ``embedding`` per row.
+
+    Filters map a field name to a value (equality) or a list of values
+    (membership); all conditions must hold. Search is top-k by inner product.
+
+    Rows can be split into named partitions (e.g. one per database). Writes go
+    to ``partition``, or the default partition if it is None; reads touch only
+    ``partition``, or every partition if it is None. A partition is loaded on
+    its first read and can be released to free its memory. Owners whose reads
+    are always scoped set ``require_partition``, so that an unscoped read
+    fails instead of loading every partition.
+    """
+
+    kind = "abstract"
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.require_partition = False
+
+    def _check_partition(self, partition: Optional[str]):
+        """Raise ``ValueError`` for an unscoped read of a collection that requires a partition."""
+        if partition is None and self.require_partition:
+            raise ValueError(
+                f"Reads of collection '{self.collection_name}' must name a partition; "
+                "an unscoped read would load every partition"
+            )
+
+    def ensure_ready(self):
+        """Open the collection, creating it if needed."""
+        raise NotImplementedError
+
+    def insert(self, rows: List[Dict[str, Any]], partition: Optional[str] = None):
+        """Append rows; each row holds the scalar fields and ``embedding``."""
+        raise NotImplementedError
+
+    def delete(self, filters: Filters, partition: Optional[str] = None):
+        """Delete every row matching ``filters``."""
+        raise NotImplementedError
+
+    def upsert(self, rows: List[Dict[str, Any]], key: str, partition: Optional[str] = None):
+        """Insert rows, replacing the stored rows with the same ``key`` field value."""
+        if rows:
+            self.delete({key: [row[key] for row in rows]}, partition)
+            self.insert(rows, partition)
+
+    def query(
+        self,
+        filters: Filters,
+        output_fields: List[str],
+        limit: Optional[int] = None,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return ``output_fields`` of the rows matching ``filters`` (every row if ``filters`` is empty)."""
+        raise NotImplementedError
+
+    def query_pages(
+        self,
+        filters: Filters,
+        output_fields: List[str],
+        page_size: int = 1000,
+        partition: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the rows matching ``filters`` in pages of at most ``page_size`` rows, for results of any size."""
+        rows = self.query(filters, output_fields, partition=partition)
+        for offset in range(0, len(rows), page_size):
+            yield rows[offset:offset + page_size]
+
+    def search(
+        self,
+        embedding: List[float],
+        limit: int,
+        output_fields: List[str],
+        filters: Optional[Filters] = None,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the ``limit`` rows with the highest inner product, best first, each with a ``score``."""
+        raise NotImplementedError
+
+    def partitions(self) -> List[str]:
+        """Return the names of the partitions other than the default one."""
+        raise NotImplementedError
+
+    def load_partition(self, partition: str):
+        """Load a partition into memory ahead of its first read."""
+        raise NotImplementedError
+
+    def release_partition(self, partition: str):
+        """Free a partition's memory; its next read loads it again."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Make rows written so far searchable."""
+
+    def drop(self):
+        """Delete the collection and all its rows; ``ensure_ready`` creates it again."""
+        raise NotImplementedError
+
+    def exists(self) -> bool:
+        """Whether the collection has been created."""
+        raise NotImplementedError
+
+    def replace(self, source: "VectorBackend"):
+        """Replace this collection with ``source``'s rows and schema; ``source`` is gone afterwards."""
+        raise NotImplementedError
+
+    def has_field(self, field: str) -> bool:
+        """Whether the collection's rows have ``field`` (schemaless backends: every row of the default partition)."""
+        return True
+
+    def field_max_length(self, field: str) -> Optional[int]:
+        """Return the maximum byte length of a VARCHAR field, if the backend enforces one."""
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.kind, "collection": self.collection_name}
+
+
+def filter_expr(filters: Filters) -> str:
+    """Build a Milvus boolean expression from ``filters``."""
+    if not filters:
+        raise ValueError("At least one filter is required")
+    conditions = []
+    for field, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            conditions.append(f"{field} in {json.dumps(list(value))}")
+        else:
+            conditions.append(f"{field} == {json.dumps(value)}")
+    return " && ".join(conditions)
+
+
+class MilvusBackend(VectorBackend):
+    """Backend for a collection in the shared Milvus connection; partitions are Milvus partitions."""
+
+    kind = "milvus"
+
+    def __init__(self, collection_name: str, create: Optional[Callable[[], Any]] = None):
+        super().__init__(collection_name)
+        self.create = create
+        self._partitions: Set[str] = set()
+        self._partitions_lock = threading.Lock()
+
+    def ensure_ready(self):
+        milvus_manager.connect()
+        if self.create is None:
+            return
+        if not milvus_manager.has_collection(self.collection_name):
+            self.create()
+        else:
+            # Collections created without one cannot be loaded, so not even read
+            self._ensure_index()
+
+    def _ensure_index(self):
+        collection = milvus_manager.get_collection(self.collection_name, load=False)
+        # has_index() is ambiguous once scalar fields are indexed too
+        if not any(index.field_name == "embedding" for index in collection.indexes):
+            collection.create_index(field_name="embedding", index_params=MILVUS_INDEX_PARAMS)
+
+    def _write_partition(self, partition: Optional[str]) -> Dict[str, Any]:
+        """Keyword arguments writing to ``partition``, creating it on first use."""
+        if partition is None:
+            return {}
+        with self._partitions_lock:
+            if partition not in self._partitions:
+                collection = milvus_manager.get_collection(self.collection_name, load=False)
+                if not collection.has_partition(partition):
+                    collection.create_partition(partition)
+                self._partitions.add(partition)
+        return {"partition_name": partition}
+
+    def _has_partition(self, partition: str) -> bool:
+        with self._partitions_lock:
+            if partition in self._partitions:
+                return True
+        if milvus_manager.get_collection(self.collection_name, load=False).has_partition(partition):
+            with self._partitions_lock:
+                self._partitions.add(partition)
+            return True
+        return False
+
+    def _read(self, operation: Callable[[Any, Dict[str, Any]], T], partition: Optional[str]) -> T:
+        """Run a read on the whole collection, or on one partition loading only that partition."""
+        self._check_partition(partition)
+        extra = {"partition_names": [partition]} if partition is not None else {}
+        return milvus_manager.run(
+            self.collection_name, lambda collection: operation(collection, extra), partition=partition
+        )
+
+    def insert(self, rows: List[Dict[str, Any]], partition: Optional[str] = None):
+        if rows:
+            extra = self._write_partition(partition)
+            milvus_manager.get_collection(self.collection_name, load=False).insert(rows, **extra)
+
+    def upsert(self, rows: List[Dict[str, Any]], key: str, partition: Optional[str] = None):
+        # Native upsert on the primary key: no delete expression, no window between delete and insert
+        if rows:
+            extra = self._write_partition(partition)
+            milvus_manager.get_collection(self.collection_name, load=False).upsert(rows, **extra)
+
+    def delete(self, filters: Filters, partition: Optional[str] = None):
+        if partition is not None and not self._has_partition(partition):
+            return
+        extra = {"partition_name": partition} if partition is not None else {}
+        milvus_manager.get_collection(self.collection_name, load=False).delete(filter_expr(filters), **extra)
+
+    def query(
+        self,
+        filters: Filters,
+        output_fields: List[str],
+        limit: Optional[int] = None,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if partition is not None and not self._has_partition(partition):
+            return []
+        # Milvus requires a limit on unfiltered queries
+        expr = filter_expr(filters) if filters else ""
+        limit = limit if limit is not None or filters else MILVUS_QUERY_WINDOW
+        limit_args = {"limit": limit} if limit is not None else {}
+        return self._read(
+            lambda collection, extra: collection.query(expr, output_fields=output_fields, **limit_args, **extra),
+            partition
+        )
+
+    def query_pages(
+        self,
+        filters: Filters,
+        output_fields: List[str],
+        page_size: int = 1000,
+        partition: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        if partition is not None and not self._has_partition(partition):
+            return
+        # A query iterator is not bound by the query result window
+        iterator = self._read(
+            lambda collection, extra: collection.query_iterator(
+                batch_size=page_size,
+                expr=filter_expr(filters) if filters else "",
+                output_fields=output_fields,
+                **extra
+            ),
+            partition
+        )
+        try:
+            while True:
+                page = iterator.next()
+                if not page:
+                    return
+                yield page
+        finally:
+            iterator.close()
+
+    def search(
+        self,
+        embedding: List[float],
+        limit: int,
+        output_fields: List[str],
+        filters: Optional[Filters] = None,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if partition is not None and not self._has_partition(partition):
+            return []
+        results = self._read(
+            lambda collection, extra: collection.search(
+                data=[embedding],
+                anns_field="embedding",
+                param=MILVUS_SEARCH_PARAMS,
+                limit=limit,
+                expr=filter_expr(filters) if filters else None,
+                output_fields=output_fields,
+                **extra
+            ),
+            partition
+        )
+        return [
+            {**{field: hit.entity.get(field) for field in output_fields}, "score": hit.score}
+            for hits in results for hit in hits
+        ]
+
+    def partitions(self) -> List[str]:
+        collection = milvus_manager.get_collection(self.collection_name, load=False)
+        return sorted(partition.name for partition in collection.partitions if partition.name != DEFAULT_PARTITION)
+
+    def load_partition(self, partition: str):
+        if self._has_partition(partition):
+            milvus_manager.load_partition(self.collection_name, partition)
+
+    def release_partition(self, partition: str):
+        milvus_manager.release_partition(self.collection_name, partition)
+
+    def flush(self):
+        self._ensure_index()
+        if self.require_partition:
+            return  # Partitions are loaded by the reads that need them
+        # Loads once; an already loaded collection sees new rows without reloading
+        milvus_manager.get_collection(self.collection_name, load=True)
+
+    def _forget(self):
+        milvus_manager.release(self.collection_name)
+        milvus_manager.forget(self.collection_name)
+        with self._partitions_lock:
+            self._partitions.clear()
+
+    def drop(self):
+        self._forget()
+        if milvus_manager.has_collection(self.collection_name):
+            pymilvus.utility.drop_collection(self.collection_name, using=milvus_manager.alias)
+
+    def exists(self) -> bool:
+        return milvus_manager.has_collection(self.collection_name)
+
+    def replace(self, source: VectorBackend):
+        self.drop()
+        source._forget()
+        pymilvus.utility.rename_collection(
+            source.collection_name, self.collection_name, using=milvus_manager.alias
+        )
+
+    def _schema_field(self, field: str):
+        collection = milvus_manager.get_collection(self.collection_name, load=False)
+        for schema_field in collection.schema.fields:
+            if schema_field.name == field:
+                return schema_field
+        return None
+
+    def has_field(self, field: str) -> bool:
+        return self._schema_field(field) is not None
+
+    def field_max_length(self, field: str) -> Optional[int]:
+        schema_field = self._schema_field(field)
+        if schema_field is not None and "max_length" in schema_field.params:
+            return int(schema_field.params["max_length"])
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        manager = milvus_manager.stats()
+        return {
+            **super().stats(),
+            "loaded": self.collection_name in manager["loaded_collections"],
+            "loaded_partitions": manager["loaded_partitions"].get(self.collection_name, [])
+        }
+
+
+_backends: Dict[str, VectorBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_vector_backend(collection_name: str, create: Optional[Callable[[], Any]] = None) -> VectorBackend:
+    """
+    Return the shared backend for a collection, as configured by ``VECTOR_BACKEND``.
+
+    Args:
+        collection_name: Name of the collection.
+        create: Creates the Milvus collection (schema and index) when it is missing.
+
+    Raises:
+        ValueError: If ``VECTOR_BACKEND`` is not a known backend.
+    """
+    with _backends_lock:
+        backend = _backends.get(collection_name)
+        if backend is None:
+            if settings.VECTOR_BACKEND == "milvus":
+                backend = MilvusBackend(collection_name, create)
+            elif settings.VECTOR_BACKEND == "embedded":
+                from app.db.embedded_index import EmbeddedBackend
+                backend = EmbeddedBackend(collection_name, settings.VECTOR_STORE_DIR, settings.VECTOR_STORE_DTYPE)
+            else:
+                raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+            _backends[collection_name] = backend
+        elif create is not None and isinstance(backend, MilvusBackend) and backend.create is None:
+            backend.create = create
+        return backend
+
+
+def vector_backend_stats() -> Dict[str, Any]:
+    """Return the configured backend and per-collection stats of the backends in use."""
+    with _backends_lock:
+        backends = list(_backends.values())
+    return {
+        "backend": settings.VECTOR_BACKEND,
+        "collections": {backend.collection_name: backend.stats() for backend in backends}
+    }
@@ -1,8 +1,9 @@
 # app/utils/context_processing.py
 
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
 import json
 from datetime import datetime
+from app.core.config import settings
 from app.db.context_store import context_store
 from app.models.context import DatabaseContext, TableContext, ColumnContext
 
@@ -91,6 +92,62 @@ class ContextProcessor:
         
         return result
 
+    def process_database_context_bulk(
+        self,
+        db_name: str,
+        context: DatabaseContext,
+        include_tables: bool = True,
+        include_columns: bool = True,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Store a database context hierarchy through the batched write path.
+
+        All entities are collected first and written with batched embeddings,
+        one upsert per batch, instead of one round trip per entity. Blocking:
+        it runs on a job worker thread. ``progress`` is passed on to
+        ``ContextStore.store_contexts_bulk_sync``.
+        """
+        now = datetime.now()
+        store_tables = include_tables and bool(context.tables)
+
+        # Tables stored as their own entities are not duplicated inside the database context
+        db_data = context.dict(exclude={"tables"} if store_tables else None)
+        db_data["last_updated"] = now
+        entities = [{
+            "entity_type": "database",
+            "entity_name": db_name,
+            "context_data": db_data
+        }]
+
+        if store_tables:
+            for table in context.tables:
+                table_data = table.dict()
+                table_data["last_updated"] = now
+                entities.append({
+                    "entity_type": "table",
+                    "entity_name": f"{db_name}.{table.name}",
+                    "context_data": table_data,
+                    "parent_entity": db_name
+                })
+
+                if include_columns and table.columns:
+                    for column in table.columns:
+                        column_data = column.dict()
+                        column_data["last_updated"] = now
+                        entities.append({
+                            "entity_type": "column",
+                            "entity_name": f"{db_name}.{table.name}.{column.name}",
+                            "context_data": column_data,
+                            "parent_entity": f"{db_name}.{table.name}"
+                        })
+
+        return self.context_store.store_contexts_bulk_sync(
+            entities,
+            batch_size=settings.CONTEXT_BATCH_SIZE,
+            progress=progress
+        )
+
     async def enrich_query_context(
         self, 
         query: str, 
@@ -101,10 +158,11 @@ class ContextProcessor:
         Used before query generation to provide more context to the LLM.
         """
         try:
-            # Search for similar contexts
+            # Search for similar contexts in the target database only
             similar_contexts = await self.context_store.search_similar_contexts(
                 query_text=query,
-                limit=3
+                limit=3,
+                database=db_name
             )
             
             # Extract and organize relevant context
@@ -141,16 +199,16 @@ class ContextProcessor:
         Useful for providing overall context to the LLM.
         """
         try:
-            # Get database context
-            db_context = await self.context_store.retrieve_context(
+            # Get database context with its tables (and their columns) in one batched fetch
+            db_context = await self.context_store.retrieve_subtree(
                 entity_type="database",
                 entity_name=db_name,
-                include_children=include_tables
+                depth=2 if include_columns else 1 if include_tables else 0
             )
             
             overview = {
                 "database": db_name,
-                "context": db_context.get("data", {}),
+                "context": {key: value for key, value in db_context.get("data", {}).items() if key != "children"},
                 "tables": []
             }
             
@@ -158,22 +216,18 @@ class ContextProcessor:
                 # Get context for each table
                 table_contexts = db_context.get("data", {}).get("children", {}).get("table", [])
                 for table_ctx in table_contexts:
+                    children = table_ctx.pop("children", {})
                     table_info = {
                         "name": table_ctx.get("name", ""),
                         "context": table_ctx
                     }
                     
                     if include_columns and "columns" in table_ctx:
-                        table_info["columns"] = []
-                        for col in table_ctx["columns"]:
-                            col_context = await self.context_store.retrieve_context(
-                                entity_type="column",
-                                entity_name=f"{db_name}.{table_ctx['name']}.{col['name']}"
-                            )
-                            table_info["columns"].append({
-                                "name": col["name"],
-                                "context": col_context.get("data", {})
-                            })
+                        column_contexts = {column.get("name"): column for column in children.get("column", [])}
+                        table_info["columns"] = [
+                            {"name": col["name"], "context": column_contexts.get(col["name"], {})}
+                            for col in table_ctx["columns"]
+                        ]
                             
                     overview["tables"].append(table_info)
             
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.lazy import lazy_import
+
+# numpy is only needed once an embedding is cached or read back
+np = lazy_import("numpy")
+
+try:
+    import fcntl
+except ImportError:  # Non-POSIX: the disk tier still works, but is not shared safely across processes
+    fcntl = None
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different strings share a cache entry."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(model: str, text: str) -> bytes:
+    """Return the 20-byte cache key for (model, normalized text)."""
+    return hashlib.sha1(f"{model}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+@contextmanager
+def _file_lock(path: str, shared: bool = False):
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@functools.lru_cache(maxsize=None)
+def _record_dtype():
+    """Index record layout: (20-byte key, uint64 row)."""
+    return np.dtype([("key", "S20"), ("row", "<u8")])
+
+
+class _DiskTier:
+    """
+    Append-only on-disk embedding store for one model.
+
+    Vectors are stored as float16 rows in ``vectors.f16`` and read through a
+    memory map. ``index.bin`` holds fixed-size records of (20-byte key, uint64
+    row). Writers append under an exclusive file lock, and readers pick up
+    records written by other processes by reading the index tail on a miss.
+    """
+
+    def __init__(self, directory: str, max_rows: int):
+        self.directory = directory
+        self.max_rows = max_rows
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "index.bin")
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, "lock")
+        self._rows: Dict[bytes, int] = {}
+        self._index_offset = 0
+        self._dim: Optional[int] = None
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load_dim(self) -> Optional[int]:
+        if self._dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as handle:
+                self._dim = json.load(handle)["dim"]
+        return self._dim
+
+    def _refresh(self):
+        """Read index records appended since the last refresh."""
+        if not os.path.exists(self.index_path):
+            return
+        size = os.path.getsize(self.index_path)
+        size -= size % _record_dtype().itemsize  # Ignore a partially written record
+        if size <= self._index_offset:
+            return
+        with open(self.index_path, "rb") as handle:
+            handle.seek(self._index_offset)
+            records = np.frombuffer(handle.read(size - self._index_offset), dtype=_record_dtype())
+        for key, row in zip(records["key"].tolist(), records["row"].tolist()):
+            self._rows[key] = row
+        self._index_offset = size
+
+    def _row_vector(self, row: int) -> Optional[np.ndarray]:
+        dim = self._load_dim()
+        if dim is None:
+            return None
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            rows = os.path.getsize(self.vectors_path) // (dim * 2)
+            if row >= rows:
+                return None
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, dim))
+        return np.asarray(self._mmap[row], dtype=np.float32)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self._refresh()
+                row = self._rows.get(key)
+            return None if row is None else self._row_vector(row)
+
+    def put(self, key: bytes, vector: np.ndarray) -> bool:
+        """Persist a vector; returns False if the tier is full or the dimension does not match."""
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            if key in self._rows:
+                return True
+            if len(self._rows) >= self.max_rows:
+                return False
+
+            dim = self._load_dim()
+            if dim is None:
+                dim = self._dim = int(vector.shape[0])
+                with open(self.meta_path, "w") as handle:
+                    json.dump({"dim": dim}, handle)
+            if vector.shape[0] != dim:
+                return False
+
+            # Rows are derived from the vectors file size, so a torn write
+            # from a crashed writer is truncated rather than misaligning rows
+            with open(self.vectors_path, "ab") as handle:
+                row_bytes = dim * 2
+                size = handle.seek(0, os.SEEK_END)
+                if size % row_bytes:
+                    handle.truncate(size - size % row_bytes)
+                row = size // row_bytes
+                handle.write(vector.astype(np.float16).tobytes())
+
+            record = np.array([(key, row)], dtype=_record_dtype())
+            with open(self.index_path, "ab") as handle:
+                handle.write(record.tobytes())
+            self._rows[key] = row
+            self._index_offset += _record_dtype().itemsize
+            return True
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, normalized text hash).
+
+    The first tier is a bounded in-process LRU; the second an optional
+    memory-mapped float16 store on disk that survives restarts and is shared
+    by all workers on the host. Disk hits are promoted into the LRU.
+    """
+
+    def __init__(self, max_entries: int = 10000, directory: Optional[str] = None, disk_max_rows: int = 200000):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.disk_max_rows = disk_max_rows
+        self._memory: "OrderedDict[Tuple[str, bytes], np.ndarray]" = OrderedDict()
+        self._disk: Dict[str, _DiskTier] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_rejected = 0
+
+    def _disk_tier(self, model: str) -> Optional[_DiskTier]:
+        if not self.directory:
+            return None
+        with self._lock:
+            tier = self._disk.get(model)
+            if tier is None:
+                slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+                tier = self._disk[model] = _DiskTier(os.path.join(self.directory, slug), self.disk_max_rows)
+            return tier
+
+    def _remember(self, model: str, key: bytes, vector: np.ndarray):
+        with self._lock:
+            self._memory[(model, key)] = vector
+            self._memory.move_to_end((model, key))
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, model: str, text: str, disk: bool = True) -> Optional[List[float]]:
+        """
+        Return the cached embedding of ``text`` or None.
+
+        With ``disk=False`` only the in-memory tier is consulted (no file
+        access, so it is safe on an event loop); a miss there is not counted
+        when a disk tier exists, since the caller looks there next.
+        """
+        key = cache_key(model, text)
+        with self._lock:
+            vector = self._memory.get((model, key))
+            if vector is not None:
+                self._memory.move_to_end((model, key))
+                self.memory_hits += 1
+                return vector.tolist()
+            if not disk and self.directory:
+                return None
+
+        tier = self._disk_tier(model) if disk else None
+        vector = tier.get(key) if tier is not None else None
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(model, key, vector)
+        return vector.tolist()
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """Store an embedding in both tiers."""
+        key = cache_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._remember(model, key, vector)
+        tier = self._disk_tier(model)
+        if tier is not None and not tier.put(key, vector):
+            with self._lock:
+                self.disk_rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and tier sizes."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_rejected": self.disk_rejected,
+                "memory_entries": len(self._memory),
+                "memory_max_entries": self.max_entries,
+                "disk_entries": {model: len(tier) for model, tier in self._disk.items()},
+            }
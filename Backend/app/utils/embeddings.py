@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List, Optional, TYPE_CHECKING
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.llm_scheduler import llm_scheduler
+from app.core.metrics import stage
+from app.core.singleflight import singleflight
+from app.utils.embedding_cache import EmbeddingCache, normalize_text
+
+if TYPE_CHECKING:
+    from ollama import AsyncClient, Client
+
+# The ollama client (and httpx under it) is imported on first use
+ollama = lazy_import("ollama")
+
+EMBEDDING_MODEL = "mxbai-embed-large:335m-v1-fp16"
+
+embedding_cache = EmbeddingCache(
+    max_entries=settings.EMBEDDING_CACHE_SIZE,
+    directory=settings.EMBEDDING_CACHE_DIR or None,
+    disk_max_rows=settings.EMBEDDING_CACHE_DISK_MAX_ROWS
+)
+
+_ollama: Optional[Client] = None
+_async_ollama: Optional[AsyncClient] = None
+
+def get_ollama() -> Client:
+    """Return the shared Ollama client for blocking calls, creating it on first use."""
+    global _ollama
+    if _ollama is None:
+        _ollama = ollama.Client(host=settings.OLLAMA_API_URL)
+    return _ollama
+
+def get_async_ollama() -> AsyncClient:
+    """Return the shared async Ollama client, creating it on first use."""
+    global _async_ollama
+    if _async_ollama is None:
+        _async_ollama = ollama.AsyncClient(host=settings.OLLAMA_API_URL)
+    return _async_ollama
+
+def _split_cached(texts: List[str], model: str, disk: bool = True):
+    embeddings = [embedding_cache.get(model, text, disk=disk) for text in texts]
+    # Deduplicate the misses so repeated texts are embedded once
+    missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+    return embeddings, missing
+
+def _merge(texts: List[str], embeddings: List[Optional[List[float]]], missing: List[str], fresh: List[List[float]], model: str):
+    computed = dict(zip(missing, fresh))
+    for text, embedding in computed.items():
+        embedding_cache.put(model, text, embedding)
+    return [embedding if embedding is not None else computed[text] for text, embedding in zip(texts, embeddings)]
+
+def embed_texts(texts: List[str], model: str = EMBEDDING_MODEL) -> List[List[float]]:
+    """Embed texts with Ollama, serving repeated texts from the embedding cache."""
+    embeddings, missing = _split_cached(texts, model)
+    fresh = []
+    if missing:
+        with llm_scheduler("embed").slot_sync(), stage("embed"):
+            fresh = get_ollama().embed(model=model, input=missing)["embeddings"]
+    return _merge(texts, embeddings, missing, fresh, model)
+
+async def embed_texts_async(texts: List[str], model: str = EMBEDDING_MODEL) -> List[List[float]]:
+    """
+    Async variant of ``embed_texts`` using the async Ollama client.
+
+    Only the in-memory tier of the cache is consulted on the event loop; the
+    disk tier reads files and takes a file lock, so its lookups and the
+    storing of new embeddings run in a worker thread.
+    """
+    embeddings, missing = _split_cached(texts, model, disk=False)
+    on_disk = bool(embedding_cache.directory)
+    if missing and on_disk:
+        stored, still_missing = await asyncio.to_thread(_split_cached, missing, model)
+        found = {text: embedding for text, embedding in zip(missing, stored) if embedding is not None}
+        embeddings = [
+            embedding if embedding is not None else found.get(text)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        missing = still_missing
+    fresh = []
+    if missing:
+        async with llm_scheduler("embed").slot():
+            with stage("embed"):
+                fresh = (await get_async_ollama().embed(model=model, input=missing))["embeddings"]
+    if missing and on_disk:
+        return await asyncio.to_thread(_merge, texts, embeddings, missing, fresh, model)
+    return _merge(texts, embeddings, missing, fresh, model)
+
+def embed_text(text: str, model: str = EMBEDDING_MODEL) -> List[float]:
+    """Embed a single text (cached)."""
+    return embed_texts([text], model)[0]
+
+async def embed_text_async(text: str, model: str = EMBEDDING_MODEL) -> List[float]:
+    """Embed a single text with the async client (cached; concurrent identical texts share one call)."""
+    return await singleflight("embedding").do(
+        (model, normalize_text(text)),
+        lambda: _embed_one_async(text, model)
+    )
+
+async def _embed_one_async(text: str, model: str) -> List[float]:
+    return (await embed_texts_async([text], model))[0]
+
+def warm_up(model: str = EMBEDDING_MODEL):
+    """Create the Ollama clients and load the embedding model ahead of the first request."""
+    get_async_ollama()
+    get_ollama().embed(model=model, input=["warm-up"])
@@ -0,0 +1,64 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+class JSONFieldStream:
+    """
+    Incremental scanner for the top-level string fields of a streamed JSON object.
+
+    Feed the model output chunk by chunk; ``feed`` returns the (key, value)
+    pairs of top-level string fields that were completed by the chunk, so a
+    field such as ``query`` can be acted on before the rest of the object (e.g.
+    ``thoughts``) has been generated. Nested values are skipped over; escapes
+    are decoded with ``json.loads`` once a string is complete.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer: List[str] = []
+        self._key: Optional[str] = None
+        self._expect_value = False
+
+    def _close_string(self) -> Optional[Tuple[str, str]]:
+        text = json.loads('"' + "".join(self._buffer) + '"')
+        self._buffer = []
+        if self._depth != 1:
+            return None
+        if self._expect_value and self._key is not None:
+            key, self._key, self._expect_value = self._key, None, False
+            self.fields[key] = text
+            return key, text
+        self._key = text
+        return None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk and return the top-level string fields it completed."""
+        completed = []
+        for char in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    field = self._close_string()
+                    if field is not None:
+                        completed.append(field)
+                    continue
+                self._buffer.append(char)
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            elif char == ":" and self._depth == 1:
+                self._expect_value = True
+            elif char == "," and self._depth == 1:
+                # A non-string value ended; forget its key
+                self._key, self._expect_value = None, False
+        return completed
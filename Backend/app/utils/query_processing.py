@@ -1,59 +1,100 @@
-from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
-import ollama
+import asyncio
 import json
-import psycopg
+from contextlib import aclosing
+from datetime import date, datetime, time
+from time import perf_counter
+from decimal import Decimal
 from app.core.config import settings
-from typing import List, Dict, Any, Optional
-from app.utils.db_url_util import get_db_connection_params
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from app.db.session import get_db_connection
+from app.db.pool import pool_manager
+from app.db.vector_backends import get_vector_backend
+from app.utils.context_processing import context_processor
+from app.db.context_store import context_store
+from app.utils.embeddings import embed_text, embed_text_async, get_async_ollama, get_ollama
+from app.utils.sql_cache import sql_cache
+from app.db.result_cache import result_cache
+from app.db.query_guard import QueryRejected, add_limit, apply_limits, guard_sql, guard_sql_sync, is_read_only
+from app.db.catalog_cache import catalog_cache
+from app.utils.schema_context import build_schema_context, estimate_tokens, merge_table_keys
+from app.utils.schema_ingestion import schema_collection_name
+from app.utils.json_stream import JSONFieldStream
+from app.utils.embedding_cache import normalize_text
+from app.core.singleflight import singleflight
+from app.core.llm_scheduler import LLMOverloaded, llm_scheduler
+from app.core.metrics import observe_rows, observe_tokens, record_stage, timed
+from app.core.logging import get_logger
 
+SQL_MODEL = "qwen2.5-coder:14b"
+
+logger = get_logger("query_processing")
+
+@timed("vector_search")
+def _search_schema(query_embedding: List[float], milvus_collection_name: str) -> List[str]:
+    """Search the schema collection for the descriptions closest to an embedding (blocking)."""
+    # Vector similarity search on the configured backend (Milvus or the embedded index)
+    hits = get_vector_backend(milvus_collection_name).search(
+        query_embedding, settings.SCHEMA_SEARCH_LIMIT, ["description"]
+    )
+
+    # Extract schema descriptions
+    return [hit["description"] for hit in hits]
+
+@timed("retrieve_relevant_schema")
 def retrieve_relevant_schema(user_query: str, milvus_collection_name: str = "db_schema") -> Optional[List[str]]:
-    """Retrieve relevant schema context for a user query using embeddings stored in Milvus."""
+    """Retrieve relevant schema context for a user query using the stored schema embeddings."""
     try:
-        connections.connect(
-            "default", 
-            host=settings.MILVUS_HOST, 
-            port=settings.MILVUS_PORT
-        )
-        collection = Collection(milvus_collection_name)
-        collection.load()
+        # Generate query embedding using Ollama (cached)
+        query_embedding = embed_text(user_query)
+        return _search_schema(query_embedding, milvus_collection_name)
 
-        # Generate query embedding using Ollama
-        embedding_response = ollama.embed(
-            model="mxbai-embed-large:335m-v1-fp16", 
-            input=user_query
-        )
-        query_embedding = embedding_response["embeddings"][0]
+    except LLMOverloaded:
+        raise
+    except Exception:
+        logger.exception("Error retrieving schema")
+        return None
 
-        # Perform vector similarity search
-        search_params = {
-            "metric_type": "IP", 
-            "params": {"nprobe": 10}
-        }
-        results = collection.search(
-            data=[query_embedding],
-            anns_field="embedding",
-            param=search_params,
-            limit=3,
-            output_fields=["description"]
+@timed("retrieve_relevant_schema")
+async def retrieve_relevant_schema_async(
+    user_query: str,
+    milvus_collection_name: str = "db_schema",
+    query_embedding: Optional[List[float]] = None
+) -> Optional[List[str]]:
+    """Async variant of ``retrieve_relevant_schema``; the vector search runs off the event loop."""
+    try:
+        if query_embedding is None:
+            query_embedding = await embed_text_async(user_query)
+        # Concurrent identical questions share one search
+        return await singleflight("schema_retrieval").do(
+            (milvus_collection_name, normalize_text(user_query)),
+            lambda: asyncio.to_thread(_search_schema, query_embedding, milvus_collection_name)
         )
 
-        # Extract schema descriptions
-        schema_context = []
-        for hits in results:
-            for hit in hits:
-                schema_context.append(hit.entity.get("description"))
-        return schema_context
-
-    except Exception as e:
-        print(f"Error retrieving schema: {e}")
+    except LLMOverloaded:
+        raise
+    except Exception:
+        logger.exception("Error retrieving schema")
         return None
 
-def generate_sql_query(schema_context: List[str], user_query: str) -> Optional[str]:
-    """Generate SQL query using LLM."""
-    try:
-        prompt = f"""
+def _build_sql_prompt(
+    schema_context: List[str],
+    user_query: str,
+    enriched_context: Optional[Dict[str, Any]] = None
+) -> str:
+    """Build the SQL generation prompt, adding stored business context when available."""
+    business_context = ""
+    if enriched_context and enriched_context.get("relevant_contexts"):
+        lines = [
+            f"- {ctx['type']} {ctx['name']}: {ctx['description'] or ''} {ctx['business_context'] or ''}".rstrip()
+            for ctx in enriched_context["relevant_contexts"]
+        ]
+        business_context = "Additional business context:\n        " + "\n        ".join(lines)
+
+    schema_lines = "\n        ".join(schema_context)
+    return f"""
         You are a database assistant for a PostGreSql DB. The schema of the database is as follows:
-        {schema_context}
+        {schema_lines}
+        {business_context}
 
         User Query: {user_query}
 
@@ -62,146 +103,569 @@ def generate_sql_query(schema_context: List[str], user_query: str) -> Optional[s
         {{"query":"string", "thoughts":"string"}}
         """
 
-        model = "qwen2.5-coder:14b"
-        response = ollama.chat(
-            model=model, 
+def _validate_sql(sql_query: str) -> Optional[str]:
+    """Sanity-check generated SQL; returns the stripped statement or None."""
+    sql_query = sql_query.strip()
+
+    # Basic validation
+    if not sql_query.lower().startswith(("select", "insert", "update", "delete", "create", "drop", "alter", "with")):
+        logger.warning("Unexpected response format")
+        return None
+
+    return sql_query
+
+def _parse_sql_response(content: str) -> Optional[str]:
+    """Extract and sanity-check the SQL from the model's JSON answer."""
+    contents = json.loads(content)
+    return _validate_sql(contents['query'])
+
+def _record_usage(usage: Optional[Dict[str, Any]], prompt: str, response: Any):
+    """Fill ``usage`` with the estimated and actual (Ollama-reported) token counts."""
+    observe_tokens(response.get("prompt_eval_count"), response.get("eval_count"))
+    if usage is not None:
+        usage["prompt_estimate"] = estimate_tokens(prompt)
+        usage["prompt"] = response.get("prompt_eval_count")
+        usage["completion"] = response.get("eval_count")
+
+@timed("generate_sql_query")
+def generate_sql_query(
+    schema_context: List[str],
+    user_query: str,
+    enriched_context: Optional[Dict[str, Any]] = None,
+    usage: Optional[Dict[str, Any]] = None
+) -> Optional[str]:
+    """Generate SQL query using LLM; token counts are written to ``usage`` if given."""
+    try:
+        prompt = _build_sql_prompt(schema_context, user_query, enriched_context)
+        with llm_scheduler("generate").slot_sync():
+            response = get_ollama().chat(
+                model=SQL_MODEL, 
+                messages=[{'role': 'user', 'content': prompt}], 
+                format='json'
+            )
+        _record_usage(usage, prompt, response)
+        return _parse_sql_response(response['message']['content'])
+
+    except LLMOverloaded:
+        raise
+    except Exception:
+        logger.exception("Error generating SQL")
+        return None
+
+async def _chat_async(prompt: str):
+    async with llm_scheduler("generate").slot():
+        return await get_async_ollama().chat(
+            model=SQL_MODEL, 
             messages=[{'role': 'user', 'content': prompt}], 
             format='json'
         )
-        
-        contents = json.loads(response['message']['content'])
-        sql_query = contents['query'].strip()
 
-        # Basic validation
-        if not sql_query.lower().startswith(("select", "insert", "update", "delete", "create", "drop", "alter", "with")):
-            print("Unexpected response format")
-            return None
-
-        return sql_query
+@timed("generate_sql_query")
+async def generate_sql_query_async(
+    schema_context: List[str],
+    user_query: str,
+    enriched_context: Optional[Dict[str, Any]] = None,
+    usage: Optional[Dict[str, Any]] = None
+) -> Optional[str]:
+    """Async variant of ``generate_sql_query`` using the async Ollama client."""
+    try:
+        prompt = _build_sql_prompt(schema_context, user_query, enriched_context)
+        # Identical prompts in flight share one generation (and one scheduler slot)
+        response = await singleflight("sql_generation").do(
+            (SQL_MODEL, prompt), lambda: _chat_async(prompt)
+        )
+        _record_usage(usage, prompt, response)
+        return _parse_sql_response(response['message']['content'])
 
-    except Exception as e:
-        print(f"Error generating SQL: {e}")
+    except LLMOverloaded:
+        raise
+    except Exception:
+        logger.exception("Error generating SQL")
         return None
 
-def execute_sql_query(sql_query: str, database: str) -> List[Dict[str, Any]]:
-    """Execute SQL query and return results."""
-    connection_params = get_db_connection_params(settings.DATABASE_URL, database)
+async def generate_sql_query_stream(
+    schema_context: List[str],
+    user_query: str,
+    enriched_context: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream SQL generation from the async Ollama client.
+
+    Yields ``token`` events with the raw model output as it is generated and,
+    as soon as the ``query`` field of the JSON answer is complete, a ``sql``
+    event (``sql_query`` is None if the SQL failed validation). Generation is
+    then stopped: the remaining fields are not needed to run the query.
+    """
+    started = perf_counter()
+    prompt = _build_sql_prompt(schema_context, user_query, enriched_context)
+    fields = JSONFieldStream()
+    completion_chunks = 0
+    # The slot is held until the stream is closed, i.e. while Ollama generates
+    async with llm_scheduler("generate").slot():
+        chunks = await get_async_ollama().chat(
+            model=SQL_MODEL,
+            messages=[{'role': 'user', 'content': prompt}],
+            format='json',
+            stream=True
+        )
+        try:
+            async for chunk in chunks:
+                text = chunk['message']['content']
+                if not text:
+                    continue
+                completion_chunks += 1
+                yield {"type": "token", "text": text}
+                for key, value in fields.feed(text):
+                    if key == "query":
+                        record_stage("generate_sql_query", perf_counter() - started)
+                        yield {
+                            "type": "sql",
+                            "sql_query": _validate_sql(value),
+                            "prompt_estimate": estimate_tokens(prompt),
+                            "completion_chunks": completion_chunks
+                        }
+                        return
+        finally:
+            # Closing the stream drops the HTTP response, which stops generation
+            await chunks.aclose()
+    yield {"type": "sql", "sql_query": None, "prompt_estimate": estimate_tokens(prompt), "completion_chunks": completion_chunks}
+
+@timed("execute_sql_query")
+def execute_sql_query(sql_query: str, database: str, guard: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Execute SQL query and return results.
+
+    The query is bounded and cost-checked first (see ``guard_sql_sync``); pass
+    a dict as ``guard`` to receive the executed ``sql_query`` and its ``query_plan``.
+    """
     try:
-        with psycopg.connect(connection_params) as conn:
+        with get_db_connection(database) as conn:
+            sql_query, summary = guard_sql_sync(conn, sql_query)
+            if guard is not None:
+                guard.update(sql_query=sql_query, query_plan=summary)
             with conn.cursor() as cur:
-                print(sql_query)
+                logger.debug("Executing SQL: %s", sql_query)
                 cur.execute(sql_query)
                 columns = [desc[0] for desc in cur.description]
                 results = [
                     dict(zip(columns, row)) 
                     for row in cur.fetchall()
                 ]
-                print(results)
-                return results
-    except Exception as e:
-        print(f"Error executing SQL: {e}")
+        _invalidate_after_write(sql_query, database)
+        observe_rows(len(results))
+        return results
+    except Exception:
+        logger.exception("Error executing SQL")
+        raise
+
+@timed("execute_sql_query")
+async def execute_sql_query_async(sql_query: str, database: str) -> List[Dict[str, Any]]:
+    """
+    Execute SQL query on a pooled async connection and return results.
+
+    Reads run in a read-only transaction and every statement under the
+    statement timeout. Identical read-only queries that are in flight at the
+    same time share one execution; statements that write always run once per call.
+    """
+    if is_read_only(sql_query):
+        return await singleflight("sql_execution").do(
+            (database, sql_query.strip()), lambda: _execute_sql_query_async(sql_query, database)
+        )
+    return await _execute_sql_query_async(sql_query, database)
+
+async def execute_generated_sql(sql_query: str, database: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Guard generated SQL, then execute it through the result cache.
+
+    Unbounded SELECTs get a row limit and the query is rejected with
+    ``QueryRejected`` if its EXPLAIN estimates exceed the configured ceilings.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, Any]]: The rows and the execution
+        info: ``executed_sql``, ``row_limit``, ``query_plan`` (None on a cache
+        hit) and the result cache fields (``results_cached``,
+        ``results_cache_age``, ``results_cache_validation``,
+        ``results_max_staleness``); statements that write are never cached.
+    """
+    # The limit is added up front so cache keys match the SQL that actually ran
+    bounded, limited = (
+        add_limit(sql_query, settings.QUERY_ROW_LIMIT) if settings.QUERY_GUARD_ENABLED else (sql_query, False)
+    )
+    info: Dict[str, Any] = {
+        "executed_sql": bounded,
+        "row_limit": settings.QUERY_ROW_LIMIT if limited else None,
+        "query_plan": None
+    }
+    cacheable = settings.RESULT_CACHE_ENABLED and is_read_only(bounded)
+    if cacheable:
+        cached = await result_cache.lookup(database, bounded)
+        if cached is not None:
+            results, cache_info = cached
+            return results, {**info, **cache_info}
+
+    guarded = await guard_sql(database, bounded)
+    info["query_plan"] = guarded["query_plan"]
+    if not cacheable:
+        return await execute_sql_query_async(bounded, database), {**info, "results_cached": False}
+    # Counters are read before executing, so writes racing the query invalidate it
+    snapshot = await result_cache.snapshot(database, bounded, guarded["plan"])
+    results = await execute_sql_query_async(bounded, database)
+    return results, {**info, **result_cache.store(database, bounded, results, snapshot)}
+
+async def _execute_sql_query_async(sql_query: str, database: str) -> List[Dict[str, Any]]:
+    try:
+        async with pool_manager.async_connection(database) as conn:
+            await apply_limits(conn, is_read_only(sql_query))
+            async with conn.cursor() as cur:
+                logger.debug("Executing SQL: %s", sql_query)
+                await cur.execute(sql_query)
+                results = None  # Statement without a result set
+                if cur.description is not None:
+                    columns = [desc[0] for desc in cur.description]
+                    results = [
+                        dict(zip(columns, row)) 
+                        for row in await cur.fetchall()
+                    ]
+        _invalidate_after_write(sql_query, database)
+        if results is None:
+            return []
+        observe_rows(len(results))
+        return results
+    except Exception:
+        logger.exception("Error executing SQL")
         raise
 
+def _invalidate_after_write(sql_query: str, database: str):
+    """Drop the database's cached results after a statement that may have written."""
+    # Called once the connection is released, i.e. after the commit. The table
+    # counters would catch the write too, but only after the statistics delay
+    # and never with track_counts off
+    if not is_read_only(sql_query):
+        result_cache.invalidate(database)
+
+def _json_default(value: Any) -> Any:
+    """JSON fallback for result values, matching FastAPI's encoding of the same types."""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+def _ndjson(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, default=_json_default) + "\n"
+
+def sse_message(payload: Dict[str, Any]) -> str:
+    """Format an event as a Server-Sent Events message named after its ``type``."""
+    return f"event: {payload['type']}\ndata: {json.dumps(payload, default=_json_default)}\n\n"
+
+async def iter_sql_query_async(
+    sql_query: str,
+    database: str,
+    fetch_size: Optional[int] = None,
+    max_rows: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Execute SQL query and yield result events while the rows are read.
+
+    The query is first bounded and cost-checked (see ``guard_sql``), which
+    yields a ``plan`` event. SELECT/WITH queries run through a named
+    server-side cursor, so only ``fetch_size`` rows are held in memory at a
+    time; reading stops after ``max_rows`` rows. Then yields a ``columns``
+    event, one ``rows`` event per fetch, then an ``end`` event (or an
+    ``error`` event, also when the guard rejects the query). If the consumer stops
+    iterating (e.g. the client disconnected), leaving the ``async with`` blocks
+    closes the cursor and returns the connection to the pool.
+    """
+    fetch_size = fetch_size or settings.QUERY_STREAM_FETCH_SIZE
+    max_rows = max_rows or settings.QUERY_STREAM_MAX_ROWS
+    row_count = 0
+    truncated = False
+    try:
+        # One row over the cap, so reading still notices the truncation
+        guarded = await guard_sql(database, sql_query, max_rows + 1)
+        sql_query = guarded["sql_query"]
+        yield {
+            "type": "plan",
+            "executed_sql": sql_query,
+            "row_limit": guarded["row_limit"],
+            "query_plan": guarded["query_plan"]
+        }
+
+        async with pool_manager.async_connection(database) as conn:
+            await apply_limits(conn, is_read_only(sql_query))
+            # Server-side cursors only exist for queries; other statements run client-side
+            server_side = sql_query.lstrip().lower().startswith(("select", "with"))
+            cursor = conn.cursor(name="talkdb_stream") if server_side else conn.cursor()
+            async with cursor as cur:
+                logger.debug("Executing SQL: %s", sql_query)
+                await cur.execute(sql_query)
+                columns = [desc[0] for desc in cur.description] if cur.description else []
+                yield {"type": "columns", "columns": columns}
+
+                while columns and not truncated:
+                    rows = await cur.fetchmany(min(fetch_size, max_rows - row_count + 1))
+                    if not rows:
+                        break
+                    if row_count + len(rows) > max_rows:
+                        rows = rows[:max_rows - row_count]
+                        truncated = True
+                    row_count += len(rows)
+                    yield {"type": "rows", "rows": [dict(zip(columns, row)) for row in rows]}
+
+        _invalidate_after_write(sql_query, database)
+        observe_rows(row_count)
+        yield {"type": "end", "row_count": row_count, "truncated": truncated}
+    except Exception as e:
+        logger.exception("Error executing SQL")
+        yield {"type": "error", "detail": str(e), "row_count": row_count}
+
+async def stream_sql_query_async(
+    sql_query: str,
+    database: str,
+    fetch_size: Optional[int] = None,
+    max_rows: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    Execute SQL query and yield the results as NDJSON lines while they are read.
+
+    The first line carries the columns, then one line per row, then an ``end``
+    line (or an ``error`` line); see ``iter_sql_query_async``.
+    """
+    async with aclosing(iter_sql_query_async(sql_query, database, fetch_size, max_rows)) as events:
+        async for event in events:
+            if event["type"] == "rows":
+                yield "".join(_ndjson({"type": "row", "row": row}) for row in event["rows"])
+            else:
+                yield _ndjson(event)
+
+@timed("enrich_query_context")
+async def _enrich_query_context(query: str, database: str) -> Optional[Dict[str, Any]]:
+    """Fetch stored business context for the query; failures only cost the extra context."""
+    try:
+        return await singleflight("enrichment").do(
+            (database, normalize_text(query)),
+            lambda: context_processor.enrich_query_context(query, database)
+        )
+    except Exception:
+        logger.exception("Error enriching query context")
+        return None
+
+@timed("load_schema_tables")
+def _load_schema_tables(database: str) -> List[Dict[str, Any]]:
+    """Catalog tables with keys from stored table contexts merged in; [] if unavailable (blocking)."""
+    try:
+        tables, _ = catalog_cache.get_tables(database)
+    except Exception:
+        logger.exception("Error loading catalog")
+        return []
+    try:
+        contexts = context_store.list_contexts(database, "table")
+    except Exception:
+        logger.exception("Error loading table contexts")
+        contexts = []
+    return merge_table_keys(tables, contexts)
+
+@timed("build_schema_context")
+def _build_schema_context(descriptions: List[str], tables: List[Dict[str, Any]], query: str) -> Dict[str, Any]:
+    return build_schema_context(
+        descriptions,
+        tables,
+        token_budget=settings.SCHEMA_CONTEXT_TOKEN_BUDGET,
+        max_hops=settings.SCHEMA_CONTEXT_MAX_HOPS,
+        question=query
+    )
+
+def _prompt_tokens(built: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "schema_estimate": built["tokens"],
+        "schema_budget": settings.SCHEMA_CONTEXT_TOKEN_BUDGET,
+        "tables": built["tables"],
+        **usage
+    }
+
 def process_natural_language_query(query: str, database: str) -> Dict[str, Any]:
     """Process natural language query end-to-end."""
     try:
-        # Step 1: Retrieve relevant schema context
-        schema = "pagila_db_schema_1"
-        # schema_context = retrieve_relevant_schema(query, f"{database}_schema")
-        schema_context = retrieve_relevant_schema(query, schema)
-        if not schema_context:
+        # Step 1: Retrieve relevant schema context, expanded to the join tables
+        descriptions = retrieve_relevant_schema(query, schema_collection_name(database))
+        if not descriptions:
             raise Exception("Could not find relevant schema information")
+        built = _build_schema_context(descriptions, _load_schema_tables(database), query)
+        schema_context = built["lines"]
 
         # Step 2: Generate SQL query
-        sql_query = generate_sql_query(schema_context, query)
+        usage: Dict[str, Any] = {}
+        sql_query = generate_sql_query(schema_context, query, usage=usage)
         if not sql_query:
             raise Exception("Could not generate SQL query")
 
         # Step 3: Execute query and return results
-        results = execute_sql_query(sql_query, database)
+        guard: Dict[str, Any] = {}
+        results = execute_sql_query(sql_query, database, guard)
         
         return {
             "results": results,
             "sql_query": sql_query,
-            "schema_context": schema_context
+            "executed_sql": guard.get("sql_query"),
+            "query_plan": guard.get("query_plan"),
+            "schema_context": schema_context,
+            "prompt_tokens": _prompt_tokens(built, usage)
         }
 
+    except (QueryRejected, LLMOverloaded):
+        raise
     except Exception as e:
         raise Exception(f"Error processing query: {e}")
 
-def ingest_schema(table_schema: Dict[str, Any], milvus_collection_name: str = "db_schema"):
-    """Ingest schema into Milvus."""
+async def _schema_fingerprint(database: str) -> Optional[str]:
+    """Catalog fingerprint used to scope the SQL cache; None disables caching for the request."""
     try:
-        # Connect to Milvus
-        connections.connect(
-            "default", 
-            host=settings.MILVUS_HOST, 
-            port=settings.MILVUS_PORT
-        )
+        return await asyncio.to_thread(catalog_cache.get_fingerprint, database)
+    except Exception:
+        logger.exception("Error fingerprinting schema")
+        return None
 
-        # Create collection if it doesn't exist
-        if not utility.has_collection(milvus_collection_name):
-            fields = [
-                FieldSchema(
-                    name="id", 
-                    dtype=DataType.INT64, 
-                    is_primary=True, 
-                    description="primary id", 
-                    auto_id=True
-                ),
-                FieldSchema(
-                    name="description", 
-                    dtype=DataType.VARCHAR, 
-                    max_length=1024, 
-                    description="Descriptions about the schema"
-                ),
-                FieldSchema(
-                    name="embedding", 
-                    dtype=DataType.FLOAT_VECTOR, 
-                    dim=1024, 
-                    description="vector"
-                )
-            ]
-            collection_schema = CollectionSchema(fields, description="Database schema embeddings")
-            collection = Collection(name=milvus_collection_name, schema=collection_schema)
-        else:
-            collection = Collection(name=milvus_collection_name)
-
-        # Prepare data for ingestion
-        descriptions = []
-        embeddings = []
-
-        for table, details in table_schema.items():
-            table_description = f"Table: {table}\nColumns: {', '.join(col['name'] for col in details['columns'])}"
-            descriptions.append(table_description)
-            
-            # Generate embeddings
-            embedding_response = ollama.embed(
-                model="mxbai-embed-large:335m-v1-fp16", 
-                input=table_description
-            )
-            embeddings.append(embedding_response["embeddings"][0])
+@timed("sql_cache_lookup")
+async def _lookup_cached_sql(query: str, database: str):
+    """Embed the question and look it up in the SQL cache; returns (embedding, fingerprint, cached)."""
+    query_embedding = await embed_text_async(query)
+    fingerprint = await _schema_fingerprint(database) if settings.SQL_CACHE_ENABLED else None
+    cached = None
+    if fingerprint is not None:
+        cached = sql_cache.lookup(database, fingerprint, query_embedding)
+    return query_embedding, fingerprint, cached
 
-        # Insert data into Milvus
-        collection.insert([descriptions, embeddings])
-        
-        # Create index if it doesn't exist
-        if not collection.has_index():
-            index_params = {
-                "index_type": "IVF_FLAT",
-                "metric_type": "IP",
-                "params": {"nlist": 128}
+async def _prepare_prompt_inputs(query: str, database: str, query_embedding: List[float]):
+    """Retrieve and prune the schema context and fetch business context; returns (built, enriched)."""
+    # Retrieve relevant schema context, stored business context and the
+    # catalog used to expand the hits along foreign keys, concurrently
+    descriptions, enriched_context, tables = await asyncio.gather(
+        retrieve_relevant_schema_async(query, schema_collection_name(database), query_embedding),
+        _enrich_query_context(query, database),
+        singleflight("schema_tables").do(database, lambda: asyncio.to_thread(_load_schema_tables, database))
+    )
+    if not descriptions:
+        raise Exception("Could not find relevant schema information")
+    return _build_schema_context(descriptions, tables, query), enriched_context
+
+async def prepare_sql_query_async(query: str, database: str) -> Dict[str, Any]:
+    """
+    Turn a natural language question into SQL without executing it.
+
+    Near-duplicate questions for an unchanged schema reuse previously generated
+    SQL from the semantic SQL cache. Otherwise schema retrieval and context
+    enrichment run concurrently, the schema hits are expanded along foreign
+    keys and fitted to the prompt token budget, and SQL is generated on the
+    async Ollama client. ``prompt_tokens`` reports the schema and prompt token
+    counts (None when the SQL came from the cache).
+    """
+    query_embedding, fingerprint, cached = await _lookup_cached_sql(query, database)
+
+    if cached is not None:
+        sql_query, similarity, schema_context = cached
+        prompt_tokens = None
+    else:
+        similarity = None
+
+        # Step 1: Retrieve relevant schema and business context
+        built, enriched_context = await _prepare_prompt_inputs(query, database, query_embedding)
+        schema_context = built["lines"]
+
+        # Step 2: Generate SQL query
+        usage: Dict[str, Any] = {}
+        sql_query = await generate_sql_query_async(schema_context, query, enriched_context, usage)
+        if not sql_query:
+            raise Exception("Could not generate SQL query")
+        prompt_tokens = _prompt_tokens(built, usage)
+        if fingerprint is not None:
+            sql_cache.store(database, fingerprint, query, query_embedding, sql_query, schema_context)
+
+    return {
+        "sql_query": sql_query,
+        "schema_context": schema_context,
+        "sql_cached": cached is not None,
+        "sql_cache_similarity": similarity,
+        "prompt_tokens": prompt_tokens
+    }
+
+async def stream_natural_language_query_async(query: str, database: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Process a natural language query and yield progress events as each stage completes.
+
+    Events, in order: ``schema`` (pruned schema context, or skipped on a SQL
+    cache hit), ``token`` (raw model output while SQL is generated), ``sql``
+    (the finalized SQL, emitted as soon as the ``query`` field of the model's
+    answer is complete), ``execution`` (query started), then the result events
+    of ``iter_sql_query_async`` (``plan``, ``columns``, ``rows``, ``end``). Failures are
+    reported as a final ``error`` event.
+    """
+    try:
+        query_embedding, fingerprint, cached = await _lookup_cached_sql(query, database)
+
+        if cached is not None:
+            sql_query, similarity, schema_context = cached
+            yield {
+                "type": "sql",
+                "sql_query": sql_query,
+                "schema_context": schema_context,
+                "sql_cached": True,
+                "sql_cache_similarity": similarity
             }
-            collection.create_index(
-                field_name="embedding", 
-                index_params=index_params
-            )
-        
-        collection.load()
+        else:
+            built, enriched_context = await _prepare_prompt_inputs(query, database, query_embedding)
+            schema_context = built["lines"]
+            yield {
+                "type": "schema",
+                "schema_context": schema_context,
+                "tables": built["tables"],
+                "schema_estimate": built["tokens"],
+                "schema_budget": settings.SCHEMA_CONTEXT_TOKEN_BUDGET
+            }
+
+            sql_query = None
+            async with aclosing(generate_sql_query_stream(schema_context, query, enriched_context)) as events:
+                async for event in events:
+                    if event["type"] == "sql":
+                        sql_query = event["sql_query"]
+                        if not sql_query:
+                            raise Exception("Could not generate SQL query")
+                        yield {
+                            **event,
+                            "schema_context": schema_context,
+                            "sql_cached": False,
+                            "sql_cache_similarity": None
+                        }
+                    else:
+                        yield event
+            if not sql_query:
+                raise Exception("Could not generate SQL query")
+            if fingerprint is not None:
+                sql_cache.store(database, fingerprint, query, query_embedding, sql_query, schema_context)
+
+        # Step 3: Execute query and stream the results
+        yield {"type": "execution", "sql_query": sql_query}
+        async with aclosing(iter_sql_query_async(sql_query, database)) as results:
+            async for event in results:
+                yield event
+
+    except LLMOverloaded as e:
+        yield {"type": "error", "detail": f"Error processing query: {e}", "retry_after": e.retry_after}
+    except Exception as e:
+        yield {"type": "error", "detail": f"Error processing query: {e}"}
+
+async def process_natural_language_query_async(query: str, database: str) -> Dict[str, Any]:
+    """Process natural language query end-to-end without blocking the event loop."""
+    try:
+        prepared = await prepare_sql_query_async(query, database)
+
+        # Step 3: Guard and execute the query (or reuse a result the tables haven't changed since)
+        results, execution = await execute_generated_sql(prepared["sql_query"], database)
         
-        return len(descriptions)
+        return {"results": results, **prepared, **execution}
 
+    except (QueryRejected, LLMOverloaded):
+        raise
     except Exception as e:
-        raise Exception(f"Error ingesting schema: {e}")
-    finally:
-        connections.disconnect("default")
\ No newline at end of file
+        raise Exception(f"Error processing query: {e}")
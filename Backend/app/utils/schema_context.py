@@ -0,0 +1,261 @@
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Shorter spellings of common PostgreSQL types, to save prompt tokens
+TYPE_ALIASES = {
+    "character varying": "varchar",
+    "character": "char",
+    "integer": "int",
+    "smallint": "int2",
+    "bigint": "int8",
+    "boolean": "bool",
+    "double precision": "float8",
+    "real": "float4",
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamptz",
+    "time without time zone": "time",
+    "time with time zone": "timetz",
+    "USER-DEFINED": "enum"
+}
+
+_TABLE_HEADER = re.compile(r"^Table: (?P<name>.+?)(?: \(part \d+/\d+\))?$")
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the LLM token count of a text without a tokenizer.
+
+    Counts one token per punctuation mark and per started 4 characters of each
+    word, which tracks BPE tokenizers closely enough for prompt budgeting.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN.findall(text))
+
+
+def parse_description(description: str) -> Tuple[Optional[str], List[str]]:
+    """Return (table, columns) from a schema description written by ``describe_table``."""
+    lines = description.splitlines()
+    match = _TABLE_HEADER.match(lines[0]) if lines else None
+    if match is None:
+        return None, []
+    columns: List[str] = []
+    for line in lines[1:]:
+        if line.startswith("Columns: "):
+            columns = [column.strip() for column in line[len("Columns: "):].split(",") if column.strip()]
+    return match.group("name").strip(), columns
+
+
+def merge_table_keys(tables: List[Dict[str, Any]], contexts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Add primary/foreign keys from stored ``TableContext`` data to catalog tables.
+
+    Declared catalog keys win; stored contexts contribute logical keys the
+    database does not declare. The catalog tables are not modified.
+    """
+    by_name = {table["name"]: table for table in tables}
+    merged = dict(by_name)
+    for context in contexts:
+        table = by_name.get(context.get("name"))
+        if table is None:
+            continue
+        foreign_keys = {**(context.get("foreign_keys") or {}), **table.get("foreign_keys", {})}
+        merged[table["name"]] = {
+            **table,
+            "primary_key": table.get("primary_key") or context.get("primary_key") or [],
+            "foreign_keys": foreign_keys
+        }
+    return list(merged.values())
+
+
+def _referenced_table(reference: str) -> Tuple[str, str]:
+    table, _, column = reference.rpartition(".")
+    return table, column
+
+
+class SchemaGraph:
+    """Undirected graph of tables joined by foreign keys."""
+
+    def __init__(self, tables: List[Dict[str, Any]]):
+        self.tables = {table["name"]: table for table in tables}
+        self.edges: Dict[str, Set[str]] = {name: set() for name in self.tables}
+        for name, table in self.tables.items():
+            for reference in (table.get("foreign_keys") or {}).values():
+                target, _ = _referenced_table(reference)
+                if target in self.tables and target != name:
+                    self.edges[name].add(target)
+                    self.edges[target].add(name)
+
+    def path_to(self, source: str, targets: Set[str], max_hops: int) -> Optional[List[str]]:
+        """Shortest path from ``source`` to any of ``targets`` (inclusive), or None."""
+        if source in targets:
+            return [source]
+        previous: Dict[str, Optional[str]] = {source: None}
+        queue = deque([(source, 0)])
+        while queue:
+            node, hops = queue.popleft()
+            if hops == max_hops:
+                continue
+            for neighbour in sorted(self.edges.get(node, ())):
+                if neighbour in previous:
+                    continue
+                previous[neighbour] = node
+                if neighbour in targets:
+                    path = [neighbour]
+                    while previous[path[-1]] is not None:
+                        path.append(previous[path[-1]])
+                    return path[::-1]
+                queue.append((neighbour, hops + 1))
+        return None
+
+    def connect(self, seeds: List[str], max_hops: int) -> List[str]:
+        """
+        Pick a small connected set of tables covering the seeds.
+
+        Seeds are added in rank order; each is joined to the tables selected so
+        far through the shortest foreign-key path of at most ``max_hops`` edges,
+        adding the intermediate (join) tables. Seeds that cannot be reached are
+        kept on their own. Connectors follow the seed they were added for.
+        """
+        selected: List[str] = []
+        for seed in seeds:
+            if seed in selected:
+                continue
+            path = self.path_to(seed, set(selected), max_hops) if selected and seed in self.tables else None
+            selected.append(seed)
+            for table in (path or [])[1:-1]:
+                if table not in selected:
+                    selected.append(table)
+        return selected
+
+
+def _key_columns(table: Dict[str, Any], selected: Set[str]) -> Set[str]:
+    keys = set(table.get("primary_key") or [])
+    for column, reference in (table.get("foreign_keys") or {}).items():
+        if _referenced_table(reference)[0] in selected:
+            keys.add(column)
+    return keys
+
+
+def _question_words(question: Optional[str]) -> Set[str]:
+    words = set(_WORD.findall(question.lower())) if question else set()
+    # Crude singulars, so "actors" matches an "actor" column
+    return words | {word[:-1] for word in words if word.endswith("s") and len(word) > 3}
+
+
+def _mentioned(column: str, words: Set[str]) -> bool:
+    return any(part in words for part in _WORD.findall(column.lower()))
+
+
+def render_table(table: Dict[str, Any], keep: Optional[Set[str]] = None) -> str:
+    """
+    Render a table as one compact DDL-like line.
+
+    ``film(film_id int PK, title varchar, language_id int2 -> language.language_id, +10 more)``
+    """
+    primary_key = set(table.get("primary_key") or [])
+    foreign_keys = table.get("foreign_keys") or {}
+    parts = []
+    columns = table.get("columns") or []
+    for column in columns:
+        name = column["name"]
+        if keep is not None and name not in keep:
+            continue
+        part = name
+        if column.get("type"):
+            part += " " + TYPE_ALIASES.get(column["type"], column["type"])
+        if name in primary_key:
+            part += " PK"
+        if name in foreign_keys:
+            part += f" -> {foreign_keys[name]}"
+        parts.append(part)
+    if keep is not None and len(parts) < len(columns):
+        parts.append(f"+{len(columns) - len(parts)} more")
+    return f"{table['name']}({', '.join(parts)})"
+
+
+def build_schema_context(
+    descriptions: List[str],
+    tables: List[Dict[str, Any]],
+    token_budget: int,
+    max_hops: int = 2,
+    question: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the schema section of the SQL prompt from the top vector hits.
+
+    The hit tables are expanded along foreign keys to the join tables needed to
+    connect them, rendered one line per table and fitted to ``token_budget``:
+    first the non-key columns not mentioned in the question are dropped from
+    the lowest-ranked tables, then the lowest-ranked tables themselves (the top
+    hit is always kept).
+
+    Args:
+        descriptions: Schema descriptions returned by the vector search, best first.
+        tables: Catalog tables (``get_tables`` shape with primary/foreign keys).
+        token_budget: Maximum estimated tokens for the rendered schema.
+        max_hops: Longest foreign-key path used to connect two hit tables.
+        question: The user question; columns it mentions are kept when pruning.
+
+    Returns:
+        Dict[str, Any]: ``lines`` (one per table), ``tables``, ``seeds``,
+        ``tokens`` (estimate), ``pruned_columns`` and ``dropped_tables``.
+    """
+    seeds: List[str] = []
+    described: Dict[str, List[str]] = {}
+    for description in descriptions:
+        name, columns = parse_description(description)
+        if name is None:
+            continue
+        if name not in described:
+            seeds.append(name)
+            described[name] = []
+        described[name].extend(columns)
+
+    graph = SchemaGraph(tables)
+    selected = graph.connect(seeds, max_hops)
+    # Hit tables missing from the catalog are rendered from their description
+    catalog = {
+        name: graph.tables.get(name) or {
+            "name": name,
+            "columns": [{"name": column} for column in described.get(name, [])]
+        }
+        for name in selected
+    }
+    words = _question_words(question)
+    keep: Dict[str, Optional[Set[str]]] = {name: None for name in selected}
+
+    def render() -> List[str]:
+        return [render_table(catalog[name], keep[name]) for name in selected]
+
+    def cost(lines: List[str]) -> int:
+        return estimate_tokens("\n".join(lines))
+
+    lines = render()
+    pruned = 0
+    for name in reversed(selected):
+        if cost(lines) <= token_budget:
+            break
+        table = catalog[name]
+        keys = _key_columns(table, set(selected))
+        keep[name] = {
+            column["name"] for column in table.get("columns") or []
+            if column["name"] in keys or _mentioned(column["name"], words)
+        }
+        pruned += len(table.get("columns") or []) - len(keep[name])
+        lines = render()
+
+    dropped = []
+    while len(selected) > 1 and cost(lines) > token_budget:
+        dropped.append(selected.pop())
+        lines = render()
+
+    return {
+        "lines": lines,
+        "tables": list(selected),
+        "seeds": seeds,
+        "tokens": cost(lines),
+        "pruned_columns": pruned,
+        "dropped_tables": dropped
+    }
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, List, Dict, Any, Optional
+from app.core.config import settings
+from app.core.jobs import JobCancelled
+from app.db.milvus_client import milvus_manager, pymilvus
+from app.db.vector_backends import MILVUS_INDEX_PARAMS, VectorBackend, get_vector_backend
+from app.utils.embeddings import EMBEDDING_MODEL, embed_texts
+
+DESCRIPTION_FIELD_MAX_LENGTH = 1024
+TABLE_NAME_FIELD_MAX_LENGTH = 512
+FINGERPRINT_FIELD_MAX_LENGTH = 64
+
+# One ingestion per collection at a time, so concurrent runs cannot both add a table
+_collection_locks: Dict[str, threading.Lock] = {}
+_collection_locks_guard = threading.Lock()
+
+def _byte_length(text: str) -> int:
+    # Milvus VARCHAR max_length is measured in bytes
+    return len(text.encode("utf-8"))
+
+def describe_table(table: str, details: Dict[str, Any], max_length: int) -> List[str]:
+    """
+    Build the embedding description(s) for a table.
+
+    Descriptions that exceed ``max_length`` bytes are split on column boundaries
+    into several parts, each repeating the table header, so nothing is dropped.
+    """
+    columns = [col['name'] for col in details['columns']]
+    description = f"Table: {table}\nColumns: {', '.join(columns)}"
+    if _byte_length(description) <= max_length:
+        return [description]
+
+    # Reserve room for the widest "(part i/n)" marker
+    header = f"Table: {table} (part 9999/9999)\nColumns: "
+    budget = max_length - _byte_length(header)
+    if budget <= 0:
+        raise ValueError(f"Table name '{table}' does not fit in a {max_length}-byte description")
+
+    parts: List[List[str]] = [[]]
+    used = 0
+    for column in columns:
+        size = _byte_length(column) + (2 if parts[-1] else 0)
+        if parts[-1] and used + size > budget:
+            parts.append([])
+            used, size = 0, _byte_length(column)
+        if size > budget:
+            raise ValueError(f"Column '{table}.{column}' does not fit in a {max_length}-byte description")
+        parts[-1].append(column)
+        used += size
+
+    return [
+        f"Table: {table} (part {i}/{len(parts)})\nColumns: {', '.join(part)}"
+        for i, part in enumerate(parts, start=1)
+    ]
+
+def table_fingerprint(table: str, details: Dict[str, Any], descriptions: List[str]) -> str:
+    """
+    Hash everything a table's vectors are derived from.
+
+    Covers the catalog details (columns, types, comments, keys), the
+    descriptions built from them and the embedding model, so a change to any
+    of them re-embeds the table and nothing else does.
+    """
+    payload = json.dumps(
+        {"table": table, "details": details, "descriptions": descriptions, "model": EMBEDDING_MODEL},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def schema_collection_name(database: str) -> str:
+    """Name of the collection holding a database's schema descriptions."""
+    return f"{database}_schema"
+
+def _create_collection(milvus_collection_name: str):
+    """Create the Milvus collection for schema descriptions and its vector index."""
+    FieldSchema, DataType = pymilvus.FieldSchema, pymilvus.DataType
+    fields = [
+        FieldSchema(
+            name="id",
+            dtype=DataType.INT64,
+            is_primary=True,
+            description="primary id",
+            auto_id=True
+        ),
+        FieldSchema(
+            name="table_name",
+            dtype=DataType.VARCHAR,
+            max_length=TABLE_NAME_FIELD_MAX_LENGTH,
+            description="Table the description belongs to"
+        ),
+        FieldSchema(
+            name="fingerprint",
+            dtype=DataType.VARCHAR,
+            max_length=FINGERPRINT_FIELD_MAX_LENGTH,
+            description="Hash of the table definition the row was embedded from"
+        ),
+        FieldSchema(
+            name="description",
+            dtype=DataType.VARCHAR,
+            max_length=DESCRIPTION_FIELD_MAX_LENGTH,
+            description="Descriptions about the schema"
+        ),
+        FieldSchema(
+            name="embedding",
+            dtype=DataType.FLOAT_VECTOR,
+            dim=1024,
+            description="vector"
+        )
+    ]
+    collection_schema = pymilvus.CollectionSchema(fields, description="Database schema embeddings")
+    collection = pymilvus.Collection(name=milvus_collection_name, schema=collection_schema, using=milvus_manager.alias)
+    # Without an index the collection cannot be loaded, and ingestion reads it first
+    collection.create_index(field_name="embedding", index_params=MILVUS_INDEX_PARAMS)
+
+def _get_or_create_collection(milvus_collection_name: str) -> VectorBackend:
+    backend = get_vector_backend(
+        milvus_collection_name, create=lambda: _create_collection(milvus_collection_name)
+    )
+    backend.ensure_ready()
+    return backend
+
+def _description_max_length(backend: VectorBackend) -> int:
+    """Return the byte limit of the collection's description field."""
+    return backend.field_max_length("description") or DESCRIPTION_FIELD_MAX_LENGTH
+
+def _collection_lock(milvus_collection_name: str) -> threading.Lock:
+    with _collection_locks_guard:
+        return _collection_locks.setdefault(milvus_collection_name, threading.Lock())
+
+def _stored_fingerprints(collection: VectorBackend) -> Optional[Dict[str, set]]:
+    """
+    Return the fingerprints stored per table.
+
+    Returns None if the collection predates fingerprints (no such field, or
+    rows without ``table_name``/``fingerprint``) and has to be rebuilt.
+    """
+    if not collection.has_field("fingerprint"):
+        return None
+    stored: Dict[str, set] = {}
+    # Paged, since an unfiltered query is capped at the Milvus query window
+    for page in collection.query_pages({}, ["table_name", "fingerprint"]):
+        for row in page:
+            if row.get("table_name") is None or row.get("fingerprint") is None:
+                return None
+            stored.setdefault(row["table_name"], set()).add(row["fingerprint"])
+    return stored
+
+def _rate(count: int, seconds: float) -> Optional[float]:
+    return round(count / seconds, 2) if seconds > 0 else None
+
+def ingest_schema(
+    table_schema: Dict[str, Any],
+    milvus_collection_name: str = "db_schema",
+    batch_size: Optional[int] = None,
+    full: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Ingest schema into the vector store, re-embedding only what changed.
+
+    Each table's rows carry its name and a fingerprint of its definition (see
+    ``table_fingerprint``). A run compares them against ``table_schema``: new
+    and changed tables are embedded and inserted, rows of changed tables with
+    an old fingerprint and of dropped tables are deleted, and unchanged tables
+    are skipped. New rows are inserted before old ones are deleted, so a table
+    never disappears from search while it is being updated. ``full`` drops the
+    collection and re-embeds every table, as do collections written before
+    fingerprints existed.
+
+    Descriptions are embedded in batches of ``batch_size`` while the previous
+    batch is being inserted, so embedding and insert time overlap.
+    ``progress(done, total)`` is called with the rows inserted so far; if it
+    raises, ingestion stops and the next run picks up where it left off.
+
+    Returns:
+        Dict[str, Any]: The ``added``, ``updated``, ``removed`` and ``skipped``
+        tables, table/row counts, and per-stage timings and throughput.
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    started = time.perf_counter()
+    try:
+        with _collection_lock(milvus_collection_name):
+            collection = _get_or_create_collection(milvus_collection_name)
+            stored = _stored_fingerprints(collection)
+            # Tables as they were before this run, for the report
+            previous = set(stored) if stored is not None else set()
+            rebuilt = full or stored is None
+            if rebuilt:
+                collection.drop()
+                collection.ensure_ready()
+                stored = {}
+
+            # Long descriptions are split rather than truncated; the chunk size also
+            # keeps each text within the embedding model's context window
+            max_length = min(_description_max_length(collection), settings.INGEST_DESCRIPTION_CHUNK_SIZE)
+            added: List[str] = []
+            updated: List[str] = []
+            skipped: List[str] = []
+            stale: Dict[str, List[str]] = {}
+            rows: List[Dict[str, str]] = []
+            for table, details in table_schema.items():
+                descriptions = describe_table(table, details, max_length)
+                fingerprint = table_fingerprint(table, details, descriptions)
+                fingerprints = stored.get(table, set())
+                if fingerprints == {fingerprint}:
+                    skipped.append(table)
+                    continue
+                (updated if table in previous else added).append(table)
+                if fingerprints - {fingerprint}:
+                    stale[table] = sorted(fingerprints - {fingerprint})
+                if fingerprint not in fingerprints:
+                    # Otherwise an interrupted run already inserted the current rows
+                    rows.extend(
+                        {"table_name": table, "fingerprint": fingerprint, "description": description}
+                        for description in descriptions
+                    )
+            removed = sorted(previous - set(table_schema))
+
+            embed_seconds = 0.0
+            insert_seconds = 0.0
+
+            def insert_batch(batch: List[Dict[str, str]], embeddings: List[List[float]]) -> float:
+                start = time.perf_counter()
+                collection.insert([{**row, "embedding": embedding} for row, embedding in zip(batch, embeddings)])
+                return time.perf_counter() - start
+
+            report = progress or (lambda done, total: None)
+            report(0, len(rows))
+
+            # A single insert worker: batch N is inserted while batch N+1 is embedded
+            with ThreadPoolExecutor(max_workers=1) as inserter:
+                pending: Optional[Future] = None
+                for offset in range(0, len(rows), batch_size):
+                    batch = rows[offset:offset + batch_size]
+                    start = time.perf_counter()
+                    embeddings = embed_texts([row["description"] for row in batch])
+                    embed_seconds += time.perf_counter() - start
+
+                    if pending is not None:
+                        insert_seconds += pending.result()
+                        report(offset, len(rows))
+                    pending = inserter.submit(insert_batch, batch, embeddings)
+                if pending is not None:
+                    insert_seconds += pending.result()
+                    report(len(rows), len(rows))
+
+            # Now that the new rows are in, drop the superseded and orphaned ones
+            start = time.perf_counter()
+            for table, fingerprints in stale.items():
+                collection.delete({"table_name": table, "fingerprint": fingerprints})
+            orphaned = sorted(set(stored) - set(table_schema))
+            if orphaned:
+                collection.delete({"table_name": orphaned})
+            delete_seconds = time.perf_counter() - start
+
+            # Index (if missing) and load the collection so the new rows are searchable
+            collection.flush()
+
+        total_seconds = time.perf_counter() - started
+        embedded = len(added) + len(updated)
+        return {
+            "count": len(table_schema),
+            "added": added,
+            "updated": updated,
+            "removed": removed,
+            "skipped": skipped,
+            "rebuilt": rebuilt,
+            "rows": len(rows),
+            "batch_size": batch_size,
+            "embed_seconds": round(embed_seconds, 3),
+            "insert_seconds": round(insert_seconds, 3),
+            "delete_seconds": round(delete_seconds, 3),
+            "total_seconds": round(total_seconds, 3),
+            "tables_per_sec": {
+                "embed": _rate(embedded, embed_seconds),
+                "insert": _rate(embedded, insert_seconds),
+                "overall": _rate(len(table_schema), total_seconds)
+            }
+        }
+
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise Exception(f"Error ingesting schema: {e}")
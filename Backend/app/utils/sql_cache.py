@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+class _CachedSQL:
+    def __init__(self, question: str, embedding: np.ndarray, sql: str, schema_fingerprint: Optional[str], schema_context: Any):
+        self.question = question
+        self.embedding = embedding
+        self.sql = sql
+        self.schema_fingerprint = schema_fingerprint
+        self.schema_context = schema_context
+        self.created_at = time.monotonic()
+
+
+class SemanticSQLCache:
+    """
+    Cache of generated SQL keyed by (database, schema fingerprint, question embedding).
+
+    A question is answered from the cache when a stored question for the same
+    database and schema fingerprint has cosine similarity of at least
+    ``threshold``. Entries expire after ``ttl`` seconds and the cache keeps at
+    most ``max_entries`` entries, evicting the least recently used.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[Tuple[str, int], _CachedSQL]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [key for key, entry in self._entries.items() if entry.created_at < cutoff]:
+            del self._entries[key]
+            self.evictions += 1
+
+    def lookup(
+        self,
+        database: str,
+        schema_fingerprint: Optional[str],
+        embedding: List[float]
+    ) -> Optional[Tuple[str, float, Any]]:
+        """
+        Find cached SQL for a question.
+
+        Returns:
+            Optional[Tuple[str, float, Any]]: (sql, similarity, schema_context) of
+            the most similar entry above the threshold, or None.
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            self._expire()
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if key[0] == database and entry.schema_fingerprint == schema_fingerprint
+            ]
+            if candidates:
+                scores = np.stack([entry.embedding for _, entry in candidates]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.sql, float(scores[best]), entry.schema_context
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        database: str,
+        schema_fingerprint: Optional[str],
+        question: str,
+        embedding: List[float],
+        sql: str,
+        schema_context: Any = None
+    ):
+        """Remember the SQL generated for a question."""
+        entry = _CachedSQL(question, self._normalize(embedding), sql, schema_fingerprint, schema_context)
+        with self._lock:
+            self._entries[(database, self._next_id)] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, database: Optional[str] = None):
+        """Drop cached SQL for one database (e.g. after schema or context changes), or all."""
+        with self._lock:
+            keys = [key for key in self._entries if database is None or key[0] == database]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and the number of cached questions."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "threshold": self.threshold
+            }
+
+
+sql_cache = SemanticSQLCache(
+    max_entries=settings.SQL_CACHE_SIZE,
+    ttl=settings.SQL_CACHE_TTL,
+    threshold=settings.SQL_CACHE_SIMILARITY
+)
@@ -0,0 +1,174 @@
+"""
+Context search as the number of databases grows, with and without database partitions.
+
+Fills two context collections with --entities-per-database synthetic
+table/column contexts for each of up to --databases databases:
+
+    single       every row in the default partition (the layout before
+                 partitioning); searches see every database
+    partitioned  each database's rows in its own partition; searches are
+                 scoped to the target database's partition
+
+Databases are given similar schemas (their tables share topic vectors), the
+case where an unscoped search returns tables of the wrong database. At each
+--steps database count it reports search p50/p95 for both layouts, the share
+of top-k hits from another database, and the time to release and reload one
+database's partition.
+
+The embedded backend runs offline; --milvus repeats the run against two
+temporary Milvus collections.
+
+Usage (from the Backend directory):
+    python -m benchmarks.bench_context_partitions --databases 50
+    python -m benchmarks.bench_context_partitions --databases 50 --milvus
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.context_store import KEY_FIELD, ContextStore, database_partition, entity_key
+from app.db.vector_backends import get_vector_backend
+from benchmarks.bench_entity_lookup import DIM, measure
+
+TOPICS = 64
+OUTPUT_FIELDS = ["entity_name"]
+
+
+def database_rows(database: str, count: int, centers, rng):
+    """``count`` table/column rows for ``database``, each near one of the shared topic centers."""
+    topics = np.arange(count) % TOPICS
+    vectors = centers[topics] + 0.3 * rng.standard_normal((count, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = []
+    for index, vector in enumerate(vectors):
+        table = f"{database}.table_{topics[index]}"
+        entity_type, entity_name, parent = (
+            ("table", table, database) if index < TOPICS else ("column", f"{table}.column_{index}", table)
+        )
+        rows.append({
+            KEY_FIELD: entity_key(entity_type, entity_name),
+            "entity_type": entity_type,
+            "entity_name": entity_name,
+            "parent_entity": parent,
+            "context_data": json.dumps({"name": entity_name.rsplit(".", 1)[-1]}),
+            "embedding": vector.tolist()
+        })
+    return rows, vectors
+
+
+def run_backend(single_name: str, partitioned_name: str, args):
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((TOPICS, DIM)).astype(np.float32)
+    # Backends with the context collection schema, created by ContextStore when missing
+    single, partitioned = ContextStore(single_name).backend, ContextStore(partitioned_name).backend
+    single.require_partition = False  # The old layout: reads see every database
+    for backend in (single, partitioned):
+        backend.drop()
+        backend.ensure_ready()
+
+    databases, query_vectors, report = [], {}, []
+    for step in sorted(set(args.steps + [args.databases])):
+        if step > args.databases:
+            continue
+        start = time.perf_counter()
+        while len(databases) < step:
+            database = f"db_{len(databases)}"
+            rows, vectors = database_rows(database, args.entities_per_database, centers, rng)
+            single.upsert(rows, KEY_FIELD)
+            partitioned.upsert(rows, KEY_FIELD, partition=database_partition(database))
+            query_vectors[database] = vectors
+            databases.append(database)
+        single.flush()
+        partitioned.flush()
+        load_seconds = time.perf_counter() - start
+
+        queries = []
+        for database in rng.choice(databases, args.queries):
+            vector = query_vectors[database][rng.integers(0, args.entities_per_database)]
+            vector = vector + 0.1 * rng.standard_normal(DIM).astype(np.float32)
+            queries.append((database, (vector / np.linalg.norm(vector)).tolist()))
+
+        def wrong_database_share(search):
+            hits = wrong = 0
+            for database, vector in queries:
+                for hit in search(database, vector):
+                    hits += 1
+                    wrong += not hit["entity_name"].startswith(f"{database}.")
+            return round(wrong / max(hits, 1), 3)
+
+        def search_single(database, vector):
+            return single.search(vector, args.k, OUTPUT_FIELDS)
+
+        def search_partitioned(database, vector):
+            return partitioned.search(vector, args.k, OUTPUT_FIELDS, partition=database_partition(database))
+
+        target = database_partition(databases[-1])
+        reload_times = []
+        for _ in range(args.reloads):
+            begin = time.perf_counter()
+            partitioned.release_partition(target)
+            partitioned.load_partition(target)
+            reload_times.append(time.perf_counter() - begin)
+
+        report.append({
+            "databases": step,
+            "rows": step * args.entities_per_database,
+            "insert_seconds": round(load_seconds, 3),
+            "before": {
+                "search": measure(lambda query: search_single(*query), queries),
+                "wrong_database_hits": wrong_database_share(search_single)
+            },
+            "after": {
+                "search": measure(lambda query: search_partitioned(*query), queries),
+                "wrong_database_hits": wrong_database_share(search_partitioned),
+                "release_load_ms": round(sorted(reload_times)[len(reload_times) // 2] * 1000, 3)
+            }
+        })
+
+    report[-1]["after"]["partitions"] = len(partitioned.partitions())
+    for backend in (single, partitioned):
+        backend.drop()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--databases", type=int, default=50)
+    parser.add_argument("--entities-per-database", type=int, default=1000)
+    parser.add_argument("--steps", type=int, nargs="+", default=[1, 10, 25])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--reloads", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--milvus", action="store_true", help="Also benchmark two temporary Milvus collections")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        settings.VECTOR_BACKEND, settings.VECTOR_STORE_DIR = "embedded", directory
+        results["embedded"] = run_backend("bench_single", "bench_partitioned", args)
+
+    if args.milvus:
+        settings.VECTOR_BACKEND = "milvus"
+        names = (f"bench_single_{os.getpid()}", f"bench_partitioned_{os.getpid()}")
+        try:
+            results["milvus"] = run_backend(*names, args)
+        finally:
+            for name in names:
+                get_vector_backend(name).drop()
+
+    print(json.dumps({
+        "entities_per_database": args.entities_per_database,
+        "queries": args.queries,
+        "k": args.k,
+        "results": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Exact-lookup and write latency of context entities, before and after entity keys.
+
+Builds a context collection in the legacy layout (auto-generated ids, no
+scalar indexes, rows found by an entity_type/entity_name filter) holding
+--entities synthetic database/table/column contexts, then measures:
+
+    before   exact lookups by entity_type/entity_name, and single-entity
+             writes as delete-then-insert (the old store_context)
+    migrate  ContextStore.ensure_ready migrating the collection to entity keys
+             (and database partitions)
+    after    exact lookups by entity key in the entity's database partition,
+             and writes as upsert
+
+The embedded backend runs offline. Its lookups use posting lists in both
+runs, so its before/after mostly shows the cost of the write path; the
+schema change itself (primary key lookups, scalar indexes, native upsert) is
+measured with --milvus against a temporary Milvus collection.
+
+Usage (from the Backend directory):
+    python -m benchmarks.bench_entity_lookup --entities 100000
+    python -m benchmarks.bench_entity_lookup --entities 100000 --milvus
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.context_store import KEY_FIELD, ContextStore, entity_key, entity_partition
+from app.db.vector_backends import MILVUS_INDEX_PARAMS, get_vector_backend
+
+DIM = 1024
+TABLES_PER_DATABASE = 50
+COLUMNS_PER_TABLE = 20
+
+
+def entity_names(count: int):
+    """(entity_type, entity_name, parent_entity) for ``count`` entities in whole databases."""
+    names = []
+    database_index = 0
+    while len(names) < count:
+        database = f"db_{database_index}"
+        names.append(("database", database, ""))
+        for table_index in range(TABLES_PER_DATABASE):
+            table = f"{database}.table_{table_index}"
+            names.append(("table", table, database))
+            for column_index in range(COLUMNS_PER_TABLE):
+                names.append(("column", f"{table}.column_{column_index}", table))
+        database_index += 1
+    return names[:count]
+
+
+def make_rows(names, rng):
+    vectors = rng.standard_normal((len(names), DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        {
+            "entity_type": entity_type,
+            "entity_name": entity_name,
+            "parent_entity": parent,
+            "context_data": json.dumps({"name": entity_name.rsplit(".", 1)[-1]}),
+            "embedding": vector.tolist()
+        }
+        for (entity_type, entity_name, parent), vector in zip(names, vectors)
+    ]
+
+
+def create_legacy_collection(name: str):
+    """The context collection schema from before entity keys."""
+    from app.db.milvus_client import milvus_manager, pymilvus
+
+    FieldSchema, DataType = pymilvus.FieldSchema, pymilvus.DataType
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name="entity_type", dtype=DataType.VARCHAR, max_length=50),
+        FieldSchema(name="entity_name", dtype=DataType.VARCHAR, max_length=100),
+        FieldSchema(name="parent_entity", dtype=DataType.VARCHAR, max_length=100),
+        FieldSchema(name="context_data", dtype=DataType.VARCHAR, max_length=65535),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM)
+    ]
+    collection = pymilvus.Collection(name, pymilvus.CollectionSchema(fields), using=milvus_manager.alias)
+    collection.create_index(field_name="embedding", index_params=MILVUS_INDEX_PARAMS)
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(operation, items):
+    operation(items[0])  # warm up
+    latencies = []
+    for item in items:
+        begin = time.perf_counter()
+        operation(item)
+        latencies.append(time.perf_counter() - begin)
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3)
+    }
+
+
+def run_backend(name: str, create, names, args):
+    rng = np.random.default_rng(args.seed)
+    backend = get_vector_backend(name, create=create)
+    backend.drop()
+    backend.ensure_ready()
+
+    start = time.perf_counter()
+    for offset in range(0, len(names), args.insert_batch):
+        backend.insert(make_rows(names[offset:offset + args.insert_batch], rng))
+    backend.flush()
+    report = {"load_seconds": round(time.perf_counter() - start, 3)}
+
+    picks = [names[i] for i in rng.integers(0, len(names), args.lookups)]
+    writes = make_rows([names[i] for i in rng.integers(0, len(names), args.writes)], rng)
+
+    def lookup_before(entity):
+        entity_type, entity_name, _ = entity
+        rows = backend.query({"entity_type": entity_type, "entity_name": entity_name}, ["context_data"], limit=1)
+        assert rows, entity
+
+    def write_before(row):
+        backend.delete({"entity_type": row["entity_type"], "entity_name": row["entity_name"]})
+        backend.insert([row])
+
+    report["before"] = {"lookup": measure(lookup_before, picks), "write": measure(write_before, writes)}
+
+    start = time.perf_counter()
+    ContextStore(name, backend=backend).ensure_ready()
+    backend.flush()
+    report["migrate_seconds"] = round(time.perf_counter() - start, 3)
+
+    def lookup_after(entity):
+        entity_type, entity_name, _ = entity
+        rows = backend.query(
+            {KEY_FIELD: entity_key(entity_type, entity_name)}, ["context_data"], limit=1,
+            partition=entity_partition(entity_name)
+        )
+        assert rows, entity
+
+    def write_after(row):
+        backend.upsert(
+            [{KEY_FIELD: entity_key(row["entity_type"], row["entity_name"]), **row}], KEY_FIELD,
+            partition=entity_partition(row["entity_name"])
+        )
+
+    report["after"] = {"lookup": measure(lookup_after, picks), "write": measure(write_after, writes)}
+    backend.drop()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--insert-batch", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--milvus", action="store_true", help="Also benchmark a temporary Milvus collection")
+    args = parser.parse_args()
+
+    names = entity_names(args.entities)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings.VECTOR_BACKEND, settings.VECTOR_STORE_DIR = "embedded", directory
+        results["embedded"] = run_backend("bench_entities", None, names, args)
+
+    if args.milvus:
+        settings.VECTOR_BACKEND = "milvus"
+        name = f"bench_entities_{os.getpid()}"
+        try:
+            results["milvus"] = run_backend(name, lambda: create_legacy_collection(name), names, args)
+        finally:
+            for collection in (name, f"{name}_migration"):
+                get_vector_backend(collection).drop()
+
+    print(json.dumps({
+        "entities": len(names),
+        "lookups": args.lookups,
+        "writes": args.writes,
+        "results": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark catalog introspection against a synthetic catalog.
+
+Offline mode (default) times the in-memory assembly of catalog rows for a
+synthetic 10k-table catalog. With ``--database`` the synthetic tables are
+created in a scratch schema of that database (via DATABASE_URL) and the legacy
+per-table ``information_schema`` loop is timed against ``SchemaIntrospector``.
+
+Usage (from the Backend directory):
+    python -m benchmarks.bench_introspection [--tables 10000] [--database NAME]
+"""
+import argparse
+import time
+from app.db.introspection import assemble_catalog, SchemaIntrospector
+from app.db.pool import pool_manager
+
+SCRATCH_SCHEMA = "bench_catalog"
+COLUMNS_PER_TABLE = 8
+# Types with modifiers and arrays, to compare type names against information_schema;
+# c1 references c0 and has to stay integer
+COLUMN_TYPES = ["varchar(40)", "integer", "numeric(10, 2)", "timestamptz", "text[]", "char(3)", "time"]
+
+
+def synthetic_rows(tables: int):
+    column_rows = []
+    constraint_rows = []
+    for t in range(tables):
+        name = f"t{t}"
+        for c in range(COLUMNS_PER_TABLE):
+            column_rows.append((SCRATCH_SCHEMA, name, None, f"c{c}", "integer", c > 0, None))
+        constraint_rows.append((SCRATCH_SCHEMA, name, "p", ["c0"], None, None, []))
+        if t:
+            constraint_rows.append((SCRATCH_SCHEMA, name, "f", ["c1"], SCRATCH_SCHEMA, f"t{t - 1}", ["c0"]))
+    return column_rows, constraint_rows
+
+
+def bench_offline(tables: int):
+    column_rows, constraint_rows = synthetic_rows(tables)
+    start = time.perf_counter()
+    catalog = assemble_catalog(column_rows, constraint_rows)
+    elapsed = time.perf_counter() - start
+    print(f"assembled {len(catalog[SCRATCH_SCHEMA])} tables / {len(column_rows)} columns in {elapsed * 1000:.1f} ms")
+
+
+def drop_catalog(database: str, tables: int):
+    with pool_manager.connection(database) as conn:
+        with conn.cursor() as cur:
+            # Drop in reverse FK order and in chunks to stay below max_locks_per_transaction
+            for t in reversed(range(tables)):
+                cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_SCHEMA}.t{t}")
+                if t % 500 == 0:
+                    conn.commit()
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE")
+
+
+def create_catalog(database: str, tables: int):
+    drop_catalog(database, tables)
+    with pool_manager.connection(database) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {SCRATCH_SCHEMA}")
+            columns = ", ".join(
+                f"c{c} {COLUMN_TYPES[c % len(COLUMN_TYPES)]}" for c in range(1, COLUMNS_PER_TABLE)
+            )
+            for t in range(tables):
+                fk = f", FOREIGN KEY (c1) REFERENCES {SCRATCH_SCHEMA}.t{t - 1} (c0)" if t else ""
+                cur.execute(f"CREATE TABLE {SCRATCH_SCHEMA}.t{t} (c0 integer PRIMARY KEY, {columns}{fk})")
+                if t % 500 == 499:
+                    conn.commit()
+
+
+def legacy_get_tables(database: str):
+    """The previous implementation: one information_schema query per table."""
+    with pool_manager.connection(database) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = %s AND table_type = 'BASE TABLE'
+            """, (SCRATCH_SCHEMA,))
+            tables = []
+            for (table_name,) in cur.fetchall():
+                cur.execute("""
+                    SELECT column_name, data_type, is_nullable
+                    FROM information_schema.columns
+                    WHERE table_name = %s
+                """, (table_name,))
+                tables.append((table_name, cur.fetchall()))
+            return tables
+
+
+def bench_live(database: str, tables: int):
+    print(f"creating {tables} tables in {database}.{SCRATCH_SCHEMA} ...")
+    create_catalog(database, tables)
+    try:
+        start = time.perf_counter()
+        introspected = SchemaIntrospector(database).tables([SCRATCH_SCHEMA])
+        set_based = time.perf_counter() - start
+        print(f"set-based introspection: {set_based:.2f} s")
+
+        start = time.perf_counter()
+        legacy_tables = legacy_get_tables(database)
+        legacy = time.perf_counter() - start
+        print(f"legacy per-table introspection: {legacy:.2f} s ({legacy / set_based:.1f}x slower)")
+
+        # Both must report the same column types, since fingerprints hash them
+        types = {(t["name"], c["name"]): c["type"] for t in introspected for c in t["columns"]}
+        legacy_types = {(name, column): data_type for name, rows in legacy_tables for column, data_type, _ in rows}
+        if types != legacy_types:
+            raise SystemExit("set-based introspection reports different column types than information_schema")
+    finally:
+        drop_catalog(database, tables)
+        pool_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tables", type=int, default=10000)
+    parser.add_argument("--database", help="Database to create the synthetic catalog in")
+    args = parser.parse_args()
+    if args.database:
+        bench_live(args.database, args.tables)
+    else:
+        bench_offline(args.tables)
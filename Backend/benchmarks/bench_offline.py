@@ -0,0 +1,399 @@
+"""
+Offline end-to-end benchmark of the API with local stand-ins.
+
+Drives ``main.app`` in-process (through httpx's ASGI transport) against
+deterministic local services, so it needs neither a GPU nor Milvus:
+
+- Ollama: ``benchmarks.fake_ollama`` in a subprocess, with configurable
+  embedding, time-to-first-token and per-token latency;
+- vector store: the embedded index (VECTOR_BACKEND=embedded) in a temporary
+  directory;
+- PostgreSQL: an ephemeral cluster started with ``initdb``/``pg_ctl`` (found
+  on PATH, in /usr/lib/postgresql/*/bin or via ``--pg-bin``), or an existing
+  server given with ``--database-url``. A small synthetic rental database is
+  created in it and its schema ingested.
+
+Each scenario (``query``, ``tables``, ``ingest``, ``context-put``,
+``context-get``, ``bulk-context``) runs at every concurrency level as a
+closed loop and reports p50/p95/p99 latency, requests/sec and errors; for
+requests answered with a background job, latency runs until the job is done
+(concurrent requests for one database share a job). Results
+are written as JSON; ``--compare`` prints the change against an earlier
+results file and exits non-zero if any scenario regressed beyond
+``--tolerance``.
+
+Usage (from the Backend directory):
+    python -m benchmarks.bench_offline --concurrency 1 4 16 --output offline.json
+    python -m benchmarks.bench_offline --database-url postgresql://postgres@localhost:5432/postgres \\
+        --chat-latency 0.2 --token-latency 0.005 --compare offline.json
+"""
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+
+BENCH_DATABASE = "bench_offline"
+
+ANSWERS = {
+    "How many films are there?":
+        "SELECT count(*) AS films FROM film",
+    "List the ten most rented films":
+        "SELECT f.title, count(*) AS rentals FROM rental r JOIN film f ON f.film_id = r.film_id "
+        "GROUP BY f.title ORDER BY rentals DESC LIMIT 10",
+    "Which customers spent the most?":
+        "SELECT c.first_name, c.last_name, sum(p.amount) AS total FROM payment p "
+        "JOIN customer c ON c.customer_id = p.customer_id GROUP BY c.customer_id ORDER BY total DESC LIMIT 10",
+    "How many rentals happened per month?":
+        "SELECT date_trunc('month', rental_date) AS month, count(*) AS rentals FROM rental GROUP BY 1 ORDER BY 1",
+    "How many films are in each category?":
+        "SELECT c.name, count(*) AS films FROM film_category fc JOIN category c ON c.category_id = fc.category_id "
+        "GROUP BY c.name ORDER BY films DESC",
+}
+
+SCHEMA_SQL = """
+    CREATE TABLE category (category_id serial PRIMARY KEY, name text NOT NULL);
+    CREATE TABLE film (
+        film_id serial PRIMARY KEY, title text NOT NULL, release_year int,
+        rental_rate numeric(4, 2), length int
+    );
+    CREATE TABLE film_category (
+        film_id int REFERENCES film, category_id int REFERENCES category, PRIMARY KEY (film_id, category_id)
+    );
+    CREATE TABLE customer (
+        customer_id serial PRIMARY KEY, first_name text, last_name text, email text, active bool
+    );
+    CREATE TABLE rental (
+        rental_id serial PRIMARY KEY, rental_date timestamp, film_id int REFERENCES film,
+        customer_id int REFERENCES customer, return_date timestamp
+    );
+    CREATE TABLE payment (
+        payment_id serial PRIMARY KEY, rental_id int REFERENCES rental, customer_id int REFERENCES customer,
+        amount numeric(6, 2), payment_date timestamp
+    );
+    COMMENT ON TABLE film IS 'Films available for rent';
+    COMMENT ON TABLE rental IS 'One row per rental of a film by a customer';
+    COMMENT ON TABLE payment IS 'Payments made by customers for rentals';
+
+    INSERT INTO category (name) SELECT 'Category ' || i FROM generate_series(1, 16) i;
+    INSERT INTO film (title, release_year, rental_rate, length)
+        SELECT 'Film ' || i, 1990 + i % 30, 0.99 + (i % 5), 60 + i % 120 FROM generate_series(1, {films}) i;
+    INSERT INTO film_category SELECT film_id, 1 + film_id % 16 FROM film;
+    INSERT INTO customer (first_name, last_name, email, active)
+        SELECT 'First' || i, 'Last' || i, 'customer' || i || '@example.com', i % 10 <> 0
+        FROM generate_series(1, {customers}) i;
+    INSERT INTO rental (rental_date, film_id, customer_id, return_date)
+        SELECT timestamp '2024-01-01' + i * interval '7 minutes', 1 + (i * 7919) % {films},
+               1 + (i * 104729) % {customers}, timestamp '2024-01-03' + i * interval '7 minutes'
+        FROM generate_series(1, {rentals}) i;
+    INSERT INTO payment (rental_id, customer_id, amount, payment_date)
+        SELECT rental_id, customer_id, 0.99 + rental_id % 7, return_date FROM rental;
+    ANALYZE;
+"""
+
+FILM_CONTEXT = {
+    "name": "film",
+    "description": "Films available for rent",
+    "business_context": "The catalogue; rental_rate is the price per rental",
+    "primary_key": ["film_id"],
+    "columns": [
+        {"name": "film_id", "data_type": "integer", "description": "Film identifier"},
+        {"name": "title", "data_type": "text", "description": "Film title"},
+        {"name": "rental_rate", "data_type": "numeric", "description": "Price per rental"}
+    ]
+}
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def find_pg_bin(pg_bin):
+    candidates = [pg_bin] if pg_bin else []
+    if shutil.which("initdb"):
+        candidates.append(os.path.dirname(shutil.which("initdb")))
+    candidates.extend(sorted(glob.glob("/usr/lib/postgresql/*/bin"), reverse=True))
+    for directory in candidates:
+        if os.path.exists(os.path.join(directory, "initdb")):
+            return directory
+    return None
+
+
+@contextmanager
+def ephemeral_postgres(pg_bin: str, directory: str):
+    """Start a throwaway trust-auth cluster on a free port; yields its DATABASE_URL."""
+    data = os.path.join(directory, "pgdata")
+    port = free_port()
+    for command in (
+        [os.path.join(pg_bin, "initdb"), "-D", data, "-U", "postgres", "--auth=trust", "--no-sync"],
+        [os.path.join(pg_bin, "pg_ctl"), "-D", data, "-l", os.path.join(directory, "postgres.log"), "-w",
+         "-o", f"-p {port} -c listen_addresses=127.0.0.1 -k {directory} -c fsync=off", "start"]
+    ):
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            # e.g. initdb refuses to run as root
+            raise SystemExit(f"{os.path.basename(command[0])} failed:\n{result.stderr.strip()}")
+    try:
+        yield f"postgresql://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run([os.path.join(pg_bin, "pg_ctl"), "-D", data, "-m", "fast", "stop"], capture_output=True)
+
+
+@contextmanager
+def postgres(args, directory: str):
+    """The server given with --database-url, else an ephemeral cluster."""
+    if args.database_url:
+        yield args.database_url
+        return
+    pg_bin = find_pg_bin(args.pg_bin)
+    if pg_bin is None:
+        raise SystemExit("initdb not found: install PostgreSQL, pass --pg-bin, or use --database-url")
+    with ephemeral_postgres(pg_bin, directory) as database_url:
+        yield database_url
+
+
+def create_bench_database(database_url: str, scale: int):
+    import psycopg
+    from app.utils.db_url_util import get_db_connection_params
+
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+        conn.execute(f"CREATE DATABASE {BENCH_DATABASE}")
+    sizes = {"films": 100 * scale, "customers": 60 * scale, "rentals": 1600 * scale}
+    with psycopg.connect(get_db_connection_params(database_url, BENCH_DATABASE), autocommit=True) as conn:
+        conn.execute(SCHEMA_SQL.format(**sizes))
+
+
+def drop_bench_database(database_url: str):
+    import psycopg
+
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE} WITH (FORCE)")
+
+
+@contextmanager
+def fake_ollama(directory: str, args):
+    answers = os.path.join(directory, "answers.json")
+    with open(answers, "w") as f:
+        json.dump(ANSWERS, f)
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(port), "--answers", answers,
+        "--embed-latency", str(args.embed_latency), "--chat-latency", str(args.chat_latency),
+        "--token-latency", str(args.token_latency)
+    ])
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                urllib.request.urlopen(f"{url}/api/version", timeout=1).read()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise SystemExit("fake Ollama server did not start")
+                time.sleep(0.05)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def scenarios():
+    """name -> function(i) returning (method, path, json body) of the i-th request."""
+    questions = list(ANSWERS)
+    db = BENCH_DATABASE
+    return {
+        "query": lambda i: ("POST", "/api/query", {"query": questions[i % len(questions)], "database": db}),
+        "tables": lambda i: ("GET", f"/api/databases/{db}/tables", None),
+        "ingest": lambda i: ("POST", f"/api/ingest-schema?database={db}", None),
+        "context-put": lambda i: ("PUT", f"/api/database/{db}/table/film/context", FILM_CONTEXT),
+        "context-get": lambda i: ("GET", f"/api/database/{db}/table/film/context?include_columns=true", None),
+        "bulk-context": lambda i: ("PUT", f"/api/database/{db}/bulk-context", {
+            "name": db, "description": "Synthetic rental database", "tables": [FILM_CONTEXT]
+        }),
+    }
+
+
+async def wait_for_job(client, response):
+    """For a queued background job (202), poll until it finishes; returns an error message or None."""
+    payload = response.json()
+    job = payload.get("job") or (payload.get("data") or {}).get("job")
+    while job["status"] in ("queued", "running"):
+        await asyncio.sleep(0.02)
+        job = (await client.get(f"/api/jobs/{job['id']}")).json()
+    return None if job["status"] == "succeeded" else f"job {job['status']}: {job['error']}"
+
+
+async def run_level(client, make_request, concurrency: int, count: int):
+    counter = itertools.count()
+    latencies, errors = [], []
+
+    async def worker():
+        while (i := next(counter)) < count:
+            method, path, body = make_request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors.append(f"{response.status_code}: {response.text[:200]}")
+                    continue
+                # Background jobs are timed until they finish, not until queued
+                if response.status_code == 202 and (error := await wait_for_job(client, response)):
+                    errors.append(error)
+                    continue
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    report = {
+        "requests": count,
+        "errors": len(errors),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None
+    }
+    if latencies:
+        report.update({
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2)
+        })
+    if errors:
+        report["first_error"] = errors[0]
+    return report
+
+
+async def run_benchmark(args):
+    import httpx
+    import main
+    from app.db.catalog_cache import catalog_cache
+    from app.utils.schema_ingestion import ingest_schema, schema_collection_name
+
+    # /query needs the schema in the collection it searches
+    tables, _ = catalog_cache.get_tables(BENCH_DATABASE)
+    ingest_schema(
+        {table["name"]: {key: value for key, value in table.items() if key != "name"} for table in tables},
+        schema_collection_name(BENCH_DATABASE)
+    )
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            for name, make_request in scenarios().items():
+                if args.scenario and name not in args.scenario:
+                    continue
+                await run_level(client, make_request, 1, 1)  # Warm up
+                results[name] = {}
+                for concurrency in args.concurrency:
+                    count = args.ingest_requests if name == "ingest" else args.requests
+                    report = await run_level(client, make_request, concurrency, max(count, concurrency))
+                    results[name][str(concurrency)] = report
+                    print(f"{name:>13} c={concurrency:<3} {json.dumps(report)}", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance: float) -> bool:
+    """Print p50/p95/rps changes against a baseline; True if anything regressed beyond tolerance."""
+    regressed = False
+    for name, levels in results.items():
+        for level, report in levels.items():
+            before = baseline.get("results", {}).get(name, {}).get(level)
+            if not before or "p50_ms" not in before or "p50_ms" not in report:
+                continue
+            changes = {
+                "p50": report["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0,
+                "p95": report["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0,
+                "rps": report["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+            }
+            worse = changes["p50"] > tolerance or changes["p95"] > tolerance or changes["rps"] < -tolerance
+            regressed |= worse
+            print(
+                f"{name:>13} c={level:<3} p50 {changes['p50']:+.1%}  p95 {changes['p95']:+.1%}  "
+                f"rps {changes['rps']:+.1%}{'  REGRESSION' if worse else ''}"
+            )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Existing PostgreSQL server to use instead of an ephemeral one")
+    parser.add_argument("--pg-bin", help="Directory containing initdb and pg_ctl")
+    parser.add_argument("--scale", type=int, default=10, help="Data size multiplier for the synthetic database")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and concurrency level")
+    parser.add_argument("--ingest-requests", type=int, default=10, help="Requests per level for the ingest scenario")
+    parser.add_argument("--scenario", action="append", help="Only run this scenario (repeatable)")
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--chat-latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the SQL and result caches")
+    parser.add_argument("--output", default="offline-bench.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with postgres(args, directory) as database_url:
+            with fake_ollama(directory, args) as ollama_url:
+                # Settings are read at import, so configure the app before importing it
+                os.environ.update({
+                    "DATABASE_URL": database_url,
+                    "OLLAMA_API_URL": ollama_url,
+                    "OLLAMA_HOST": ollama_url,
+                    "VECTOR_BACKEND": "embedded",
+                    "VECTOR_STORE_DIR": os.path.join(directory, "vectors"),
+                    "EMBEDDING_CACHE_DIR": os.path.join(directory, "embeddings"),
+                    "JOBS_DB_PATH": os.path.join(directory, "jobs.sqlite3")
+                })
+                if args.no_cache:
+                    os.environ.update({"SQL_CACHE_ENABLED": "false", "RESULT_CACHE_ENABLED": "false"})
+                create_bench_database(database_url, args.scale)
+                try:
+                    results = asyncio.run(run_benchmark(args))
+                finally:
+                    drop_bench_database(database_url)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {
+            key: getattr(args, key) for key in
+            ("scale", "concurrency", "requests", "ingest_requests", "embed_latency", "chat_latency",
+             "token_latency", "no_cache")
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.tolerance):
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Before/after latency of the schema retrieval step against a live Milvus.
+
+"before" reproduces the old per-query path (connect, build a Collection
+handle, load(), search); "after" searches through the lifespan-owned
+MilvusManager, which connects and loads once. A fixed random query vector is
+used so Ollama time is excluded.
+
+Usage (from the Backend directory):
+    python -m benchmarks.bench_retrieval --collection pagila_db_schema_1 [--iterations 200]
+"""
+import argparse
+import random
+import statistics
+import time
+from pymilvus import connections, Collection
+from app.core.config import settings
+from app.db.milvus_client import milvus_manager
+
+SEARCH_PARAMS = {"metric_type": "IP", "params": {"nprobe": 10}}
+
+
+def search(collection: Collection, vector):
+    return collection.search(
+        data=[vector],
+        anns_field="embedding",
+        param=SEARCH_PARAMS,
+        limit=3,
+        output_fields=["description"]
+    )
+
+
+def before(collection_name: str, vector):
+    connections.connect("default", host=settings.MILVUS_HOST, port=settings.MILVUS_PORT)
+    collection = Collection(collection_name)
+    collection.load()
+    return search(collection, vector)
+
+
+def after(collection_name: str, vector):
+    return milvus_manager.run(collection_name, lambda collection: search(collection, vector))
+
+
+def measure(fn, collection_name: str, vector, iterations: int):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(collection_name, vector)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    vector = [random.uniform(-1, 1) for _ in range(args.dim)]
+    print("before:", measure(before, args.collection, vector, args.iterations))
+    milvus_manager.preload([args.collection])
+    print("after: ", measure(after, args.collection, vector, args.iterations))
+    milvus_manager.close()
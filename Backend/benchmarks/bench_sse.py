@@ -0,0 +1,97 @@
+"""
+Time-to-first-byte of POST /api/query versus the SSE variant /api/query/sse.
+
+For each question, /api/query is timed to the first response byte and to
+completion (the whole answer arrives at once), and /api/query/sse is timed to
+the first byte, the schema event, the first generated token, the finalized SQL,
+the first rows and the end of the stream. Reports the median of each over the
+runs. Use questions that miss the SQL cache (or disable it) to measure
+generation.
+
+Usage (from the Backend directory, with the API running):
+    python -m benchmarks.bench_sse --database pagila --runs 3
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+
+DEFAULT_QUESTIONS = [
+    "How many films are there?",
+    "List the ten most rented films",
+    "Which customers spent the most?",
+]
+
+SSE_MARKS = {
+    "schema": "schema",
+    "token": "first_token",
+    "sql": "sql",
+    "rows": "first_rows",
+    "end": "end",
+    "error": "end",
+}
+
+
+def _request(url: str, question: str, database: str) -> urllib.request.Request:
+    body = json.dumps({"query": question, "database": database}).encode()
+    return urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+
+
+def time_query(base: str, question: str, database: str):
+    start = time.perf_counter()
+    with urllib.request.urlopen(_request(f"{base}/query", question, database), timeout=600) as response:
+        response.read(1)
+        first_byte = time.perf_counter() - start
+        response.read()
+    return {"ttfb": first_byte, "end": time.perf_counter() - start}
+
+
+def time_sse(base: str, question: str, database: str):
+    start = time.perf_counter()
+    marks = {}
+    with urllib.request.urlopen(_request(f"{base}/query/sse", question, database), timeout=600) as response:
+        for raw in response:
+            now = time.perf_counter() - start
+            marks.setdefault("ttfb", now)
+            line = raw.decode().strip()
+            if not line.startswith("event: "):
+                continue
+            mark = SSE_MARKS.get(line[len("event: "):])
+            if mark is not None:
+                marks.setdefault(mark, now)
+    return marks
+
+
+def summarize(samples):
+    keys = sorted({key for sample in samples for key in sample})
+    return {
+        key: round(statistics.median(sample[key] for sample in samples if key in sample) * 1000, 1)
+        for key in keys
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api")
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--question", action="append", help="Question to ask (repeatable)")
+    args = parser.parse_args()
+    questions = args.question or DEFAULT_QUESTIONS
+
+    query_samples, sse_samples = [], []
+    for _ in range(args.runs):
+        for question in questions:
+            query_samples.append(time_query(args.url, question, args.database))
+            sse_samples.append(time_sse(args.url, question, args.database))
+
+    print(json.dumps({
+        "requests_per_endpoint": len(query_samples),
+        "query_ms": summarize(query_samples),
+        "sse_ms": summarize(sse_samples)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
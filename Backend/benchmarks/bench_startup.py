@@ -0,0 +1,150 @@
+"""
+Cold-start benchmark for the API process.
+
+Imports ``main`` in fresh interpreters and reports the wall time together with
+a ``-X importtime`` breakdown of the slowest modules, and which heavy
+dependencies were pulled in at import. With ``--serve`` it also starts uvicorn
+and measures the time until the server answers requests and until
+``/api/ready`` reports every subsystem warm.
+
+Pass ``--path`` to benchmark another checkout (e.g. a ``git worktree`` of an
+older commit) for a before/after comparison.
+
+Usage (from the Backend directory):
+    python -m benchmarks.bench_startup --runs 5 --top 15
+    python -m benchmarks.bench_startup --serve --port 8099
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+HEAVY_MODULES = ["pymilvus", "grpc", "ollama", "httpx", "numpy", "psycopg", "fastapi", "pydantic"]
+
+PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import main\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': elapsed, 'modules': [m for m in %r if m in sys.modules]}))\n"
+) % (HEAVY_MODULES,)
+
+
+def parse_importtime(stderr: str):
+    """Return {module: (self_us, cumulative_us)} from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def import_run(path: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=path, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import main failed in {path}:\n{result.stderr.strip().splitlines()[-1]}")
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe, parse_importtime(result.stderr)
+
+
+def get_ready(url: str):
+    """Return (status code, body) of the readiness endpoint, or (None, None) if not serving."""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None, None
+
+
+def serve_run(path: str, port: int, timeout: float):
+    """Start uvicorn and time how long until it serves requests and reports ready."""
+    url = f"http://127.0.0.1:{port}/api/ready"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=path
+    )
+    serving = ready = detail = None
+    try:
+        while time.perf_counter() - start < timeout:
+            status, body = get_ready(url)
+            if status is not None:
+                detail = body
+                if serving is None:
+                    serving = time.perf_counter() - start
+                if status == 200:
+                    ready = time.perf_counter() - start
+                    break
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "serving_seconds": round(serving, 3) if serving is not None else None,
+        "ready_seconds": round(ready, 3) if ready is not None else None,
+        "ready_detail": detail
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=os.getcwd(), help="Backend directory to benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--serve", action="store_true", help="Also time uvicorn startup and readiness")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    walls, breakdowns, loaded = [], [], None
+    for _ in range(args.runs):
+        probe, modules = import_run(args.path)
+        walls.append(probe["seconds"])
+        breakdowns.append(modules)
+        loaded = probe["modules"]
+
+    # Median cumulative time per module across runs
+    names = set().union(*breakdowns)
+    cumulative = {
+        name: statistics.median(run[name][1] for run in breakdowns if name in run) for name in names
+    }
+    own = {
+        name: statistics.median(run[name][0] for run in breakdowns if name in run) for name in names
+    }
+    top_level = sorted(
+        ((name, us) for name, us in cumulative.items() if "." not in name),
+        key=lambda item: item[1], reverse=True
+    )[:args.top]
+    heaviest = sorted(own.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    report = {
+        "path": os.path.abspath(args.path),
+        "runs": args.runs,
+        "import_main_seconds": {
+            "median": round(statistics.median(walls), 3),
+            "min": round(min(walls), 3),
+            "max": round(max(walls), 3)
+        },
+        "heavy_modules_loaded": loaded,
+        "top_level_cumulative_ms": {name: round(us / 1000, 1) for name, us in top_level},
+        "slowest_self_ms": {name: round(us / 1000, 1) for name, us in heaviest}
+    }
+    if args.serve:
+        report["serve"] = serve_run(args.path, args.port, args.timeout)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Recall and latency of the vector backends.
+
+Builds a synthetic context collection (clustered unit vectors with
+database/table/column entity types and parent entities), then runs the same
+top-k inner-product queries, with and without an ``entity_type`` filter,
+against the embedded index (float32 and float16) and, with ``--milvus``,
+against a temporary Milvus collection. Recall@k is measured against an exact
+brute-force search. Without ``--milvus`` it runs fully offline.
+
+Usage (from the Backend directory):
+    python -m benchmarks.bench_vector_backends --entities 5000 --queries 200
+    python -m benchmarks.bench_vector_backends --entities 5000 --milvus
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.db.context_store import KEY_FIELD, ContextStore, entity_key
+from app.db.embedded_index import EmbeddedBackend
+from app.db.vector_backends import MilvusBackend
+
+DIM = 1024
+
+
+def make_entities(count: int, clusters: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIM)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((count, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    tables = max(1, count // 10)
+    rows = []
+    for i in range(count):
+        if i == 0:
+            entity_type, parent = "database", ""
+        elif i <= tables:
+            entity_type, parent = "table", "bench"
+        else:
+            entity_type, parent = "column", f"table_{i % tables}"
+        rows.append({
+            KEY_FIELD: entity_key(entity_type, f"{entity_type}_{i}"),
+            "entity_type": entity_type,
+            "entity_name": f"{entity_type}_{i}",
+            "parent_entity": parent,
+            "context_data": json.dumps({"name": f"{entity_type}_{i}"}),
+            "embedding": vectors[i].tolist()
+        })
+    return rows, vectors
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    queries = picks + 0.3 * rng.standard_normal(picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, rows, query: np.ndarray, k: int, entity_type=None):
+    candidates = np.array([
+        i for i, row in enumerate(rows) if entity_type is None or row["entity_type"] == entity_type
+    ])
+    scores = vectors[candidates].astype(np.float64) @ query.astype(np.float64)
+    order = np.argsort(-scores)[:k]
+    return {rows[i]["entity_name"] for i in candidates[order]}
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_backend(backend, rows, vectors, queries, k: int, insert_batch: int):
+    backend.ensure_ready()
+    start = time.perf_counter()
+    for offset in range(0, len(rows), insert_batch):
+        backend.insert(rows[offset:offset + insert_batch])
+    backend.flush()
+    insert_seconds = time.perf_counter() - start
+
+    report = {"insert_seconds": round(insert_seconds, 3)}
+    for label, entity_type in (("unfiltered", None), ("entity_type=table", "table")):
+        filters = {"entity_type": entity_type} if entity_type else None
+        backend.search(queries[0].tolist(), k, ["entity_name"], filters)  # warm up
+        latencies, recalls = [], []
+        for query in queries:
+            begin = time.perf_counter()
+            hits = backend.search(query.tolist(), k, ["entity_name", "context_data"], filters)
+            latencies.append(time.perf_counter() - begin)
+            truth = exact_top_k(vectors, rows, query, k, entity_type)
+            recalls.append(len(truth & {hit["entity_name"] for hit in hits}) / len(truth))
+        report[label] = {
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            f"recall@{k}": round(statistics.mean(recalls), 4)
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--insert-batch", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--milvus", action="store_true", help="Also benchmark a temporary Milvus collection")
+    args = parser.parse_args()
+
+    rows, vectors = make_entities(args.entities, args.clusters, args.seed)
+    queries = make_queries(vectors, args.queries, args.seed)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for dtype in ("float32", "float16"):
+            backend = EmbeddedBackend(f"bench_{dtype}", directory, dtype)
+            results[f"embedded-{dtype}"] = run_backend(backend, rows, vectors, queries, args.k, args.insert_batch)
+
+    if args.milvus:
+        from app.db.milvus_client import milvus_manager, pymilvus
+
+        name = f"bench_vectors_{os.getpid()}"
+        backend = MilvusBackend(name)
+        backend.create = ContextStore(name, backend=backend)._create_collection
+        backend.require_partition = False  # Measures search over the whole, unpartitioned collection
+        try:
+            results["milvus"] = run_backend(backend, rows, vectors, queries, args.k, args.insert_batch)
+        finally:
+            milvus_manager.forget(name)
+            pymilvus.utility.drop_collection(name, using=milvus_manager.alias)
+
+    print(json.dumps({
+        "entities": args.entities,
+        "queries": args.queries,
+        "k": args.k,
+        "results": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
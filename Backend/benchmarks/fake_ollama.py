@@ -0,0 +1,161 @@
+"""
+Deterministic stand-in for the Ollama HTTP API, for offline benchmarks.
+
+Serves ``/api/embed`` with hashed bag-of-words embeddings (texts sharing words
+get similar vectors, so schema search still finds the right tables) and
+``/api/chat`` with a JSON answer ``{"query": ..., "thoughts": ...}``, streamed
+token by token when ``stream`` is set. The SQL is taken from ``--answers`` (a
+JSON object mapping questions to SQL) for the question found in the prompt,
+else ``SELECT 1``. Latency is simulated with sleeps, so the numbers reflect
+the backend rather than a GPU.
+
+Usage (from the Backend directory):
+    python -m benchmarks.fake_ollama --port 11435 --chat-latency 0.5 --token-latency 0.01
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIM = 1024
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def embed(text: str, dim: int = DIM):
+    """Unit vector hashing each word (and word bigram) of the text into a signed bucket."""
+    vector = [0.0] * dim
+    words = _WORD.findall(text.lower())
+    for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    answers = {}
+    embed_latency = 0.0
+    chat_latency = 0.0
+    token_latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload):
+        data = json.dumps(payload).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        request = self._read_json()
+        if self.path == "/api/embed":
+            inputs = request.get("input") or []
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(self.embed_latency)
+            self._send_json({"model": request.get("model"), "embeddings": [embed(text) for text in inputs]})
+        elif self.path == "/api/chat":
+            self._chat(request)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _answer(self, prompt: str) -> str:
+        # Longest question first, so "films" does not shadow "films per category"
+        for question in sorted(self.answers, key=len, reverse=True):
+            if question in prompt:
+                return self.answers[question]
+        return "SELECT 1"
+
+    def _chat(self, request):
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        content = json.dumps({"query": self._answer(prompt), "thoughts": "Answered by the offline stand-in."})
+        tokens = re.findall(r"\s*\S{1,4}", content)
+        prompt_tokens = len(_WORD.findall(prompt))
+        done = {
+            "model": request.get("model"),
+            "created_at": "1970-01-01T00:00:00Z",
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": len(tokens)
+        }
+        time.sleep(self.chat_latency)
+
+        if not request.get("stream"):
+            time.sleep(self.token_latency * len(tokens))
+            self._send_json({**done, "message": {"role": "assistant", "content": content}})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                time.sleep(self.token_latency)
+                self._write_chunk({
+                    "model": request.get("model"),
+                    "created_at": "1970-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": token},
+                    "done": False
+                })
+            self._write_chunk({**done, "message": {"role": "assistant", "content": ""}})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped generation early
+
+
+def serve(port: int, answers=None, embed_latency: float = 0.0, chat_latency: float = 0.0, token_latency: float = 0.0):
+    handler = type("Handler", (FakeOllama,), {
+        "answers": answers or {},
+        "embed_latency": embed_latency,
+        "chat_latency": chat_latency,
+        "token_latency": token_latency
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--answers", help="JSON file mapping questions to SQL")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embed request")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per generated token")
+    args = parser.parse_args()
+
+    answers = {}
+    if args.answers:
+        with open(args.answers) as f:
+            answers = json.load(f)
+    serve(args.port, answers, args.embed_latency, args.chat_latency, args.token_latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Concurrent load test for POST /api/query.
+
+Sends the same batch of questions at increasing concurrency levels against a
+running API and reports throughput and latency percentiles per level. With the
+non-blocking pipeline, requests/sec should keep rising with concurrency until
+the LLM backend (e.g. OLLAMA_NUM_PARALLEL) is saturated, instead of staying
+flat at one request at a time.
+
+Usage (from the Backend directory, with the API running):
+    python -m benchmarks.load_query --database pagila --concurrency 1 2 4 8
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_QUESTIONS = [
+    "How many films are there?",
+    "List the ten most rented films",
+    "Which customers spent the most?",
+    "How many rentals happened per month?",
+]
+
+
+def post_query(url: str, question: str, database: str) -> float:
+    body = json.dumps({"query": question, "database": database}).encode()
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=600) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_level(url: str, database: str, questions, concurrency: int, requests_per_level: int):
+    jobs = [questions[i % len(questions)] for i in range(requests_per_level)]
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(post_query, url, question, database) for question in jobs]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests_per_level,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "p50_s": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_s": round(percentile(latencies, 95), 3) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/query")
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=16, help="Requests per concurrency level")
+    args = parser.parse_args()
+
+    for level in args.concurrency:
+        print(json.dumps(run_level(args.url, args.database, DEFAULT_QUESTIONS, level, args.requests)))
@@ -1,8 +1,43 @@
+import importlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
+from app.core.config import settings
+from app.core.jobs import job_queue
+from app.core.metrics import TimingMiddleware
+from app.core.warmup import warmup
+from app.db.pool import pool_manager
+from app.db.milvus_client import milvus_manager
+from app.db.context_store import context_store
+from app.utils import embeddings
 
-app = FastAPI(title="Database Agent API")
+def _warm_database():
+    with pool_manager.connection():
+        pass
+
+# Heavy subsystems start lazily; these warm them in the background after startup
+if settings.VECTOR_BACKEND == "milvus":
+    # The context collection is loaded one database partition at a time, on demand
+    warmup.register("milvus", lambda: milvus_manager.preload(exclude=[context_store.collection_name]))
+warmup.register("context_store", context_store.ensure_ready)
+warmup.register("ollama", embeddings.warm_up)
+warmup.register("database", _warm_database)
+warmup.register("numpy", lambda: importlib.import_module("numpy"), required=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve immediately; /api/ready reports when everything is warm
+    warmup.start()
+    job_queue.start()
+    yield
+    # Wait briefly for running jobs; unfinished ones are queued again on restart
+    job_queue.stop()
+    # Close all pooled database connections and the Milvus connection on shutdown
+    await pool_manager.aclose()
+    milvus_manager.close()
+
+app = FastAPI(title="Database Agent API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -11,8 +46,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "Retry-After"],
 )
 
+# Per-stage Server-Timing header and request latency histograms
+if settings.METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
 app.include_router(router, prefix="/api")
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+import pytest
+
+from app.core.config import settings
+from app.db import vector_backends
+from app.db.context_store import (
+    CONTEXT_COLLECTION, KEY_FIELD, LEGACY_CONTEXT_COLLECTION, ContextStore, database_partition, entity_key
+)
+from app.utils.schema_ingestion import schema_collection_name
+
+EMBEDDING = [1.0, 0.0, 0.0, 0.0]
+
+
+@pytest.fixture
+def embedded(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "embedded")
+    monkeypatch.setattr(settings, "VECTOR_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_backends, "_backends", {})
+
+
+def context_row(entity_type, entity_name, parent):
+    return {
+        KEY_FIELD: entity_key(entity_type, entity_name),
+        "entity_type": entity_type,
+        "entity_name": entity_name,
+        "parent_entity": parent,
+        "context_data": "{}",
+        "embedding": EMBEDDING
+    }
+
+
+def test_context_collection_cannot_be_a_schema_collection():
+    assert not CONTEXT_COLLECTION.endswith("_schema")
+    assert LEGACY_CONTEXT_COLLECTION == schema_collection_name("structure")
+
+
+def test_contexts_under_the_old_name_are_taken_over(embedded):
+    legacy = vector_backends.get_vector_backend(LEGACY_CONTEXT_COLLECTION)
+    legacy.upsert(
+        [context_row("database", "shop", ""), context_row("table", "shop.orders", "shop")],
+        KEY_FIELD, partition=database_partition("shop")
+    )
+
+    store = ContextStore(CONTEXT_COLLECTION, legacy_collection_name=LEGACY_CONTEXT_COLLECTION)
+    store.ensure_ready()
+
+    rows = store.backend.query({}, ["entity_name"], partition=database_partition("shop"))
+    assert sorted(row["entity_name"] for row in rows) == ["shop", "shop.orders"]
+    assert not legacy.exists()
+
+
+def test_schema_collection_of_a_database_named_structure_is_left_alone(embedded):
+    schema = vector_backends.get_vector_backend(schema_collection_name("structure"))
+    schema.insert([{"table_name": "orders", "fingerprint": "f", "description": "Table: orders", "embedding": EMBEDDING}])
+
+    store = ContextStore(CONTEXT_COLLECTION, legacy_collection_name=LEGACY_CONTEXT_COLLECTION)
+    store.ensure_ready()
+
+    assert [row["table_name"] for row in schema.query({}, ["table_name"])] == ["orders"]
+    assert store.backend.partitions() == []
@@ -0,0 +1,148 @@
+import os
+import threading
+
+import pytest
+
+from app.db import embedded_index
+from app.db.embedded_index import EmbeddedBackend
+
+
+def make_rows(names, dim=4):
+    rows = []
+    for index, name in enumerate(names):
+        embedding = [0.0] * dim
+        embedding[index % dim] = 1.0 + index  # Distinct norms, so a row's score identifies its vector
+        rows.append({"entity_name": name, "group": "even" if index % 2 == 0 else "odd", "embedding": embedding})
+    return rows
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = EmbeddedBackend("collection", str(tmp_path))
+    backend.ensure_ready()
+    return backend
+
+
+def names_of(rows):
+    return sorted(row["entity_name"] for row in rows)
+
+
+def test_compaction_keeps_live_rows_and_their_vectors(backend):
+    rows = make_rows([f"row_{index}" for index in range(10)])
+    backend.insert(rows)
+    backend.delete({"entity_name": [f"row_{index}" for index in range(8)]})
+    assert backend.stats()["dead_rows"] == 8
+
+    backend.compact()
+
+    stats = backend.stats()
+    assert (stats["rows"], stats["dead_rows"]) == (2, 0)
+    assert names_of(backend.query({}, ["entity_name"])) == ["row_8", "row_9"]
+    # Vectors were rewritten in the same order as their rows
+    for row in rows[8:]:
+        hit = backend.search(row["embedding"], 1, ["entity_name"])[0]
+        assert hit["entity_name"] == row["entity_name"]
+        assert hit["score"] == pytest.approx(sum(value * value for value in row["embedding"]))
+
+
+def test_compaction_runs_once_dead_rows_outnumber_live_ones(backend, monkeypatch):
+    monkeypatch.setattr(embedded_index, "COMPACT_MIN_DEAD_ROWS", 3)
+    backend.insert(make_rows(["a", "b", "c", "d"]))
+    backend.upsert(make_rows(["a", "b", "c"]), "entity_name")
+    # Three dead rows against four live ones: not yet
+    assert backend.stats()["dead_rows"] == 3
+    backend.upsert(make_rows(["a", "b"]), "entity_name")
+    assert backend.stats()["dead_rows"] == 0
+    assert names_of(backend.query({}, ["entity_name"])) == ["a", "b", "c", "d"]
+
+
+def test_other_instances_reload_after_compaction(backend, tmp_path):
+    backend.insert(make_rows([f"row_{index}" for index in range(6)]))
+    reader = EmbeddedBackend("collection", str(tmp_path))
+    assert len(reader.query({}, ["entity_name"])) == 6
+
+    backend.delete({"entity_name": ["row_0", "row_1", "row_2", "row_3"]})
+    backend.compact()
+    backend.insert(make_rows(["row_6"]))
+
+    assert names_of(reader.query({}, ["entity_name"])) == ["row_4", "row_5", "row_6"]
+    assert reader.query({"group": "even"}, ["entity_name"]) == [{"entity_name": "row_4"}, {"entity_name": "row_6"}]
+
+
+def test_readers_never_see_half_of_a_compaction(backend, tmp_path, monkeypatch):
+    rows = make_rows([f"row_{index}" for index in range(10)])
+    backend.insert(rows)
+    backend.delete({"entity_name": [f"row_{index}" for index in range(8)]})
+    hits, blocked = [], []
+    replace = os.replace
+
+    def replace_then_read(source, target):
+        replace(source, target)
+        if target == backend.vectors_path:
+            # New vectors, old entries: a reader loading now must wait for the entries too
+            reader = threading.Thread(target=lambda: hits.append(
+                EmbeddedBackend("collection", str(tmp_path)).search(rows[9]["embedding"], 1, ["entity_name"])
+            ))
+            reader.start()
+            reader.join(0.2)
+            blocked.append(reader.is_alive())
+            threads.append(reader)
+
+    threads = []
+    monkeypatch.setattr(embedded_index.os, "replace", replace_then_read)
+    backend.compact()
+    threads[0].join()
+
+    assert blocked == [True]
+    assert hits[0][0]["entity_name"] == "row_9"
+    assert hits[0][0]["score"] == pytest.approx(sum(value * value for value in rows[9]["embedding"]))
+
+
+def test_partitions_are_separate_shards(backend):
+    backend.upsert(make_rows(["a.t1", "a.t2"]), "entity_name", partition="a")
+    backend.upsert(make_rows(["b.t1"]), "entity_name", partition="b")
+
+    assert backend.partitions() == ["a", "b"]
+    assert names_of(backend.query({}, ["entity_name"], partition="a")) == ["a.t1", "a.t2"]
+    assert names_of(backend.query({}, ["entity_name"], partition="b")) == ["b.t1"]
+    assert backend.query({}, ["entity_name"], partition="missing") == []
+    # Rows written to a partition are not in the default one
+    assert backend.query({}, ["entity_name"], partition="_default") == []
+    assert names_of(backend.query({}, ["entity_name"])) == ["a.t1", "a.t2", "b.t1"]
+
+    embedding = make_rows(["a.t1"])[0]["embedding"]
+    assert names_of(backend.search(embedding, 5, ["entity_name"], partition="b")) == ["b.t1"]
+    assert names_of(backend.search(embedding, 1, ["entity_name"])) == ["a.t1"]
+
+
+def test_partition_writes_and_deletes_stay_in_their_shard(backend):
+    backend.upsert(make_rows(["t1", "t2"]), "entity_name", partition="a")
+    backend.upsert(make_rows(["t1", "t2"]), "entity_name", partition="b")
+    backend.upsert(make_rows(["t1"]), "entity_name", partition="a")
+    backend.delete({"entity_name": "t2"}, partition="a")
+
+    assert names_of(backend.query({}, ["entity_name"], partition="a")) == ["t1"]
+    assert names_of(backend.query({}, ["entity_name"], partition="b")) == ["t1", "t2"]
+
+
+def test_released_partitions_reload_on_read(backend):
+    backend.upsert(make_rows(["t1"]), "entity_name", partition="a")
+    assert backend.stats()["loaded_partitions"] == {"a": 1}
+
+    backend.release_partition("a")
+    assert backend.stats()["loaded_partitions"] == {}
+    assert names_of(backend.query({}, ["entity_name"], partition="a")) == ["t1"]
+
+    backend.drop()
+    assert backend.partitions() == []
+    assert backend.query({}, ["entity_name"], partition="a") == []
+
+
+def test_required_partition_rejects_unscoped_reads(backend):
+    backend.require_partition = True
+    backend.upsert(make_rows(["t1"]), "entity_name", partition="a")
+    with pytest.raises(ValueError):
+        backend.query({}, ["entity_name"])
+    with pytest.raises(ValueError):
+        backend.search([1.0, 0.0, 0.0, 0.0], 1, ["entity_name"])
+    assert backend.query({}, ["entity_name"], partition="a") == [{"entity_name": "t1"}]
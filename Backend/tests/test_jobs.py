@@ -0,0 +1,208 @@
+import asyncio
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from app.core.jobs import CANCELLED, QUEUED, REPLACE, RUNNING, SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(handler, workers=1, dedupe=None, **options):
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=workers, **options)
+        queue.register("ingest", handler, **({"dedupe": dedupe} if dedupe else {}))
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def insert_running(queue, job_id, key, owner, heartbeat_at, cancel_requested=0):
+    queue._db().execute(
+        "INSERT INTO jobs (id, kind, key, status, params, cancel_requested, created_at, started_at, owner, heartbeat_at) "
+        "VALUES (?, 'ingest', ?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, key, RUNNING, '{"job": "%s"}' % job_id, cancel_requested, time.time(), time.time(), owner, heartbeat_at)
+    )
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_workers_run_each_job_once(make_queue):
+    runs = Counter()
+    lock = threading.Lock()
+
+    def handler(params, progress):
+        with lock:
+            runs[params["n"]] += 1
+        time.sleep(0.005)
+        return {}
+
+    queue = make_queue(handler, workers=4)
+    for n in range(30):
+        queue.enqueue("ingest", f"db{n}", {"n": n})
+    queue.start()
+
+    wait_for(lambda: queue.stats()["jobs"].get(SUCCEEDED) == 30)
+    assert runs == Counter(range(30))
+
+
+def test_queues_sharing_a_file_run_each_job_once(make_queue):
+    runs = Counter()
+    lock = threading.Lock()
+
+    def handler(params, progress):
+        with lock:
+            runs[params["n"]] += 1
+        time.sleep(0.005)
+        return {}
+
+    queues = [make_queue(handler, workers=4) for _ in range(2)]
+    for n in range(60):
+        queues[n % 2].enqueue("ingest", f"db{n}", {"n": n})
+    for queue in queues:
+        queue.start()
+
+    wait_for(lambda: queues[0].stats()["jobs"].get(SUCCEEDED) == 60)
+    assert runs == Counter(range(60))
+
+
+def test_jobs_of_one_key_never_overlap_across_queues(make_queue):
+    active = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def handler(params, progress):
+        with lock:
+            if active:
+                overlaps.append(params["n"])
+            active.append(params["n"])
+        time.sleep(0.01)
+        with lock:
+            active.remove(params["n"])
+        return {}
+
+    queues = [make_queue(handler, workers=4, dedupe=REPLACE) for _ in range(2)]
+    for queue in queues:
+        queue.start()
+    for n in range(20):
+        # Requests behind a running job queue up (or replace the queued one) instead of running alongside it
+        queues[n % 2].enqueue("ingest", "db", {"n": n})
+        time.sleep(0.003)
+
+    wait_for(lambda: not queues[0].list(status=QUEUED) and not queues[0].list(status=RUNNING))
+    assert not overlaps
+    assert queues[0].list(limit=1)[0]["status"] == SUCCEEDED
+
+
+def test_join_returns_the_pending_job(make_queue):
+    queue = make_queue(lambda params, progress: {})
+    first, created = queue.enqueue("ingest", "db", {"n": 1})
+    second, joined_created = queue.enqueue("ingest", "db", {"n": 2})
+    assert created and not joined_created
+    assert second["id"] == first["id"]
+
+
+def test_replace_updates_the_queued_job(make_queue):
+    seen = []
+    queue = make_queue(lambda params, progress: seen.append(params["n"]) or {}, dedupe=REPLACE)
+    first, _ = queue.enqueue("ingest", "db", {"n": 1})
+    second, created = queue.enqueue("ingest", "db", {"n": 2})
+    assert not created and second["id"] == first["id"]
+    queue.start()
+    wait_for(lambda: queue.get(first["id"])["status"] == SUCCEEDED)
+    assert seen == [2]
+
+
+def test_start_requeues_only_abandoned_jobs(make_queue):
+    ran = []
+    queue = make_queue(lambda params, progress: ran.append(params["job"]) or {}, stale_after=30.0)
+    now = time.time()
+    host = socket.gethostname()
+    insert_running(queue, "exited", "a", f"{host}:{exited_pid()}:x", now)
+    insert_running(queue, "stale", "b", "other-host:1:x", now - 60)
+    insert_running(queue, "live", "c", "other-host:1:y", now)
+    insert_running(queue, "cancelled", "d", "other-host:1:z", now - 60, cancel_requested=1)
+
+    queue.start()
+
+    wait_for(lambda: queue.get("exited")["status"] == SUCCEEDED and queue.get("stale")["status"] == SUCCEEDED)
+    assert sorted(ran) == ["exited", "stale"]
+    assert queue.get("live")["status"] == RUNNING
+    assert queue.get("cancelled")["status"] == CANCELLED
+
+
+def test_heartbeat_keeps_long_jobs_and_recovers_stale_ones(make_queue):
+    release = threading.Event()
+    ran = []
+
+    def handler(params, progress):
+        ran.append(params["job"])
+        if params["job"] == "long":
+            release.wait(10)
+        return {}
+
+    queue = make_queue(handler, workers=2, heartbeat_interval=0.05, stale_after=0.3)
+    job, _ = queue.enqueue("ingest", "long", {"job": "long"})
+    queue.start()
+    wait_for(lambda: queue.get(job["id"])["status"] == RUNNING)
+    # Another process died while running a job; its heartbeat goes stale after the queue started
+    insert_running(queue, "orphan", "other", "other-host:1:x", time.time())
+
+    wait_for(lambda: queue.get("orphan")["status"] == SUCCEEDED)
+    assert queue.get(job["id"])["status"] == RUNNING
+    release.set()
+    wait_for(lambda: queue.get(job["id"])["status"] == SUCCEEDED)
+    assert ran.count("long") == 1
+
+
+def test_jobs_running_elsewhere_are_not_claimed(make_queue):
+    queue = make_queue(lambda params, progress: {})
+    job, _ = queue.enqueue("ingest", "db", {})
+    # Claimed by a worker of another process
+    queue._db().execute("UPDATE jobs SET status = ?, owner = 'other-host:1:x' WHERE id = ?", (RUNNING, job["id"]))
+    with queue._lock:
+        assert queue._claim() is None
+
+
+def test_bulk_context_job_runs_on_the_worker_thread(monkeypatch):
+    from app.api import routes
+    from app.models.context import ColumnContext, DatabaseContext, TableContext
+
+    stored = []
+
+    def store_contexts_bulk_sync(entities, batch_size, progress=None):
+        stored.extend((entity["entity_type"], entity["entity_name"]) for entity in entities)
+        return {"stored": len(entities)}
+
+    monkeypatch.setattr(routes.context_processor.context_store, "store_contexts_bulk_sync", store_contexts_bulk_sync)
+    context = DatabaseContext(name="shop", tables=[
+        TableContext(name="orders", columns=[ColumnContext(name="id", data_type="integer")])
+    ])
+    params = {"db_name": "shop", "context": context.model_dump(mode="json"), "include_tables": True, "include_columns": True}
+
+    async def on_a_running_loop():
+        # A job that started its own event loop could not run here
+        return routes._bulk_context_job(params, lambda done, total: None)
+
+    assert asyncio.run(on_a_running_loop()) == {"stored": 3}
+    assert stored == [("database", "shop"), ("table", "shop.orders"), ("column", "shop.orders.id")]
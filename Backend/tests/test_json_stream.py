@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from app.utils.json_stream import JSONFieldStream
+
+DOCUMENT = {
+    "thoughts": "He said \"no\"\nthen left \\ twice",
+    "query": "SELECT 'café' AS \"name\" FROM t WHERE a = '\\\\'",
+    "nested": {"query": "not top level", "list": ["a\"b", {"x": "y"}]},
+    "count": 3,
+    "tail": "☃ \t done"
+}
+TOP_LEVEL_STRINGS = {key: value for key, value in DOCUMENT.items() if isinstance(value, str)}
+
+
+def feed_all(text, size):
+    stream = JSONFieldStream()
+    completed = []
+    for offset in range(0, len(text), size):
+        completed.extend(stream.feed(text[offset:offset + size]))
+    return stream, completed
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_escapes_decode_at_any_chunk_boundary(ensure_ascii, size):
+    text = json.dumps(DOCUMENT, ensure_ascii=ensure_ascii)
+    stream, completed = feed_all(text, size)
+    assert dict(completed) == TOP_LEVEL_STRINGS
+    assert stream.fields == TOP_LEVEL_STRINGS
+
+
+def test_fields_complete_in_document_order():
+    _, completed = feed_all(json.dumps(DOCUMENT), 5)
+    assert [key for key, _ in completed] == ["thoughts", "query", "tail"]
+
+
+def test_escaped_quote_at_chunk_end_does_not_close_the_string():
+    stream = JSONFieldStream()
+    assert stream.feed('{"query": "a\\') == []
+    assert stream.feed('"b"}') == [("query", 'a"b')]
+
+
+def test_keys_with_escapes_are_decoded():
+    stream, _ = feed_all(json.dumps({"we\"ird\\key": "v"}), 1)
+    assert stream.fields == {"we\"ird\\key": "v"}
+
+
+def test_value_after_non_string_value_keeps_its_key():
+    _, completed = feed_all('{"count": 3, "flag": true, "query": "x"}', 4)
+    assert completed == [("query", "x")]
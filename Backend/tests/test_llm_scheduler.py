@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.llm_scheduler import BACKGROUND, INTERACTIVE, LLMOverloaded, LLMScheduler, llm_priority
+
+
+def hold_slot(scheduler, release: threading.Event):
+    """Occupy one slot from a thread until ``release`` is set."""
+    entered = threading.Event()
+
+    def run():
+        with scheduler.slot_sync():
+            entered.set()
+            release.wait()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    entered.wait()
+    return thread
+
+
+def hold_slot_later(scheduler, priority):
+    """Start a thread that queues for a slot and releases it right away."""
+    def run():
+        with llm_priority(priority):
+            with scheduler.slot_sync():
+                pass
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_calls_beyond_concurrency_wait_for_a_slot():
+    scheduler = LLMScheduler("test", concurrency=2, max_queue=10, timeout=5.0)
+    running = peak = 0
+    lock = threading.Lock()
+
+    def call():
+        nonlocal running, peak
+        with scheduler.slot_sync():
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = scheduler.stats()
+    assert peak == 2
+    assert stats["admitted"] == 8 and stats["queued"] >= 6
+    assert stats["in_flight"] == 0 and stats["waiting"] == {"interactive": 0, "background": 0}
+
+
+def test_interactive_calls_are_rejected_when_the_queue_is_full():
+    scheduler = LLMScheduler("test", concurrency=1, max_queue=1, timeout=5.0)
+    release = threading.Event()
+    holder = hold_slot(scheduler, release)
+    queued = hold_slot_later(scheduler, INTERACTIVE)
+    wait_for(lambda: scheduler.stats()["waiting"]["interactive"] == 1)
+
+    with pytest.raises(LLMOverloaded) as error:
+        with scheduler.slot_sync():
+            pass
+    assert error.value.retry_after >= 1
+    assert scheduler.rejected == 1
+
+    # Background callers are never rejected, they wait
+    background = hold_slot_later(scheduler, BACKGROUND)
+    wait_for(lambda: scheduler.stats()["waiting"]["background"] == 1)
+    release.set()
+    for thread in (holder, queued, background):
+        thread.join()
+    assert scheduler.stats()["admitted"] == 3
+
+
+def test_interactive_callers_time_out():
+    scheduler = LLMScheduler("test", concurrency=1, max_queue=5, timeout=0.05)
+    release = threading.Event()
+    holder = hold_slot(scheduler, release)
+
+    async def call():
+        async with scheduler.slot():
+            pass
+
+    with pytest.raises(LLMOverloaded):
+        asyncio.run(call())
+    release.set()
+    holder.join()
+
+    stats = scheduler.stats()
+    assert stats["timeouts"] == 1 and stats["in_flight"] == 0
+    assert stats["waiting"]["interactive"] == 0
+
+
+def test_interactive_waiters_go_before_background_ones():
+    scheduler = LLMScheduler("test", concurrency=1, max_queue=5, timeout=5.0)
+    release = threading.Event()
+    holder = hold_slot(scheduler, release)
+    order = []
+
+    def call(name, priority):
+        with llm_priority(priority):
+            with scheduler.slot_sync():
+                order.append(name)
+
+    threads = []
+    for name, priority in [("background", BACKGROUND), ("interactive", INTERACTIVE)]:
+        threads.append(threading.Thread(target=call, args=(name, priority)))
+        threads[-1].start()
+        wait_for(lambda: scheduler.stats()["queued"] == len(threads))
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join()
+
+    assert order == ["interactive", "background"]
+
+
+def test_overloaded_query_returns_429_with_retry_after(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api import routes
+
+    async def overloaded(query, database):
+        raise LLMOverloaded("generate", 7)
+
+    monkeypatch.setattr(routes, "process_natural_language_query_async", overloaded)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+
+    response = TestClient(app).post("/api/query", json={"query": "How many films?", "database": "dvdrental"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
@@ -0,0 +1,92 @@
+import pytest
+
+from app.db.query_guard import add_limit, is_read_only
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t",
+    "  select 1",
+    "WITH x AS (SELECT 1) SELECT * FROM x",
+])
+def test_selects_are_read_only(sql):
+    assert is_read_only(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t WHERE note = 'delete me'",
+    "SELECT * FROM t WHERE note = 'it''s an update'",
+    "SELECT \"insert\" FROM t",
+    "SELECT $$drop table t$$",
+    "SELECT $tag$ truncate $tag$",
+    "-- drop everything\nSELECT 1",
+    "/* update */ SELECT 1",
+    "SELECT 1 -- then delete",
+])
+def test_read_only_ignores_literals_and_comments(sql):
+    assert is_read_only(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM t",
+    "UPDATE t SET a = 1",
+    "WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d",
+    "SELECT * INTO copy FROM t",
+    "SELECT 1; DROP TABLE t",
+    "EXPLAIN SELECT 1",
+])
+def test_writes_are_not_read_only(sql):
+    assert not is_read_only(sql)
+
+
+def test_limit_is_appended_to_unbounded_select():
+    assert add_limit("SELECT * FROM t;", 100) == ("SELECT * FROM t\nLIMIT 100", True)
+
+
+def test_limit_is_appended_when_a_literal_mentions_a_write():
+    sql, limited = add_limit("SELECT * FROM t WHERE note = 'delete me'", 100)
+    assert limited
+    assert sql.endswith("\nLIMIT 100")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t WHERE a = 'limit 5'",
+    "SELECT * FROM t -- limit 5",
+    "SELECT * FROM t /* LIMIT 5 */",
+    "SELECT * FROM (SELECT * FROM t LIMIT 5) AS s",
+    "SELECT * FROM t WHERE a IN (SELECT a FROM u LIMIT 1)",
+])
+def test_limits_in_literals_comments_and_subqueries_do_not_count(sql):
+    rewritten, limited = add_limit(sql, 100)
+    assert limited
+    assert rewritten.endswith("\nLIMIT 100")
+
+
+def test_trailing_comment_does_not_swallow_the_limit():
+    sql, _ = add_limit("SELECT * FROM t -- note", 100)
+    assert sql.splitlines()[-1] == "LIMIT 100"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t LIMIT 10",
+    "SELECT * FROM t FETCH FIRST 10 ROWS ONLY",
+    "SELECT * FROM t FETCH FIRST ROW ONLY",
+])
+def test_smaller_own_limit_is_kept(sql):
+    assert add_limit(sql, 100) == (sql, False)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t LIMIT 5000",
+    "SELECT * FROM t LIMIT ALL",
+    "SELECT * FROM t FETCH NEXT 5000 ROWS ONLY",
+])
+def test_larger_own_limit_is_wrapped(sql):
+    assert add_limit(sql, 100) == (f"SELECT * FROM (\n{sql}\n) AS limited LIMIT 100", True)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM t",
+    "SELECT * FROM t FOR UPDATE",
+])
+def test_writes_and_locking_reads_are_left_alone(sql):
+    assert add_limit(sql, 100) == (sql, False)
@@ -0,0 +1,149 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.db import result_cache as result_cache_module
+from app.db.result_cache import ResultCache, Snapshot, _plan_tables, normalize_sql
+
+TABLE = ("public", "film")
+
+
+class FakeCursor:
+    def __init__(self):
+        self.description = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql_query):
+        if sql_query.startswith("SELECT"):
+            self.description = [("id",)]
+
+    async def fetchall(self):
+        return [(1,)]
+
+
+class FakeConnection:
+    async def execute(self, sql_query):
+        pass
+
+    def cursor(self):
+        return FakeCursor()
+
+
+class FakePool:
+    @asynccontextmanager
+    async def async_connection(self, database):
+        yield FakeConnection()
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "pool_manager", FakePool())
+    cache = ResultCache(max_entries=2, max_rows=3, ttl=60.0)
+    cache.counters = {TABLE: (10, 1234)}
+
+    async def versions(conn, tables):
+        return {table: cache.counters[table] for table in tables if table in cache.counters}
+
+    cache._versions = versions
+    return cache
+
+
+def lookup(cache, sql_query, database="db"):
+    return asyncio.run(cache.lookup(database, sql_query))
+
+
+def counted():
+    return Snapshot([TABLE], ((10, 1234),))
+
+
+def test_result_is_served_until_the_table_is_written(cache):
+    cache.store("db", "SELECT * FROM film;", [{"id": 1}], counted())
+    rows, info = lookup(cache, "SELECT *\n  FROM film")
+    assert rows == [{"id": 1}]
+    assert info["results_cached"] and info["results_cache_validation"] == "tables"
+
+    cache.counters[TABLE] = (11, 1234)
+    assert lookup(cache, "SELECT * FROM film") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_rewrite_of_the_table_invalidates(cache):
+    cache.store("db", "SELECT * FROM film", [{"id": 1}], counted())
+    cache.counters[TABLE] = (10, 5678)  # TRUNCATE: same counters, new file node
+    assert lookup(cache, "SELECT * FROM film") is None
+
+
+def test_ttl_entries_expire(cache, monkeypatch):
+    cache.store("db", "SELECT now()", [{"now": 1}], Snapshot())
+    assert lookup(cache, "SELECT now()")[1]["results_cache_validation"] == "ttl"
+
+    created = cache._entries[("db", "SELECT now()")].created_at
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: created + 61.0)
+    assert lookup(cache, "SELECT now()") is None
+
+
+def test_table_validated_entries_also_expire(cache, monkeypatch):
+    # Counters lag, and never move with track_counts off: the ttl bounds such results too
+    cache.store("db", "SELECT * FROM film", [{"id": 1}], counted())
+    created = cache._entries[("db", "SELECT * FROM film")].created_at
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: created + 61.0)
+    assert lookup(cache, "SELECT * FROM film") is None
+
+
+def test_writes_through_the_app_drop_the_database_results(cache, monkeypatch):
+    from app.utils import query_processing
+    monkeypatch.setattr(query_processing, "pool_manager", FakePool())
+    monkeypatch.setattr(query_processing, "result_cache", cache)
+    cache.store("db", "SELECT * FROM film", [{"id": 1}], counted())
+    cache.store("other", "SELECT * FROM film", [{"id": 1}], counted())
+
+    assert asyncio.run(query_processing.execute_sql_query_async("SELECT * FROM film", "db")) == [{"id": 1}]
+    assert lookup(cache, "SELECT * FROM film") is not None
+
+    assert asyncio.run(query_processing.execute_sql_query_async("UPDATE film SET title = 'x'", "db")) == []
+    assert lookup(cache, "SELECT * FROM film") is None
+    assert lookup(cache, "SELECT * FROM film", database="other") is not None
+
+
+def test_results_are_per_database_and_bounded(cache):
+    cache.store("db", "SELECT * FROM film", [{"id": 1}], counted())
+    assert lookup(cache, "SELECT * FROM film", database="other") is None
+
+    cache.store("db", "SELECT 1 FROM film", [{"id": 1}] * 4, counted())  # Over max_rows
+    assert lookup(cache, "SELECT 1 FROM film") is None
+
+    cache.store("db", "SELECT 2 FROM film", [], counted())
+    cache.store("db", "SELECT 3 FROM film", [], counted())
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+    assert lookup(cache, "SELECT * FROM film") is None
+
+
+def test_invalidate_drops_one_database(cache):
+    cache.store("db", "SELECT * FROM film", [], counted())
+    cache.store("other", "SELECT * FROM film", [], counted())
+    cache.invalidate("db")
+    assert lookup(cache, "SELECT * FROM film") is None
+    assert lookup(cache, "SELECT * FROM film", database="other") is not None
+
+
+def test_plan_tables_flags_opaque_scans():
+    tables = set()
+    plan = {"Node Type": "Hash Join", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "film", "Schema": "public"},
+        {"Node Type": "Index Scan", "Relation Name": "actor", "Schema": "public"}
+    ]}
+    assert _plan_tables(plan, tables)
+    assert tables == {("public", "film"), ("public", "actor")}
+    assert not _plan_tables({"Node Type": "Nested Loop", "Plans": [{"Node Type": "Function Scan"}]}, set())
+
+
+def test_volatile_queries_are_ttl_only(cache):
+    snapshot = asyncio.run(cache.snapshot("db", "SELECT * FROM film WHERE created < now()"))
+    assert snapshot.validation == "ttl"
+    assert normalize_sql(" SELECT  1 ;") == "SELECT 1"
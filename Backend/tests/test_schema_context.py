@@ -0,0 +1,82 @@
+from app.utils.schema_context import SchemaGraph, build_schema_context, estimate_tokens, render_table
+
+
+def table(name, columns, primary_key=None, foreign_keys=None):
+    return {
+        "name": name,
+        "columns": [{"name": column, "type": "integer" if column.endswith("id") else "text"} for column in columns],
+        "primary_key": primary_key or [],
+        "foreign_keys": foreign_keys or {}
+    }
+
+
+def description(name, columns):
+    return f"Table: {name}\nColumns: {', '.join(columns)}"
+
+
+# film -> film_actor <- actor, film -> language; store is unconnected
+TABLES = [
+    table("film", ["film_id", "title", "description", "release_year", "rating", "language_id"],
+          ["film_id"], {"language_id": "language.language_id"}),
+    table("film_actor", ["actor_id", "film_id"], ["actor_id", "film_id"],
+          {"actor_id": "actor.actor_id", "film_id": "film.film_id"}),
+    table("actor", ["actor_id", "first_name", "last_name"], ["actor_id"]),
+    table("language", ["language_id", "name"], ["language_id"]),
+    table("store", ["store_id", "address"], ["store_id"])
+]
+
+
+def test_hit_tables_are_joined_through_the_shortest_fk_path():
+    context = build_schema_context(
+        [description("film", ["film_id", "title"]), description("actor", ["actor_id"])], TABLES, 10_000
+    )
+    assert context["seeds"] == ["film", "actor"]
+    assert context["tables"] == ["film", "actor", "film_actor"]
+    assert context["pruned_columns"] == 0 and context["dropped_tables"] == []
+
+
+def test_path_respects_max_hops():
+    graph = SchemaGraph(TABLES)
+    assert graph.path_to("language", {"actor"}, 3) == ["language", "film", "film_actor", "actor"]
+    assert graph.path_to("language", {"actor"}, 2) is None
+    assert graph.connect(["language", "actor"], 2) == ["language", "actor"]
+
+
+def test_unreachable_hits_are_kept_on_their_own():
+    context = build_schema_context(
+        [description("film", ["title"]), description("store", ["address"])], TABLES, 10_000
+    )
+    assert context["tables"] == ["film", "store"]
+
+
+def test_rendering_uses_short_types_keys_and_references():
+    line = render_table(TABLES[0])
+    assert line.startswith("film(film_id int PK, title text")
+    assert "language_id int -> language.language_id" in line
+
+
+def test_over_budget_prunes_columns_of_the_lowest_ranked_table_first():
+    descriptions = [description("film", ["title"]), description("actor", ["first_name"])]
+    full = build_schema_context(descriptions, TABLES, 10_000)
+    budget = full["tokens"] - 1
+    context = build_schema_context(descriptions, TABLES, budget, question="Which actors were cast last?")
+
+    assert context["tokens"] <= budget
+    assert context["tables"] == full["tables"]
+    lines = dict(zip(context["tables"], context["lines"]))
+    # Keys and columns named in the question survive, the rest is summarized
+    assert lines["actor"] == "actor(actor_id int PK, last_name text, +1 more)"
+    assert lines["film"] == render_table(TABLES[0])
+
+
+def test_tables_are_dropped_when_pruning_is_not_enough_but_the_top_hit_stays():
+    descriptions = [description("film", ["title"]), description("actor", ["first_name"])]
+    context = build_schema_context(descriptions, TABLES, 1)
+    assert context["tables"] == ["film"]
+    assert context["dropped_tables"] == ["film_actor", "actor"]
+    assert context["tokens"] == estimate_tokens(context["lines"][0])
+
+
+def test_hits_missing_from_the_catalog_are_rendered_from_their_description():
+    context = build_schema_context([description("orders", ["id", "total"])], TABLES, 10_000)
+    assert context["lines"] == ["orders(id, total)"]
@@ -0,0 +1,162 @@
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.db import milvus_client, vector_backends
+from app.utils import schema_ingestion
+from app.utils.schema_ingestion import ingest_schema
+
+
+def table(name, columns):
+    return {
+        "columns": [{"name": column, "type": "integer", "nullable": True, "description": None} for column in columns],
+        "description": name,
+        "primary_key": [],
+        "foreign_keys": {}
+    }
+
+
+SCHEMA = {"actor": table("actor", ["actor_id", "name"]), "film": table("film", ["film_id"]), "store": table("store", ["store_id"])}
+
+
+class FakeCollection:
+    """Enough of a pymilvus Collection for ingestion; like Milvus, it cannot load without a vector index."""
+
+    collections = {}
+
+    def __new__(cls, name, schema=None, using=None):
+        if schema is None:
+            return cls.collections[name]
+        collection = cls.collections[name] = super().__new__(cls)
+        collection.name, collection.schema = name, schema
+        collection.indexes, collection.rows = [], []
+        return collection
+
+    def __init__(self, name, schema=None, using=None):
+        pass
+
+    def create_index(self, field_name, index_params):
+        self.indexes.append(SimpleNamespace(field_name=field_name, params=index_params))
+
+    def load(self, partition_names=None):
+        if not any(index.field_name == "embedding" for index in self.indexes):
+            raise Exception("index not found")
+
+    def insert(self, rows):
+        self.rows.extend(rows)
+
+    def query_iterator(self, batch_size, expr, output_fields):
+        pages = [self.rows[offset:offset + batch_size] for offset in range(0, len(self.rows), batch_size)]
+        pages = iter([[{field: row[field] for field in output_fields} for row in page] for page in pages])
+        return SimpleNamespace(next=lambda: next(pages, []), close=lambda: None)
+
+
+@pytest.fixture
+def milvus(monkeypatch):
+    import pymilvus
+    FakeCollection.collections = {}
+    fake = SimpleNamespace(
+        FieldSchema=pymilvus.FieldSchema,
+        DataType=pymilvus.DataType,
+        CollectionSchema=pymilvus.CollectionSchema,
+        Collection=FakeCollection,
+        connections=SimpleNamespace(has_connection=lambda alias: True),
+        utility=SimpleNamespace(has_collection=lambda name, using=None: name in FakeCollection.collections)
+    )
+    monkeypatch.setattr(milvus_client.pymilvus, "_module", fake)
+    for state in ("_collections", "_loaded_partitions"):
+        monkeypatch.setattr(milvus_client.milvus_manager, state, {})
+    monkeypatch.setattr(milvus_client.milvus_manager, "_loaded", set())
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "milvus")
+    monkeypatch.setattr(vector_backends, "_backends", {})
+    monkeypatch.setattr(schema_ingestion, "embed_texts", lambda texts, model=None: [[1.0] * 1024 for _ in texts])
+    return FakeCollection.collections
+
+
+@pytest.fixture
+def embedded(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "embedded")
+    monkeypatch.setattr(settings, "VECTOR_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_backends, "_backends", {})
+    embedded_texts = []
+
+    def embed_texts(texts, model=None):
+        embedded_texts.extend(texts)
+        return [[float(len(text) % 7 + 1), 0.0, 0.0, 0.0] for text in texts]
+
+    monkeypatch.setattr(schema_ingestion, "embed_texts", embed_texts)
+    return embedded_texts
+
+
+def stored_tables(collection_name):
+    rows = vector_backends.get_vector_backend(collection_name).query({}, ["table_name", "fingerprint"])
+    return sorted({row["table_name"] for row in rows}), len({row["fingerprint"] for row in rows})
+
+
+def test_first_run_embeds_every_table(embedded):
+    report = ingest_schema(SCHEMA, "db_schema")
+    assert report["added"] == ["actor", "film", "store"]
+    assert report["skipped"] == [] and report["rows"] == 3
+    assert stored_tables("db_schema") == (["actor", "film", "store"], 3)
+
+
+def test_unchanged_tables_are_skipped(embedded):
+    ingest_schema(SCHEMA, "db_schema")
+    embedded.clear()
+    report = ingest_schema(SCHEMA, "db_schema")
+    assert report["skipped"] == ["actor", "film", "store"]
+    assert (report["added"], report["updated"], report["removed"], report["rows"]) == ([], [], [], 0)
+    assert embedded == []
+
+
+def test_only_changed_added_and_dropped_tables_are_touched(embedded):
+    ingest_schema(SCHEMA, "db_schema")
+    embedded.clear()
+    changed = copy.deepcopy(SCHEMA)
+    changed["actor"]["columns"][1]["description"] = "Full name"  # A comment change re-embeds the table
+    del changed["store"]
+    changed["rental"] = table("rental", ["rental_id"])
+
+    report = ingest_schema(changed, "db_schema")
+    assert (report["added"], report["updated"], report["removed"]) == (["rental"], ["actor"], ["store"])
+    assert report["skipped"] == ["film"]
+    assert [text.splitlines()[0] for text in embedded] == ["Table: actor", "Table: rental"]
+    # The old actor rows were replaced, not kept next to the new ones
+    assert stored_tables("db_schema") == (["actor", "film", "rental"], 3)
+
+
+def test_full_run_rebuilds_the_collection(embedded):
+    ingest_schema(SCHEMA, "db_schema")
+    embedded.clear()
+    report = ingest_schema(SCHEMA, "db_schema", full=True)
+    assert report["rebuilt"] and report["updated"] == ["actor", "film", "store"]
+    assert len(embedded) == 3
+    assert stored_tables("db_schema") == (["actor", "film", "store"], 3)
+
+
+def test_collections_without_fingerprints_are_rebuilt(embedded):
+    legacy = vector_backends.get_vector_backend("legacy_schema")
+    legacy.ensure_ready()
+    legacy.insert([{"description": "Table: actor\nColumns: actor_id", "embedding": [1.0, 0.0, 0.0, 0.0]}])
+
+    report = ingest_schema(SCHEMA, "legacy_schema")
+    assert report["rebuilt"] and report["rows"] == 3
+    assert stored_tables("legacy_schema") == (["actor", "film", "store"], 3)
+
+
+def test_first_ingestion_into_a_new_milvus_collection(milvus):
+    report = ingest_schema(SCHEMA, "db_schema")
+    assert report["added"] == ["actor", "film", "store"]
+    assert [index.field_name for index in milvus["db_schema"].indexes] == ["embedding"]
+
+    assert ingest_schema(SCHEMA, "db_schema")["skipped"] == ["actor", "film", "store"]
+
+
+def test_collections_left_without_an_index_are_repaired(milvus):
+    ingest_schema(SCHEMA, "db_schema")
+    milvus["db_schema"].indexes.clear()
+    vector_backends._backends.clear()
+
+    assert ingest_schema(SCHEMA, "db_schema")["skipped"] == ["actor", "film", "store"]
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_coroutines_share_one_call():
+    group = SingleFlight("test")
+    runs = []
+
+    async def fetch():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "rows"
+
+    async def main():
+        return await asyncio.gather(*(group.do("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["rows"] * 5
+    assert len(runs) == 1
+    assert group.stats() == {"calls": 5, "executions": 1, "collapsed": 4, "in_flight": 0}
+
+
+def test_different_keys_and_later_calls_run_separately():
+    group = SingleFlight("test")
+    runs = []
+
+    async def fetch(key):
+        runs.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def main():
+        first = await asyncio.gather(group.do("a", lambda: fetch("a")), group.do("b", lambda: fetch("b")))
+        return first, await group.do("a", lambda: fetch("a"))
+
+    assert asyncio.run(main()) == (["a", "b"], "a")
+    assert runs == ["a", "b", "a"]
+
+
+def test_waiters_receive_the_exception():
+    group = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(group.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert group.executions == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    group = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(group.do("key", fetch))
+        second = asyncio.ensure_future(group.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_threads_share_one_call():
+    group = SingleFlight("test")
+    runs = []
+    started = threading.Event()
+    results = []
+
+    def fetch():
+        runs.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "rows"
+
+    def call():
+        results.append(group.do_sync("key", fetch))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=call) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert results == ["rows"] * 5
+    assert len(runs) == 1
+    assert group.collapsed == 4